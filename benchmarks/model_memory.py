@@ -0,0 +1,182 @@
+"""
+Memory per node of the File/Folder models.
+
+Parses a synthetic recursive pCloud listing like PCloudService._tree does,
+once into plain dataclass models as they were before (per-instance
+__dict__, a `contents` attribute set on Folder) and once with the slotted
+models, and reports the bytes the tree keeps allocated per node.
+
+    PYTHONPATH=src python benchmarks/model_memory.py --nodes 5000000
+
+The synthetic listing and the bookkeeping of tracemalloc take about 2 GB
+of memory per million nodes, so 5M nodes need a machine with more than
+10 GB. Smaller trees give the same result: everything the tree keeps is
+allocated per node, except the timestamps shared by the files of an
+upload. Measured with Python 3.11:
+
+    nodes       before        after
+    200,000     590 B/node    376 B/node
+    500,000     597 B/node    373 B/node
+    1,000,000   601 B/node    373 B/node
+"""
+import argparse
+import gc
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import Optional
+
+from extractor.services.pcloud import PCloudService
+
+FILES_PER_FOLDER = 10
+FOLDERS_PER_FOLDER = 3
+# files uploaded together share their timestamps
+FILES_PER_UPLOAD = 20
+EPOCH = datetime(2013, 3, 21, tzinfo=timezone.utc)
+
+
+@dataclass
+class LegacyFolder:
+    id: any
+    name: str
+    path: str
+    owner: bool
+    shared: bool
+    created_at: datetime
+    modified_at: datetime
+
+
+@dataclass
+class LegacyFile:
+    id: any
+    name: str
+    path: str
+    size: int
+    owner: bool
+    shared: bool
+    created_at: Optional[datetime]
+    modified_at: Optional[datetime]
+    session: object = field(compare=False, hash=False, repr=False)
+    hash: Optional[int] = field(default=None, compare=False, repr=False)
+
+
+class LegacyParser(PCloudService):
+    """The parsing of PCloudService into the former models"""
+
+    def _parse_file(self, data, parent):
+        return LegacyFile(
+            id=data["fileid"],
+            name=data["name"],
+            path=parent.path + "/" + data["name"],
+            owner=data["ismine"],
+            shared=data["isshared"],
+            created_at=data["created"],
+            modified_at=data["modified"],
+            size=data["size"],
+            session=self.client,
+            hash=data.get("hash"),
+        )
+
+    def _parse_folder(self, data, parent=None):
+        if data.get("path") is None:
+            if parent is not None and not parent.path == "":
+                data.setdefault("path", parent.path + "/" + data["name"])
+            else:
+                data["path"] = data["name"]
+
+        folder = LegacyFolder(
+            id=data["folderid"],
+            name=data["name"],
+            path=data["path"],
+            owner=data["ismine"],
+            shared=data["isshared"],
+            created_at=data["created"],
+            modified_at=data["modified"],
+        )
+        folder.contents = []
+        return folder
+
+
+def _timestamp(index: int) -> str:
+    # a new string per value, as the JSON decoder creates them
+    return format_datetime(EPOCH + timedelta(seconds=index // FILES_PER_UPLOAD))
+
+
+def listing(nodes: int) -> dict:
+    """Metadata of a synthetic listfolder(recursive=1) response"""
+
+    def folder(index, name):
+        return {
+            "folderid": index,
+            "name": name,
+            "isfolder": True,
+            "ismine": True,
+            "isshared": False,
+            "created": _timestamp(index),
+            "modified": _timestamp(index),
+            "contents": [],
+        }
+
+    root = folder(0, "/")
+    root["path"] = "/"
+    queue = [root]
+    count = 1
+    head = 0
+    while count < nodes:
+        parent = queue[head]
+        head += 1
+        for _ in range(FILES_PER_FOLDER):
+            if count >= nodes:
+                break
+            parent["contents"].append(
+                {
+                    "fileid": count,
+                    "name": f"IMG_{count:08d}.JPG",
+                    "isfolder": False,
+                    "ismine": True,
+                    "isshared": False,
+                    "created": _timestamp(count),
+                    "modified": _timestamp(count),
+                    "size": count * 7,
+                    "hash": count * 1_000_003,
+                }
+            )
+            count += 1
+        for _ in range(FOLDERS_PER_FOLDER):
+            if count >= nodes:
+                break
+            child = folder(count, f"d{count}")
+            parent["contents"].append(child)
+            queue.append(child)
+            count += 1
+    return root
+
+
+def measure(service, nodes: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    data = listing(nodes)
+    tree = service._parse_tree(data)
+    del data
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del tree
+    return size / nodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=5_000_000)
+    args = parser.parse_args()
+
+    before = measure(LegacyParser(), args.nodes)
+    after = measure(PCloudService(), args.nodes)
+    print(f"nodes:  {args.nodes}")
+    print(f"before: {before:.0f} bytes per node")
+    print(f"after:  {after:.0f} bytes per node ({1 - after / before:.0%} less)")
+
+
+if __name__ == "__main__":
+    main()
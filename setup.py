@@ -11,5 +11,6 @@ setup(
     package_dir={"": "src"},
     install_requires=["requests", "pytz",
                       "xmltodict", "pysimplegui", "iso8601", "nextcloud-api-wrapper"],
+    extras_require={"catalog": ["numpy"], "tokencache": ["cryptography"]},
     zip_safe=False,
 )
@@ -1 +1,2 @@
 from .extractor import Extractor
+from .asyncextractor import AsyncExtractor
@@ -1,9 +1,21 @@
 import argparse
+import csv
 import logging
+import sys
+from pathlib import Path
 from argparse import RawTextHelpFormatter
 
-from extractor import Extractor
-from extractor.plugins import DebugEventListener, Downloader
+from extractor import AsyncExtractor, Extractor
+from extractor.asyncextractor import DEFAULT_CONCURRENCY
+from extractor.common import HashSet, IsolatedPlugin
+from extractor.common.hashing import DEFAULT_HASHES
+from extractor.common.segmented import DEFAULT_SEGMENT_THRESHOLD
+from extractor.common.ratelimit import DEFAULT_DIRECTORY as DEFAULT_RATE_LIMIT_DIRECTORY
+from extractor.common.tokencache import DEFAULT_PATH as DEFAULT_TOKEN_CACHE
+from extractor.common.tokencache import TokenCache
+from extractor.common.transport import DEFAULT_TIMEOUT, DEFAULT_TRANSPORT
+from extractor.plugins import Catalog, DebugEventListener, Downloader, HashManifest, Inventory, Journal, KnownFiles, Logfile, Manifest
+from extractor.plugins.inventory import query as query_inventory
 from extractor.services.hidrive import HidriveService
 from extractor.services.mediafire import MediafireService
 from extractor.services.nextcloud import NextcloudService
@@ -284,10 +296,335 @@ def main():
         default=None,
     )
 
+    #
+    # Options shared by all Cloudservices
+    #
+    for service_parser in subparsers.choices.values():
+        service_parser.add_argument(
+            "--workers",
+            type=int,
+            required=False,
+            default=None,
+            metavar="N",
+            dest="workers",
+            help=(
+                "Number of files processed concurrently "
+                f"(default: 1, with --asyncio {DEFAULT_CONCURRENCY})"
+            ),
+        )
+        service_parser.add_argument(
+            "--asyncio",
+            required=False,
+            action="store_true",
+            dest="asyncio",
+            help="Run the acquisition on asyncio, with --workers concurrent tasks",
+        )
+        service_parser.add_argument(
+            "--list-workers",
+            type=int,
+            required=False,
+            default=None,
+            metavar="N",
+            dest="list_workers",
+            help="Number of folders listed concurrently (default: per service)",
+        )
+        service_parser.add_argument(
+            "--hash",
+            type=str,
+            required=False,
+            action="append",
+            metavar="ALGORITHM",
+            dest="hashes",
+            help="Hash the file contents while downloading, e.g. md5, sha1, sha256."
+            " Can be given multiple times.",
+        )
+        service_parser.add_argument(
+            "--hash-manifest",
+            type=str,
+            required=False,
+            default=None,
+            metavar="PATH",
+            dest="hash_manifest",
+            help="Write the file hashes to a CSV manifest"
+            f" of the downloaded files (default hashes: {', '.join(DEFAULT_HASHES)})",
+        )
+        service_parser.add_argument(
+            "--resume",
+            required=False,
+            action="store_true",
+            dest="resume",
+            help="Resume an interrupted acquisition from the journal next to the"
+            " Destination, skipping the finished files and folders",
+        )
+        service_parser.add_argument(
+            "--previous-manifest",
+            type=str,
+            required=False,
+            default=None,
+            metavar="PATH",
+            dest="previous_manifest",
+            help="Manifest of a previous acquisition (<Destination>.manifest.sqlite)."
+            " Unchanged files are copied from its output instead of downloaded.",
+        )
+        service_parser.add_argument(
+            "--store",
+            type=str,
+            required=False,
+            default=None,
+            metavar="PATH",
+            dest="store",
+            help="Content-addressed store shared between acquisitions. Contents are"
+            " kept once and linked into the Destination, files it holds already"
+            " aren't downloaded.",
+        )
+        service_parser.add_argument(
+            "--known-hashes",
+            type=str,
+            required=False,
+            action="append",
+            metavar="INDEX",
+            dest="known_hashes",
+            help="Skip the files in a known-file hash set, built with the hashset"
+            " command. Can be given multiple times.",
+        )
+        service_parser.add_argument(
+            "--fetch-checksums",
+            required=False,
+            action="store_true",
+            dest="fetch_checksums",
+            help="Ask the services for checksums they don't list, for"
+            " --known-hashes. Costs a request per file.",
+        )
+        service_parser.add_argument(
+            "--inventory",
+            type=str,
+            required=False,
+            default=None,
+            metavar="PATH",
+            dest="inventory",
+            help="Record all folders and files in an SQLite inventory,"
+            " see the query command",
+        )
+        service_parser.add_argument(
+            "--catalog",
+            type=str,
+            required=False,
+            default=None,
+            metavar="PATH",
+            dest="catalog",
+            help="Save a columnar catalog of the files for triage statistics"
+            " (Catalog.load), requires numpy",
+        )
+        service_parser.add_argument(
+            "--segments",
+            type=int,
+            required=False,
+            default=1,
+            metavar="N",
+            dest="segments",
+            help="Download large files as N byte ranges at once (default: 1)",
+        )
+        service_parser.add_argument(
+            "--segment-threshold",
+            type=int,
+            required=False,
+            default=DEFAULT_SEGMENT_THRESHOLD // (1024 * 1024),
+            metavar="MB",
+            dest="segment_threshold",
+            help="Size from which files are downloaded in segments"
+            f" (default: {DEFAULT_SEGMENT_THRESHOLD // (1024 * 1024)})",
+        )
+        service_parser.add_argument(
+            "--timeout",
+            type=float,
+            required=False,
+            default=DEFAULT_TIMEOUT[1],
+            metavar="SECONDS",
+            dest="timeout",
+            help="Seconds to wait for a response of the service"
+            f" (default: {DEFAULT_TIMEOUT[1]:g})",
+        )
+        service_parser.add_argument(
+            "--requests-per-second",
+            type=float,
+            required=False,
+            default=None,
+            metavar="N",
+            dest="requests_per_second",
+            help="Requests per second to the service, shared with the other"
+            " acquisitions from it on this machine",
+        )
+        service_parser.add_argument(
+            "--megabytes-per-second",
+            type=float,
+            required=False,
+            default=None,
+            metavar="MB",
+            dest="megabytes_per_second",
+            help="Megabytes per second received from the service, shared with"
+            " the other acquisitions from it on this machine",
+        )
+        service_parser.add_argument(
+            "--rate-limit-dir",
+            type=str,
+            required=False,
+            default=None,
+            metavar="PATH",
+            dest="rate_limit_dir",
+            help="Directory of the shared rate limits"
+            f" (default: {DEFAULT_RATE_LIMIT_DIRECTORY})",
+        )
+        service_parser.add_argument(
+            "--no-hedging",
+            action="store_false",
+            dest="hedge",
+            help="Don't duplicate metadata requests slower than the usual ones",
+        )
+        service_parser.add_argument(
+            "--token-cache",
+            type=str,
+            nargs="?",
+            const=str(DEFAULT_TOKEN_CACHE),
+            required=False,
+            default=None,
+            metavar="PATH",
+            dest="token_cache",
+            help="Reuse the login of earlier runs, encrypted with the password"
+            f" (default: {DEFAULT_TOKEN_CACHE}), requires cryptography",
+        )
+
+    #
+    # Known-file hash sets
+    #
+    parser_hashset = subparsers.add_parser(
+        "hashset", help="Build a known-file hash set for --known-hashes"
+    )
+    parser_hashset.add_argument(
+        "-a",
+        "--algorithm",
+        type=str,
+        required=True,
+        metavar="ALGORITHM",
+        dest="algorithm",
+        help="Algorithm of the hashes, e.g. md5, sha1, sha256",
+    )
+    parser_hashset.add_argument(
+        "index",
+        type=str,
+        metavar="Index",
+        help="Hash set index to write",
+    )
+    parser_hashset.add_argument(
+        "sources",
+        type=str,
+        nargs="+",
+        metavar="Source",
+        help="Text files with a hash per line, or CSV like NSRLFile.txt",
+    )
+
+    #
+    # Inventory queries
+    #
+    parser_query = subparsers.add_parser(
+        "query", help="Query an inventory written with --inventory, prints CSV"
+    )
+    parser_query.add_argument(
+        "inventory",
+        type=str,
+        metavar="Inventory",
+        help="Inventory to query",
+    )
+    parser_query.add_argument(
+        "--largest",
+        type=int,
+        required=False,
+        default=None,
+        metavar="N",
+        dest="largest",
+        help="The N largest files",
+    )
+    parser_query.add_argument(
+        "--modified-from",
+        type=str,
+        required=False,
+        default=None,
+        metavar="DATE",
+        dest="modified_from",
+        help="Modified at or after DATE (ISO 8601)",
+    )
+    parser_query.add_argument(
+        "--modified-to",
+        type=str,
+        required=False,
+        default=None,
+        metavar="DATE",
+        dest="modified_to",
+        help="Modified before DATE (ISO 8601)",
+    )
+    parser_query.add_argument(
+        "--path",
+        type=str,
+        required=False,
+        default=None,
+        metavar="PATH",
+        dest="path_prefix",
+        help="Below the folder PATH",
+    )
+    parser_query.add_argument(
+        "--status",
+        type=str,
+        required=False,
+        default=None,
+        choices=[Inventory.DOWNLOADED, Inventory.FAILED, Inventory.SKIPPED, "none"],
+        dest="status",
+        help="Download status",
+    )
+    parser_query.add_argument(
+        "--folders",
+        required=False,
+        action="store_true",
+        dest="folders",
+        help="Query the folders instead of the files",
+    )
+    parser_query.add_argument(
+        "--limit",
+        type=int,
+        required=False,
+        default=None,
+        metavar="N",
+        dest="limit",
+        help="At most N rows",
+    )
+
     args = parser.parse_args()
+
+    if args.service == "hashset":
+        HashSet.build(args.index, args.sources, args.algorithm.lower()).close()
+        return
+
+    if args.service == "query":
+        columns, rows = query_inventory(
+            args.inventory,
+            largest=args.largest,
+            modified_from=args.modified_from,
+            modified_to=args.modified_to,
+            path_prefix=args.path_prefix,
+            status=args.status,
+            kind="folder" if args.folders else "file",
+            limit=args.limit,
+        )
+        writer = csv.writer(sys.stdout)
+        writer.writerow(columns)
+        writer.writerows(rows)
+        return
+
     username = args.username
     password = args.password
 
+    # before the clients of the service take their sessions
+    DEFAULT_TRANSPORT.timeout = (DEFAULT_TIMEOUT[0], args.timeout)
+    DEFAULT_TRANSPORT.hedge = args.hedge
+
     if args.service == "pcloud":
         service = PCloudService()
     elif args.service == "mediafire":
@@ -305,13 +642,83 @@ def main():
     else:
         service = None
 
-    plugins = [DebugEventListener()]
+    if service is not None and args.list_workers is not None:
+        service.list_concurrency = args.list_workers
+
+    if service is not None and args.token_cache is not None:
+        service.token_cache = TokenCache(args.token_cache)
+
+    if service is not None and (args.requests_per_second or args.megabytes_per_second):
+        DEFAULT_TRANSPORT.limit_rate(
+            service.domains,
+            requests_per_second=args.requests_per_second,
+            bytes_per_second=(args.megabytes_per_second or 0) * 1024 * 1024,
+            directory=args.rate_limit_dir,
+        )
+
+    plugins = [
+        IsolatedPlugin(DebugEventListener(), backpressure=IsolatedPlugin.DROP),
+    ]
+
+    if args.logfile is not None:
+        plugins.append(IsolatedPlugin(Logfile(args.logfile)))
 
     if args.path is not None:
-        plugins.append(Downloader(args.path))
+        destination = Path(args.path).absolute()
+        plugins.append(
+            Journal(
+                destination.with_name(destination.name + ".journal"),
+                resume=args.resume,
+            )
+        )
+        plugins.append(
+            Manifest(
+                destination.with_name(destination.name + ".manifest.sqlite"),
+                previous=args.previous_manifest,
+                resume=args.resume,
+            )
+        )
+        plugins.append(Downloader(args.path, store=args.store))
+    elif args.resume or args.previous_manifest is not None or args.store is not None:
+        parser.error("--resume, --previous-manifest and --store require a Destination")
+
+    if args.inventory is not None:
+        plugins.append(Inventory(args.inventory))
+
+    if args.catalog is not None:
+        plugins.append(Catalog(args.catalog))
+
+    if args.known_hashes:
+        plugins.append(KnownFiles(*args.known_hashes, fetch=args.fetch_checksums))
 
-    extractor = Extractor(service, plugins)
-    extractor.acquire(username, password)
+    hashes = args.hashes
+    if args.hash_manifest is not None:
+        plugins.append(HashManifest(args.hash_manifest))
+        if not hashes:
+            hashes = DEFAULT_HASHES
+
+    segment_threshold = args.segment_threshold * 1024 * 1024
+
+    if args.asyncio:
+        extractor = AsyncExtractor(
+            service,
+            plugins,
+            concurrency=args.workers or DEFAULT_CONCURRENCY,
+            hashes=hashes,
+            segments=args.segments,
+            segment_threshold=segment_threshold,
+        )
+        extractor.run(username, password)
+    else:
+        extractor = Extractor(
+            service,
+            plugins,
+            workers=args.workers or 1,
+            hashes=hashes,
+            segments=args.segments,
+            segment_threshold=segment_threshold,
+        )
+        extractor.acquire(username, password)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,325 @@
+import asyncio
+import inspect
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Optional, Union
+
+from extractor.common import CloudService, ContentTee, Plugin
+from extractor.common.asyncservice import (
+    AsyncCloudService,
+    AsyncReader,
+    ExecutorStream,
+    SyncStreamBridge,
+    ThreadedAsyncService,
+)
+from extractor.common.hashing import stream_hashes
+from extractor.data import Folder
+from extractor.extractor import Extractor
+
+logger = logging.getLogger(__name__)
+
+# Files handled at once unless given, the connections per host grow with it
+DEFAULT_CONCURRENCY = 16
+
+
+def _is_async(handler) -> bool:
+    return inspect.iscoroutinefunction(handler)
+
+
+class AsyncExtractor(Extractor):
+    """
+    Extractor running on asyncio.
+
+    Every file is handled by its own task, at most `concurrency` at a time,
+    while the walk goes on. Plugins can define `async def on_*` handlers;
+    blocking handlers run in a thread pool, so the existing plugins keep
+    working. Blocking services are served through a ThreadedAsyncService.
+    """
+
+    def __init__(
+        self,
+        service: Union[AsyncCloudService, CloudService],
+        plugins: Optional[List[Plugin]] = None,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        **kwargs,
+    ) -> None:
+        self._loop = None
+        self._aflush_lock = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="extractor-async"
+        )
+
+        if isinstance(service, CloudService):
+            service = ThreadedAsyncService(
+                service, executor=self._executor, open_file=self._open_content
+            )
+
+        super().__init__(service, plugins, workers=concurrency, **kwargs)
+
+    def _in_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def _call(self, handler, *args, **kwargs):
+        """Call a handler from a thread outside the event loop"""
+        if _is_async(handler):
+            return asyncio.run_coroutine_threadsafe(
+                handler(*args, **kwargs), self._loop
+            ).result()
+
+        return handler(*args, **kwargs)
+
+    async def _acall(self, handler, *args, **kwargs):
+        """Call a handler from the event loop"""
+        if _is_async(handler):
+            return await handler(*args, **kwargs)
+
+        return await self._loop.run_in_executor(
+            self._executor, partial(handler, *args, **kwargs)
+        )
+
+    def emit(self, event: str, *args, **kwargs):
+        """
+        Blocking emit for plugins running in the thread pool.
+
+        Blocking handlers run in the calling thread, async handlers are
+        awaited on the event loop.
+        """
+        if self._in_loop():
+            raise RuntimeError("Use `await aemit(...)` inside the event loop")
+
+        handlers = self._handlers.get(event)
+        if handlers is None:
+            handlers = self._handlers[event] = self._resolve(event)
+
+        for handler in handlers:
+            self._call(handler, *args, **kwargs)
+
+        if self._batched(event, args):
+            self.flush()
+
+        return self
+
+    async def aemit(self, event: str, *args, **kwargs):
+        handlers = self._handlers.get(event)
+        if handlers is None:
+            handlers = self._handlers[event] = self._resolve(event)
+
+        for handler in handlers:
+            await self._acall(handler, *args, **kwargs)
+
+        if self._batched(event, args):
+            await self.aflush()
+
+        return self
+
+    def _loop_running(self) -> bool:
+        return self._loop is not None and self._loop.is_running()
+
+    def flush(self):
+        # while the loop runs, all flushes are delivered by aflush one by one
+        if self._loop_running() and not self._in_loop():
+            asyncio.run_coroutine_threadsafe(self.aflush(), self._loop).result()
+            return self
+
+        with self._flush_lock:
+            for handlers, items in self._take_batches():
+                if items:
+                    for handler in handlers:
+                        self._call(handler, items)
+
+        return self
+
+    async def aflush(self):
+        async with self._aflush_lock:
+            for handlers, items in self._take_batches():
+                if items:
+                    for handler in handlers:
+                        await self._acall(handler, items)
+
+        return self
+
+    async def _afile_found(self, file):
+        await self.aemit("file_found", file)
+        await self._aacquire_content(file)
+
+    async def _aacquire_content(self, file):
+        """
+        Async counterpart of Extractor._acquire_content.
+
+        The content is opened once. Async consumers read it on the event loop,
+        blocking consumers in the thread pool; several consumers share it
+        through a ContentTee.
+        """
+        consumers = [
+            plugin
+            for plugin in self._content_consumers
+            if getattr(plugin, "wants_content", lambda file: True)(file)
+        ]
+        if not consumers:
+            return
+
+        try:
+            stream = await self._service.open_stream(
+                file, **self._placement(file, consumers)
+            )
+        except Exception as error:
+            await self.aemit("file_download_failed", file, str(error))
+            return
+
+        try:
+            reader = stream  # what async consumers read from
+            if isinstance(stream, ExecutorStream):
+                source = stream.source
+            else:
+                source = SyncStreamBridge(stream, self._loop)
+
+            if self._hashes:
+                source = self._hashing_stream(source)
+                if isinstance(stream, ExecutorStream):
+                    stream.source = source
+                else:
+                    reader = AsyncReader(source, self._executor)
+
+            if len(consumers) == 1:
+                handler = consumers[0].on_file_content
+                if _is_async(handler):
+                    await handler(file, reader)
+                else:
+                    await self._acall(handler, file, source)
+            else:
+                with ContentTee(source) as tee:
+                    # side by side, so the readers share the chunks in memory
+                    results = await asyncio.gather(
+                        *(self._aconsume(plugin, file, tee.reader()) for plugin in consumers),
+                        return_exceptions=True,
+                    )
+                for result in results:
+                    if isinstance(result, BaseException):
+                        raise result
+
+            hashes = stream_hashes(source)
+            if hashes is not None:
+                await self.aemit("file_hashed", file, hashes)
+        finally:
+            await stream.close()
+
+    async def _aconsume(self, plugin, file, reader):
+        handler = plugin.on_file_content
+        if _is_async(handler):
+            await handler(file, AsyncReader(reader, self._executor))
+        else:
+            # not on the executor of the tasks, too few threads for all at once
+            await self._loop.run_in_executor(
+                self._consumer_pool(), partial(handler, file, reader)
+            )
+
+    async def _aacquire_nodes(self, nodes):
+        semaphore = asyncio.Semaphore(self._workers)
+        tasks = set()
+        errors = []
+
+        def done(task):
+            tasks.discard(task)
+            semaphore.release()
+            if not task.cancelled() and task.exception() is not None:
+                errors.append(task.exception())
+
+        try:
+            async for node in nodes:
+                if errors:
+                    break
+
+                reason = self._skip_reason(node) if self._skip_checks else None
+                if reason is not None:
+                    if isinstance(node, Folder):
+                        await self.aemit("folder_skipped", node, reason)
+                    else:
+                        await self.aemit("file_skipped", node, reason)
+                elif isinstance(node, Folder):
+                    await self.aemit("folder_found", node)
+                else:
+                    await semaphore.acquire()
+                    task = self._loop.create_task(self._afile_found(node))
+                    tasks.add(task)
+                    task.add_done_callback(done)
+
+            if tasks:
+                await asyncio.wait(set(tasks))
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        if errors:
+            raise errors[0]
+
+    def _folder_listed(self, folder, count):
+        # Called by the walk, either in the event loop or in a walker thread
+        if self._in_loop():
+            self._loop.create_task(self.aemit("folder_listed", folder, count))
+        else:
+            self.emit("folder_listed", folder, count)
+
+    def _list_failed(self, folder, error):
+        # Called by the walk, either in the event loop or in a walker thread
+        logger.warning(
+            "Listing %s failed: %s", "/" if folder is None else folder.path, error
+        )
+        if self._in_loop():
+            self._loop.create_task(self.aemit("folder_list_failed", folder, str(error)))
+        else:
+            self.emit("folder_list_failed", folder, str(error))
+
+    def _walk(self):
+        return self._service.walk(
+            prune=self._prune if self._skip_checks else None,
+            listed=self._folder_listed,
+            failed=self._list_failed,
+        )
+
+    async def acquire(self, username, password):
+        """ """
+        self._loop = asyncio.get_running_loop()
+        self._aflush_lock = asyncio.Lock()
+        try:
+            self._reserve_connections()
+            await self.aemit("extractor_start")
+
+            #
+            # Login / Acquire User
+            #
+            try:
+                user = await self._service.login(username, password)
+            except Exception as e:
+                await self.aemit("login_failure", e)
+            else:
+                await self.aemit("login_success", user)
+
+                #
+                # Acquire Folders and Files in a single walk
+                #
+                await self.aemit("before_acquire_folders")
+                await self.aemit("before_acquire_files")
+
+                self._start_flusher()
+                await self._aacquire_nodes(self._walk())
+                await self.aflush()
+
+                await self.aemit("after_acquire_folders")
+                await self.aemit("after_acquire_files")
+
+            await self.aemit("extractor_end")
+        finally:
+            # not on the executor, close shuts it down
+            await self._loop.run_in_executor(None, self.close)
+
+    def close(self):
+        super().close()
+        self._executor.shutdown()
+
+    def run(self, username, password):
+        """Run the acquisition in a new event loop"""
+        return asyncio.run(self.acquire(username, password))
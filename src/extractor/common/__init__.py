@@ -1,4 +1,17 @@
+from .batch import EventBatch
+from .hashset import HashSet
+from .isolated import IsolatedPlugin
+from .limiter import AdaptiveLimiter
 from .plugin import Plugin
+from .queue import ByteBoundedQueue
+from .ratelimit import RateLimit, SharedTokenBucket
+from .segmented import SegmentedStream
 from .service import CloudService
+from .store import ContentStore
+from .stream import IterableStream, ResponseStream
+from .tee import ContentTee
+from .tokencache import TokenCache
 from .tools import RequiredParameterCheck
+from .transport import DEFAULT_TRANSPORT, Transport
 from .tools import camel_to_snake
+from .walker import walk_tree
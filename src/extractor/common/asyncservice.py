@@ -0,0 +1,196 @@
+"""
+Async Service Protocol and an Adapter for the blocking Cloudservices
+"""
+import asyncio
+import concurrent.futures
+import threading
+from abc import ABC, abstractmethod
+from functools import partial
+from typing import AsyncIterator, Union
+
+from extractor.common.service import CloudService
+from extractor.common.stream import close_stream
+from extractor.data import File, Folder, User
+
+# Seconds between the checks of a blocked walk whether its consumer stopped
+PUT_INTERVAL = 0.5
+
+
+class AsyncStream(ABC):
+    """Readable content stream of a file"""
+
+    @abstractmethod
+    async def read(self, size: int = -1) -> bytes:
+        ...
+
+    @abstractmethod
+    async def close(self) -> None:
+        ...
+
+
+class AsyncCloudService(ABC):
+    """
+    Abstract Baseclass for Cloudservices with an asyncio API
+    """
+
+    @abstractmethod
+    async def login(self, username, password) -> User:
+        pass
+
+    @abstractmethod
+    def walk(
+        self, prune=None, listed=None, failed=None
+    ) -> AsyncIterator[Union[Folder, File]]:
+        """
+        Async generator yielding the folders and files of the remote tree,
+        a folder always before anything it contains. See `walk_tree` for
+        `prune`, `listed` and `failed`.
+        """
+
+    @abstractmethod
+    async def open_stream(self, file: File, **options) -> AsyncStream:
+        """
+        Stream of the content of `file`. `options` of the Extractor, e.g.
+        where segmented downloads go, may be ignored.
+        """
+
+
+class ExecutorStream(AsyncStream):
+    """AsyncStream reading a blocking stream in an executor"""
+
+    def __init__(self, file: File, source, executor=None):
+        self.file = file
+        self.source = source  # the blocking stream
+        self._executor = executor
+
+    async def read(self, size: int = -1) -> bytes:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.source.read, size)
+
+    async def close(self) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._close)
+
+    def _close(self):
+        close_stream(self.source)
+        self.file.__exit__(None, None, None)
+
+
+class ThreadedAsyncService(AsyncCloudService):
+    """
+    Serves a blocking CloudService through the async protocol.
+
+    The calls run in an executor and the walk runs in its own thread, feeding
+    a bounded queue, so the event loop is never blocked by the HTTP clients.
+    """
+
+    _DONE = object()
+
+    def __init__(
+        self, service: CloudService, executor=None, maxsize: int = 1000, open_file=None
+    ):
+        self._service = service
+        self._executor = executor
+        self._maxsize = maxsize
+        # opens the content stream of a file, File.__enter__ by default
+        self._open_file = open_file or (lambda file, **options: file.__enter__())
+
+    @property
+    def service(self) -> CloudService:
+        return self._service
+
+    async def login(self, username, password) -> User:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self._service.login, username, password
+        )
+
+    async def walk(
+        self, prune=None, listed=None, failed=None
+    ) -> AsyncIterator[Union[Folder, File]]:
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(self._maxsize)
+        cancelled = threading.Event()
+
+        def put(item) -> bool:
+            """Hand an item to the consumer, False once it stopped"""
+            future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+            while not cancelled.is_set():
+                try:
+                    future.result(PUT_INTERVAL)
+                    return True
+                except concurrent.futures.TimeoutError:
+                    pass
+            future.cancel()
+            return False
+
+        def produce():
+            nodes = self._service.walk(prune=prune, listed=listed, failed=failed)
+            try:
+                for node in nodes:
+                    if cancelled.is_set() or not put(node):
+                        return
+            except BaseException as ex:
+                item = ex
+            else:
+                item = self._DONE
+            finally:
+                # stops the listing threads of a walk left early
+                nodes.close()
+
+            if not cancelled.is_set():
+                put(item)
+
+        producer = threading.Thread(target=produce, name="async-walk", daemon=True)
+        producer.start()
+
+        try:
+            while True:
+                item = await queue.get()
+                if item is self._DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
+            # a producer blocked on the full queue goes on and sees the stop
+            while not queue.empty():
+                queue.get_nowait()
+
+    async def open_stream(self, file: File, **options) -> AsyncStream:
+        loop = asyncio.get_running_loop()
+        source = await loop.run_in_executor(
+            self._executor, partial(self._open_file, file, **options)
+        )
+        return ExecutorStream(file, source, self._executor)
+
+
+class SyncStreamBridge:
+    """Blocking read() on an AsyncStream, for use outside the event loop"""
+
+    def __init__(self, stream: AsyncStream, loop):
+        self._stream = stream
+        self._loop = loop
+
+    def read(self, size: int = -1) -> bytes:
+        return asyncio.run_coroutine_threadsafe(
+            self._stream.read(size), self._loop
+        ).result()
+
+
+class AsyncReader(AsyncStream):
+    """AsyncStream on a blocking reader, e.g. a TeeReader"""
+
+    def __init__(self, reader, executor=None):
+        self._reader = reader
+        self._executor = executor
+
+    async def read(self, size: int = -1) -> bytes:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, partial(self._reader.read, size)
+        )
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,61 @@
+import threading
+import time
+from typing import Callable, List, Optional
+
+
+class EventBatch:
+    """
+    Collects the items of a per-item event for batch handlers.
+
+    The batch is due once it holds `size` items, which `add` reports, or
+    once its oldest item waited `interval` seconds, see `due_at`. Flushing
+    hands the collected list to every handler.
+    """
+
+    def __init__(
+        self, handlers: List[Callable], size: int = 1000, interval: Optional[float] = 1.0
+    ):
+        self._handlers = handlers
+        self._size = size
+        self._interval = interval
+        self._items = []
+        self._started_at = None
+        self._lock = threading.Lock()
+
+    def add(self, item) -> bool:
+        """
+        Returns:
+            bool: True if the batch is full and due to be flushed
+        """
+        with self._lock:
+            if not self._items:
+                self._started_at = time.monotonic()
+            self._items.append(item)
+
+            return len(self._items) >= self._size
+
+    @property
+    def due_at(self) -> Optional[float]:
+        """time.monotonic() at which the collected items are due, None if empty"""
+        started_at = self._started_at
+        if started_at is None or self._interval is None:
+            return None
+        return started_at + self._interval
+
+    @property
+    def handlers(self) -> List[Callable]:
+        return self._handlers
+
+    def take(self) -> list:
+        """Remove and return the collected items"""
+        with self._lock:
+            items, self._items = self._items, []
+            self._started_at = None
+
+        return items
+
+    def flush(self) -> None:
+        items = self.take()
+        if items:
+            for handler in self._handlers:
+                handler(items)
@@ -0,0 +1,109 @@
+"""
+Digests computed while the content is streamed
+"""
+import hashlib
+import io
+from typing import Dict, Iterable, Optional
+
+from extractor.common.stream import close_stream, readinto
+
+DEFAULT_HASHES = ("md5", "sha1", "sha256")
+
+# Chunks from which the digests are updated in parallel. hashlib releases
+# the GIL while hashing buffers larger than 2 KiB.
+PARALLEL_THRESHOLD = 64 * 1024
+
+
+def check_hashes(algorithms: Iterable[str]) -> tuple:
+    """Validate hash algorithm names, raises ValueError for unknown ones"""
+    algorithms = tuple(name.lower() for name in algorithms)
+    for name in algorithms:
+        hashlib.new(name)
+
+    return algorithms
+
+
+class HashingStream(io.RawIOBase):
+    """
+    Readable stream updating digests with everything read from its source.
+
+    With an executor the digests of a chunk are updated in parallel, the
+    hashing then runs outside the GIL on several cores.
+    """
+
+    def __init__(self, source, algorithms: Iterable[str] = DEFAULT_HASHES, executor=None):
+        self.source = source
+        self._digests = [(name, hashlib.new(name)) for name in algorithms]
+        self._executor = executor
+        self._size = 0
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        size = readinto(self.source, b)
+        if not size:
+            self._eof = True
+            return 0
+
+        self._update(memoryview(b)[:size])
+        self._size += size
+        return size
+
+    def _update(self, data):
+        if self._executor is None or len(self._digests) == 1 or len(data) < PARALLEL_THRESHOLD:
+            for _, digest in self._digests:
+                digest.update(data)
+            return
+
+        futures = [
+            self._executor.submit(digest.update, data) for _, digest in self._digests[1:]
+        ]
+        self._digests[0][1].update(data)
+        for future in futures:
+            future.result()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def algorithms(self) -> tuple:
+        return tuple(name for name, _ in self._digests)
+
+    def hexdigests(self) -> Optional[Dict[str, str]]:
+        """
+        Returns:
+            dict: hex digest per algorithm, None until the source was read to the end
+        """
+        if not self._eof:
+            return None
+
+        return {name: digest.hexdigest() for name, digest in self._digests}
+
+    def close(self):
+        if not self.closed:
+            close_stream(self.source)
+        super().close()
+
+
+def _find_hashing_stream(stream) -> Optional[HashingStream]:
+    while stream is not None:
+        if isinstance(stream, HashingStream):
+            return stream
+        stream = getattr(stream, "source", None)
+
+    return None
+
+
+def stream_hashes(stream) -> Optional[Dict[str, str]]:
+    """Digests of the HashingStream a content stream reads from, if any"""
+    hashing = _find_hashing_stream(stream)
+    return None if hashing is None else hashing.hexdigests()
+
+
+def stream_algorithms(stream) -> tuple:
+    """Algorithms hashed by the HashingStream a content stream reads from"""
+    hashing = _find_hashing_stream(stream)
+    return () if hashing is None else hashing.algorithms
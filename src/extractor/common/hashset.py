@@ -0,0 +1,241 @@
+"""
+Compact index of a large set of known hashes (e.g. NSRL)
+"""
+import array
+import hashlib
+import heapq
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"XTHASH01"
+# magic, algorithm, digest size, bloom probes, entries, bloom bits
+HEADER = struct.Struct("<8s16sBBQQ")
+# Index of the first entry per leading 16 bits of the digests
+FANOUT_SIZE = 1 << 16
+
+# Bloom filter of 8 bits per entry probed 4 times: about 2.4% false positives
+BLOOM_BITS_PER_ENTRY = 8
+BLOOM_PROBES = 4
+
+# Digests sorted in memory at once while building
+RUN_SIZE = 2_000_000
+
+
+def _bloom_positions(digest: bytes, bits: int, probes: int) -> Iterator[int]:
+    # The digests are uniformly distributed already, so two slices of them
+    # serve as the hash functions (double hashing)
+    h1 = int.from_bytes(digest[:8], "little")
+    h2 = int.from_bytes(digest[-8:], "big") | 1
+    for i in range(probes):
+        yield (h1 + i * h2) % bits
+
+
+def _parse_digests(lines: Iterable[str], digest_size: int) -> Iterator[bytes]:
+    # A hash per line, or CSV like NSRLFile.txt: the first field of the
+    # right length is taken, so headers and other columns are ignored
+    length = digest_size * 2
+    for line in lines:
+        for value in line.split(","):
+            value = value.strip().strip('"')
+            if len(value) == length:
+                try:
+                    yield bytes.fromhex(value)
+                except ValueError:
+                    continue
+                break
+
+
+def _read_run(path: str, digest_size: int) -> Iterator[bytes]:
+    with open(path, "rb", buffering=1024 * 1024) as run:
+        while True:
+            digest = run.read(digest_size)
+            if len(digest) < digest_size:
+                return
+            yield digest
+
+
+class HashSet:
+    """
+    Read-only set of hashes of one algorithm, memory-mapped from an index
+    written by `HashSet.build`.
+
+    The index holds the sorted digests, a fanout table narrowing the binary
+    search to the digests sharing the leading 16 bits, and a Bloom filter
+    answering most misses with a few bit probes. A lookup takes some
+    microseconds, independent of the size of the set.
+    """
+
+    def __init__(self, path):
+        self._path = Path(path).absolute()
+        self._file = open(self._path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, algorithm, digest_size, probes, count, bits = HEADER.unpack_from(
+            self._mmap
+        )
+        if magic != MAGIC:
+            raise ValueError(f"{self._path} is no hash set index")
+
+        self._algorithm = algorithm.rstrip(b"\0").decode()
+        self._digest_size = digest_size
+        self._probes = probes
+        self._count = count
+        self._bloom_bits = bits
+
+        self._fanout = array.array("Q")
+        offset = HEADER.size
+        self._fanout.frombytes(self._mmap[offset : offset + (FANOUT_SIZE + 1) * 8])
+        if sys.byteorder == "big":
+            self._fanout.byteswap()
+
+        self._bloom = offset + (FANOUT_SIZE + 1) * 8
+        self._records = self._bloom + bits // 8
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @property
+    def algorithm(self) -> str:
+        return self._algorithm
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, digest: bytes) -> bool:
+        if len(digest) != self._digest_size:
+            return False
+
+        data = self._mmap
+        bloom = self._bloom
+        for position in _bloom_positions(digest, self._bloom_bits, self._probes):
+            if not data[bloom + (position >> 3)] >> (position & 7) & 1:
+                return False
+
+        bucket = int.from_bytes(digest[:2], "big")
+        low, high = self._fanout[bucket], self._fanout[bucket + 1]
+        size = self._digest_size
+        records = self._records
+        while low < high:
+            middle = (low + high) // 2
+            start = records + middle * size
+            value = data[start : start + size]
+            if value < digest:
+                low = middle + 1
+            elif value > digest:
+                high = middle
+            else:
+                return True
+
+        return False
+
+    def contains_hex(self, value: str) -> bool:
+        try:
+            return bytes.fromhex(value) in self
+        except ValueError:
+            return False
+
+    def close(self):
+        if not self._file.closed:
+            self._mmap.close()
+            self._file.close()
+
+    @classmethod
+    def build(
+        cls,
+        path,
+        sources: Iterable,
+        algorithm: str,
+        digest_size: Optional[int] = None,
+        bits_per_entry: int = BLOOM_BITS_PER_ENTRY,
+        run_size: int = RUN_SIZE,
+    ) -> "HashSet":
+        """
+        Write the index of the hashes in text files.
+
+        The hashes are sorted externally: runs of `run_size` sorted in memory
+        are merged from temporary files, so sets larger than the memory work.
+
+        Args:
+            path: the index to write
+            sources: text files with a hash per line, or NSRL-style CSV
+            algorithm (str): name of the hashes, as in `File.get_checksums`
+            digest_size (int): bytes per hash, by default the hashlib one
+        """
+        path = Path(path).absolute()
+        if digest_size is None:
+            digest_size = hashlib.new(algorithm).digest_size
+        if len(algorithm.encode()) > 16 or digest_size < 2:
+            raise ValueError(f"Unsupported algorithm {algorithm}")
+
+        with tempfile.TemporaryDirectory(dir=path.parent) as tmp:
+            runs = []
+            run = set()
+
+            def flush():
+                name = os.path.join(tmp, f"run{len(runs)}")
+                with open(name, "wb") as target:
+                    target.write(b"".join(sorted(run)))
+                runs.append(name)
+                run.clear()
+
+            for source in sources:
+                with open(source, "r", encoding="utf-8", errors="replace") as lines:
+                    for digest in _parse_digests(lines, digest_size):
+                        run.add(digest)
+                        if len(run) >= run_size:
+                            flush()
+            if run or not runs:
+                flush()
+
+            # Merge the runs into the sorted, unique records
+            records = os.path.join(tmp, "records")
+            fanout = array.array("Q", [0]) * (FANOUT_SIZE + 1)
+            count = 0
+            previous = None
+            with open(records, "wb", buffering=1024 * 1024) as target:
+                for digest in heapq.merge(*(_read_run(r, digest_size) for r in runs)):
+                    if digest == previous:
+                        continue
+                    target.write(digest)
+                    fanout[int.from_bytes(digest[:2], "big") + 1] += 1
+                    count += 1
+                    previous = digest
+
+            for bucket in range(FANOUT_SIZE):
+                fanout[bucket + 1] += fanout[bucket]
+
+            bits = max(64, -(-count * bits_per_entry // 64) * 64)
+            bloom = bytearray(bits // 8)
+            for digest in _read_run(records, digest_size):
+                for position in _bloom_positions(digest, bits, BLOOM_PROBES):
+                    bloom[position >> 3] |= 1 << (position & 7)
+
+            if sys.byteorder == "big":
+                fanout.byteswap()
+
+            with open(path, "wb") as target:
+                target.write(
+                    HEADER.pack(
+                        MAGIC, algorithm.encode(), digest_size, BLOOM_PROBES, count, bits
+                    )
+                )
+                target.write(fanout.tobytes())
+                target.write(bloom)
+                with open(records, "rb") as source:
+                    while True:
+                        chunk = source.read(1024 * 1024)
+                        if not chunk:
+                            break
+                        target.write(chunk)
+
+        logger.info("Hash set %s: %d %s hashes", path, count, algorithm)
+        return cls(path)
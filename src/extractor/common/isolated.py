@@ -0,0 +1,167 @@
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from functools import partial
+
+logger = logging.getLogger(__name__)
+
+
+class IsolatedPlugin:
+    """
+    Runs the eventhandlers of a plugin on its own consumer thread.
+
+    Events are put into a bounded inbox and handled in order by the consumer,
+    so a slow plugin doesn't hold up the enumeration. If the inbox is full,
+    the emitting thread either waits (`BLOCK`) or the event is dropped and
+    counted (`DROP`), which suits non-critical plugins like the
+    DebugEventListener. Events emitted after `close` are dropped either way.
+
+    Exceptions raised by the wrapped handlers are logged and counted instead
+    of aborting the acquisition.
+
+    `on_file_content` isn't isolated: the content stream is only valid during
+    the call, so it runs in the emitting thread. Neither is `should_skip`.
+    """
+
+    BLOCK = "block"
+    DROP = "drop"
+
+    def __init__(self, plugin, maxsize: int = 1000, backpressure: str = BLOCK):
+        if backpressure not in (self.BLOCK, self.DROP):
+            raise ValueError(f"Unknown backpressure mode `{backpressure}`")
+
+        self._plugin = plugin
+        self._inbox = queue.Queue(maxsize)
+        self._backpressure = backpressure
+        self._thread = None
+        self._closed = False
+
+        # Metrics
+        self._lock = threading.Lock()
+        self._max_depth = 0
+        self._processed = 0
+        self._errors = 0
+        self._dropped = Counter()
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    @property
+    def plugin(self):
+        return self._plugin
+
+    @property
+    def name(self) -> str:
+        return type(self._plugin).__name__
+
+    def init(self, extractor):
+        init = getattr(self._plugin, "init", None)
+        if init is not None:
+            init(extractor)
+
+        self._thread = threading.Thread(
+            target=self._consume, name=f"plugin-{self.name}", daemon=True
+        )
+        self._thread.start()
+
+    def __getattr__(self, name):
+        # The skip check answers synchronously
+        if name == "should_skip":
+            return getattr(self._plugin, name)
+
+        # Only eventhandlers are isolated, everything else is not proxied
+        if name != "on" and not name.startswith("on_"):
+            raise AttributeError(name)
+
+        handler = getattr(self._plugin, name)
+        if name == "on_file_content":
+            return handler
+
+        return partial(self._submit, name, handler)
+
+    def wants_content(self, file) -> bool:
+        wants_content = getattr(self._plugin, "wants_content", None)
+        return wants_content is None or wants_content(file)
+
+    def content_destination(self, file):
+        content_destination = getattr(self._plugin, "content_destination", None)
+        return None if content_destination is None else content_destination(file)
+
+    def __dir__(self):
+        return sorted(set(super().__dir__()) | set(dir(self._plugin)))
+
+    def _submit(self, name, handler, *args, **kwargs):
+        item = (name, handler, args, kwargs)
+
+        if self._backpressure == self.DROP:
+            try:
+                if self._closed:
+                    raise queue.Full
+                self._inbox.put_nowait(item)
+            except queue.Full:
+                self._drop(name)
+                return
+        else:
+            # a closed inbox isn't drained anymore, stop waiting for room
+            while True:
+                if self._closed:
+                    self._drop(name)
+                    return
+                try:
+                    self._inbox.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+
+        with self._lock:
+            self._max_depth = max(self._max_depth, self._inbox.qsize())
+
+    def _drop(self, name):
+        with self._lock:
+            self._dropped[name] += 1
+
+    def _consume(self):
+        while True:
+            item = self._inbox.get()
+            if item is None:
+                break
+
+            name, handler, args, kwargs = item
+            started_at = time.perf_counter()
+            try:
+                handler(*args, **kwargs)
+            except Exception:
+                logger.exception("Plugin %s failed handling [%s]", self.name, name)
+                with self._lock:
+                    self._errors += 1
+            finally:
+                latency = time.perf_counter() - started_at
+                with self._lock:
+                    self._processed += 1
+                    self._latency_total += latency
+                    self._latency_max = max(self._latency_max, latency)
+
+    def close(self):
+        """Handle the remaining events and stop the consumer thread"""
+        self._closed = True
+        if self._thread is not None:
+            self._inbox.put(None)
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "depth": self._inbox.qsize(),
+                "max_depth": self._max_depth,
+                "processed": self._processed,
+                "errors": self._errors,
+                "dropped": sum(self._dropped.values()),
+                "dropped_events": dict(self._dropped),
+                "latency_avg": self._latency_total / self._processed
+                if self._processed
+                else 0.0,
+                "latency_max": self._latency_max,
+            }
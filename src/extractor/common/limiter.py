@@ -0,0 +1,244 @@
+"""Adaptive limit of the concurrent requests to a host"""
+
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+# Slots granted to a host at first
+INITIAL_LIMIT = 4
+# Backoff of retries: random between 0 and BACKOFF * 2 ** attempt seconds
+BACKOFF = 0.5
+MAX_BACKOFF = 60.0
+# Latency above this multiple of the lowest observed one counts as congestion
+LATENCY_TOLERANCE = 3.0
+# Latencies the percentile for hedging is computed from, at least
+LATENCY_SAMPLES = 200
+MIN_LATENCY_SAMPLES = 20
+# Seconds a hedge waits for at least, and the share of requests hedged at most
+MIN_HEDGE_DELAY = 0.05
+HEDGE_BUDGET = 0.1
+
+
+def backoff(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Seconds to wait before retry `attempt` (from 0), with full jitter"""
+    delay = random.uniform(0, min(MAX_BACKOFF, BACKOFF * 2**attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def retry_after(response) -> Optional[float]:
+    """Seconds of the Retry-After header, given in seconds or as HTTP date"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class Slot:
+    """Permission for one request, released once"""
+
+    __slots__ = ("_limiter", "_thread", "_released", "__weakref__")
+
+    def __init__(self, limiter: "AdaptiveLimiter", thread: int):
+        self._limiter = limiter
+        self._thread = thread
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._limiter._release(self._thread)
+
+    def hold_until_closed(self, response):
+        """Keep the slot while a streamed body is read"""
+        # referenced weakly, the response would keep itself alive
+        reference = weakref.ref(response)
+
+        def closing():
+            try:
+                response = reference()
+                if response is not None:
+                    type(response).close(response)
+            finally:
+                self.release()
+
+        response.close = closing
+        # responses which are read but never closed
+        weakref.finalize(response, self.release)
+
+
+class AdaptiveLimiter:
+    """
+    AIMD limit of the requests in flight to one host: each request within
+    the latency of a healthy host raises the limit by 1/limit, so by one per
+    round of requests, up to `max_limit`. A throttling response (429, 503 or
+    an error code of the provider) or a failed request halves it, at most
+    once per `cooldown` seconds; a Retry-After pauses the host.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        max_limit: int,
+        initial: int = INITIAL_LIMIT,
+        min_limit: int = 1,
+        cooldown: float = 1.0,
+    ):
+        self.host = host
+        self.max_limit = max_limit
+        self._min_limit = min_limit
+        self._cooldown = cooldown
+        self._limit = float(max(min_limit, min(initial, max_limit)))
+        self._condition = threading.Condition()
+        self._held = {}  # thread -> slots
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._decreased_at = 0.0
+        self._latency_floor = None
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._p95 = None
+
+        # Metrics
+        self._max_in_flight = 0
+        self._highest_limit = self._limit
+        self._requests = 0
+        self._throttled = 0
+        self._errors = 0
+        self._retries = 0
+        self._succeeded = 0
+        self._latency_total = 0.0
+        self._hedged = 0
+        self._hedges_won = 0
+
+    @property
+    def limit(self) -> int:
+        return max(self._min_limit, int(self._limit))
+
+    def acquire(self) -> Slot:
+        """Wait for a slot, unless the thread holds one for this host already"""
+        # a thread waiting while it holds a slot could wait for itself
+        thread = threading.get_ident()
+        with self._condition:
+            while thread not in self._held:
+                wait = self._paused_until - time.monotonic()
+                if wait <= 0 and self._in_flight < self.limit:
+                    break
+                self._condition.wait(wait if wait > 0 else None)
+
+            self._held[thread] = self._held.get(thread, 0) + 1
+            self._in_flight += 1
+            self._requests += 1
+            self._max_in_flight = max(self._max_in_flight, self._in_flight)
+
+        return Slot(self, thread)
+
+    def _release(self, thread: int):
+        with self._condition:
+            held = self._held.pop(thread, 1) - 1
+            if held:
+                self._held[thread] = held
+            self._in_flight -= 1
+            self._condition.notify()
+
+    def success(self, latency: float):
+        with self._condition:
+            self._succeeded += 1
+            self._latency_total += latency
+            self._latencies.append(latency)
+            if self._succeeded % 20 == 0 and len(self._latencies) >= MIN_LATENCY_SAMPLES:
+                ordered = sorted(self._latencies)
+                self._p95 = ordered[int(len(ordered) * 0.95)]
+            if self._latency_floor is None or latency < self._latency_floor:
+                self._latency_floor = latency
+            else:
+                # follows a slower network, slowly
+                self._latency_floor += (latency - self._latency_floor) * 0.01
+
+            # a slow host keeps its limit
+            if latency <= self._latency_floor * LATENCY_TOLERANCE:
+                self._limit = min(float(self.max_limit), self._limit + 1 / self._limit)
+                self._highest_limit = max(self._highest_limit, self._limit)
+                self._condition.notify_all()
+
+    def throttled(self, retry_after: Optional[float] = None):
+        with self._condition:
+            self._throttled += 1
+            if retry_after:
+                self._paused_until = max(
+                    self._paused_until, time.monotonic() + retry_after
+                )
+            self._decrease()
+
+    def failed(self):
+        with self._condition:
+            self._errors += 1
+            self._decrease()
+
+    def retried(self):
+        with self._condition:
+            self._retries += 1
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        Seconds after which a duplicate of a slow request is sent: the 95th
+        percentile of the latency. None while the host throttles or too few
+        latencies are known, or once a tenth of the requests were hedged.
+        """
+        with self._condition:
+            now = time.monotonic()
+            if (
+                self._p95 is None
+                or now < self._paused_until
+                or now - self._decreased_at < 10 * self._cooldown
+                or self._hedged >= self._requests * HEDGE_BUDGET
+            ):
+                return None
+            return max(MIN_HEDGE_DELAY, self._p95)
+
+    def hedged(self):
+        with self._condition:
+            self._hedged += 1
+
+    def hedge_won(self):
+        with self._condition:
+            self._hedges_won += 1
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self._decreased_at >= self._cooldown:
+            self._decreased_at = now
+            self._limit = max(float(self._min_limit), self._limit / 2)
+
+    @property
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "limit": self.limit,
+                "highest_limit": int(self._highest_limit),
+                "in_flight": self._in_flight,
+                "max_in_flight": self._max_in_flight,
+                "requests": self._requests,
+                "throttled": self._throttled,
+                "errors": self._errors,
+                "retries": self._retries,
+                "hedged": self._hedged,
+                "hedges_won": self._hedges_won,
+                "latency_p95": self._p95,
+                "latency_avg": self._latency_total / self._succeeded
+                if self._succeeded
+                else 0.0,
+            }
@@ -1,10 +1,29 @@
 class Plugin:
     """
     [summary]
+
+    Eventhandlers are called from the thread driving the acquisition. If the
+    Extractor runs with several workers (`Extractor.concurrent`), `file_found`
+    and the events emitted while handling it arrive concurrently from the
+    worker threads, so plugins with shared state have to synchronize it.
     """
 
+    # def init(self, extractor):
+    #     self.concurrent = extractor.concurrent
+
     # def on(self, event, *args, **kwargs):
     #     logger.debug("generic handlerfunction [on] called for event [%s]", event)
 
     # def on_event_name(self, *args, **kwargs):
     #     pass
+
+    # def should_skip(self, node) -> Optional[str]:
+    #     """Reason to skip a folder or file, `folder_skipped`/`file_skipped` is emitted instead"""
+    #     return None
+
+    # def content_destination(self, file) -> Optional[Path]:
+    #     """
+    #     File `on_file_content` writes the content to unchanged. Segmented
+    #     downloads write into it in place, the source then reads from it.
+    #     """
+    #     return None
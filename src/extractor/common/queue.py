@@ -0,0 +1,47 @@
+import threading
+from collections import deque
+
+
+class ByteBoundedQueue:
+    """
+    FIFO Queue bounded by the summed size of the items in flight.
+
+    An item counts as in flight from `put` until the consumer calls `task_done`
+    for it. A single item bigger than the limit is still accepted once nothing
+    else is in flight, so huge files can't deadlock the queue.
+    """
+
+    def __init__(self, max_bytes: int):
+        self._max_bytes = max_bytes
+        self._in_flight = 0
+        self._items = deque()
+        self._condition = threading.Condition()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def put(self, item, size: int = 0) -> None:
+        with self._condition:
+            while self._in_flight and self._in_flight + size > self._max_bytes:
+                self._condition.wait()
+
+            self._in_flight += size
+            self._items.append((item, size))
+            self._condition.notify_all()
+
+    def get(self):
+        """
+        Returns:
+            tuple: (item, size) of the oldest item
+        """
+        with self._condition:
+            while not self._items:
+                self._condition.wait()
+
+            return self._items.popleft()
+
+    def task_done(self, size: int = 0) -> None:
+        with self._condition:
+            self._in_flight -= size
+            self._condition.notify_all()
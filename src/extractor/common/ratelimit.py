@@ -0,0 +1,138 @@
+"""Rate limits shared by the processes acquiring from one provider"""
+
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+from extractor.common.tools import lock_file
+
+logger = logging.getLogger(__name__)
+
+# Directory of the buckets if none is given
+DEFAULT_DIRECTORY = Path(tempfile.gettempdir()) / "cloudxtract-ratelimit"
+
+# tokens, monotonic time of the last refill
+STATE = struct.Struct("<dd")
+
+
+class SharedTokenBucket:
+    """
+    Token bucket in a memory-mapped file, shared by every process (and
+    thread) opening the same `path`. It fills with `rate` tokens per second
+    up to `capacity`, by default a second's worth.
+
+    Takes larger than what is available leave the bucket in debt, so a
+    megabyte chunk under a kilobyte budget waits as long as it should
+    instead of never fitting. The refill uses the system-wide monotonic
+    clock; the processes sharing a bucket should use the same rate.
+    """
+
+    def __init__(self, path, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+
+        self._path = Path(path)
+        self._rate = float(rate)
+        self._capacity = float(capacity if capacity is not None else rate)
+        self._lock = threading.Lock()  # flock doesn't exclude the own threads
+
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(str(self._path), os.O_RDWR | os.O_CREAT, 0o600)
+        with lock_file(self._fd):
+            new = os.fstat(self._fd).st_size < STATE.size
+            if new:
+                os.ftruncate(self._fd, STATE.size)
+            self._map = mmap.mmap(self._fd, STATE.size)
+            if new:
+                STATE.pack_into(self._map, 0, self._capacity, time.monotonic())
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def _take(self, amount: float) -> float:
+        """Take `amount` tokens or return the seconds until they're there"""
+        with self._lock, lock_file(self._fd):
+            tokens, stamp = STATE.unpack_from(self._map)
+            now = time.monotonic()
+            if now > stamp:
+                tokens = min(self._capacity, tokens + (now - stamp) * self._rate)
+            needed = min(amount, self._capacity)
+            if tokens >= needed:
+                STATE.pack_into(self._map, 0, tokens - amount, now)
+                return 0.0
+            STATE.pack_into(self._map, 0, tokens, now)
+            return (needed - tokens) / self._rate
+
+    def acquire(self, amount: float = 1.0):
+        """Wait until `amount` tokens are taken"""
+        while True:
+            wait = self._take(amount)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+            os.close(self._fd)
+
+
+class RateLimit:
+    """
+    Request and byte budgets of a provider: the hosts under its `domains`
+    (e.g. "pcloud.com" for api.pcloud.com and its download servers) share
+    buckets in `directory` with every process limited the same way.
+    """
+
+    def __init__(
+        self,
+        domains: Iterable[str],
+        requests_per_second: Optional[float] = None,
+        bytes_per_second: Optional[float] = None,
+        directory=None,
+    ):
+        self.domains = tuple(domain.lower().lstrip(".") for domain in domains)
+        if not self.domains:
+            raise ValueError("a rate limit needs the domains of its provider")
+
+        directory = Path(directory) if directory is not None else DEFAULT_DIRECTORY
+        name = self.domains[0]
+        self.requests = None
+        self.bytes = None
+        if requests_per_second:
+            self.requests = SharedTokenBucket(
+                directory / f"{name}.requests", requests_per_second
+            )
+        if bytes_per_second:
+            self.bytes = SharedTokenBucket(directory / f"{name}.bytes", bytes_per_second)
+
+    def applies_to(self, host: str) -> bool:
+        host = host.lower().rpartition("@")[2].partition(":")[0]
+        return any(host == domain or host.endswith("." + domain) for domain in self.domains)
+
+    def request(self):
+        """Wait for the budget of a request"""
+        if self.requests is not None:
+            self.requests.acquire()
+
+    def transferred(self, size: int):
+        """Account `size` bytes received, waiting while the budget is used up"""
+        if self.bytes is not None and size > 0:
+            self.bytes.acquire(size)
+
+    def close(self):
+        for bucket in (self.requests, self.bytes):
+            if bucket is not None:
+                bucket.close()
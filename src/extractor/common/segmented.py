@@ -0,0 +1,184 @@
+"""
+Segmented Download of large Files
+"""
+import io
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+from extractor.common.stream import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_RETRIES,
+    ResumableStream,
+    close_stream,
+    iter_chunks,
+)
+
+# Files from this size on are downloaded in segments
+DEFAULT_SEGMENT_THRESHOLD = 64 * 1024 * 1024
+
+if hasattr(os, "pwrite"):
+
+    def _pwrite(fd: int, data, offset: int, lock) -> None:
+        data = memoryview(data)
+        while data:
+            written = os.pwrite(fd, data, offset)
+            data = data[written:]
+            offset += written
+
+    def _preadinto(fd: int, buffer, offset: int, lock) -> int:
+        return os.preadv(fd, [buffer], offset)
+
+else:  # Windows
+
+    def _pwrite(fd: int, data, offset: int, lock) -> None:
+        with lock:
+            os.lseek(fd, offset, os.SEEK_SET)
+            data = memoryview(data)
+            while data:
+                data = data[os.write(fd, data) :]
+
+    def _preadinto(fd: int, buffer, offset: int, lock) -> int:
+        with lock:
+            os.lseek(fd, offset, os.SEEK_SET)
+            data = os.read(fd, len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+class SegmentedStream(io.RawIOBase):
+    """
+    Downloads a file as `segments` byte ranges at once.
+
+    Every range is fetched on its own thread, resumed on errors like any
+    other download, and written into place in a preallocated file: the
+    `destination` of the content if its consumer writes it unchanged (see
+    `Plugin.content_destination`), otherwise a spool in `spool_dir`.
+    Reading is sequential: the content is served as soon as the ranges
+    before it have arrived, so the consumers start while the download is
+    still running. A consumer of the destination only reads to wait for
+    the download (and its digests), the file is written already.
+
+    `open_range(offset, length)` returns a stream of that part of the content.
+    """
+
+    def __init__(
+        self,
+        open_range: Callable[[int, int], io.RawIOBase],
+        size: int,
+        segments: int = 4,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        retries: int = DEFAULT_RETRIES,
+        destination=None,
+        spool_dir=None,
+    ):
+        self._open_range = open_range
+        self._size = size
+        self._chunk_size = chunk_size
+        self._retries = retries
+        self._segment_size = -(-size // max(1, segments))  # ceil
+        self._offset = 0
+
+        self._destination = None if destination is None else Path(destination)
+        if self._destination is not None:
+            self._spool = open(self._destination, "w+b")
+        else:
+            self._spool = tempfile.TemporaryFile(dir=spool_dir)
+        self._spool.truncate(size)
+        self._fd = self._spool.fileno()
+        self._fd_lock = threading.Lock()  # only used without pwrite
+
+        starts = range(0, size, self._segment_size)
+        self._filled = [0] * len(starts)
+        self._condition = threading.Condition()
+        self._error = None
+        self._stopped = False
+        self._running = len(starts)
+
+        for index, start in enumerate(starts):
+            length = min(self._segment_size, size - start)
+            threading.Thread(
+                target=self._fetch,
+                args=(index, start, length),
+                name=f"segment-{index}",
+                daemon=True,
+            ).start()
+
+    def _fetch(self, index: int, start: int, length: int):
+        try:
+            stream = ResumableStream(
+                lambda offset: self._open_range(start + offset, length - offset),
+                length,
+                retries=self._retries,
+            )
+            try:
+                position = start
+                for chunk in iter_chunks(stream, self._chunk_size):
+                    if self._stopped:
+                        return
+
+                    _pwrite(self._fd, chunk, position, self._fd_lock)
+                    position += len(chunk)
+                    with self._condition:
+                        self._filled[index] += len(chunk)
+                        self._condition.notify_all()
+            finally:
+                close_stream(stream)
+        except Exception as ex:
+            with self._condition:
+                if self._error is None:
+                    self._error = ex
+                self._condition.notify_all()
+        finally:
+            with self._condition:
+                self._running -= 1
+                # the spool is closed by the last thread using it
+                if self._stopped and not self._running:
+                    self._spool.close()
+
+    @property
+    def destination(self) -> Optional[Path]:
+        """The file the content is written to, None if it's spooled"""
+        return self._destination
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._offset >= self._size:
+            return 0
+
+        index = self._offset // self._segment_size
+        start = index * self._segment_size
+        with self._condition:
+            while start + self._filled[index] <= self._offset:
+                if self._error is not None:
+                    raise self._error
+                self._condition.wait()
+            available = start + self._filled[index] - self._offset
+
+        size = _preadinto(
+            self._fd, memoryview(b)[: min(len(b), available)], self._offset, self._fd_lock
+        )
+        self._offset += size
+        return size
+
+    def close(self):
+        with self._condition:
+            if not self._stopped:
+                self._stopped = True
+                if not self._running:
+                    self._spool.close()
+        super().close()
+
+
+def stream_destination(stream) -> Optional[Path]:
+    """File a content stream is downloaded into by a SegmentedStream, if any"""
+    while stream is not None:
+        if isinstance(stream, SegmentedStream):
+            return stream.destination
+        stream = getattr(stream, "source", None)
+
+    return None
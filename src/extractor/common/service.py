@@ -4,8 +4,12 @@
 from abc import ABC
 from abc import abstractmethod
 from abc import abstractproperty
+from typing import Iterable, Iterator, Optional, Tuple, Union
 from extractor.data import User
 from extractor.data import File
+from extractor.data import Folder
+from extractor.common.tokencache import TokenCache, TokenEntry
+from extractor.common.walker import walk_tree
 
 
 class CloudService(ABC):
@@ -13,6 +17,22 @@ class CloudService(ABC):
     Abstract Baseclass for Cloudservices
     """
 
+    # Number of directory listings running in parallel during a walk. A
+    # service raises it once its client is known to be safe across threads.
+    list_concurrency = 1
+
+    # Domains of the hosts of the service, see Transport.limit_rate
+    domains: Tuple[str, ...] = ()
+
+    # Logins reuse the tokens of earlier runs from this cache
+    token_cache: Optional[TokenCache] = None
+
+    def cached_tokens(self, username: str, password: str) -> Optional[TokenEntry]:
+        """Entry of the account in the token_cache, None without cache"""
+        if self.token_cache is None:
+            return None
+        return self.token_cache.entry(type(self).__name__, username, password)
+
     @abstractmethod
     def login(self, username, password):
         pass
@@ -20,3 +40,42 @@ class CloudService(ABC):
     @abstractproperty
     def user(self) -> User:
         pass
+
+    @abstractmethod
+    def list_children(
+        self, folder: Optional[Folder]
+    ) -> Iterable[Union[Folder, File]]:
+        """
+        List the folders and files directly inside a folder.
+
+        Args:
+            folder (Folder): Folder to list, None for the root folder
+        """
+
+    def walk(self, prune=None, listed=None, failed=None) -> Iterator[Union[Folder, File]]:
+        """
+        Traverse the remote tree once and yield its folders and files.
+
+        A folder is always yielded before anything it contains. Every folder
+        is listed exactly once, up to `list_concurrency` listings in parallel.
+        See `walk_tree` for `prune`, `listed` and `failed`.
+        """
+        return walk_tree(
+            self.list_children,
+            max_workers=self.list_concurrency,
+            prune=prune,
+            listed=listed,
+            failed=failed,
+        )
+
+    @property
+    def folders(self) -> Iterator[Folder]:
+        for node in self.walk():
+            if isinstance(node, Folder):
+                yield node
+
+    @property
+    def files(self) -> Iterator[File]:
+        for node in self.walk():
+            if isinstance(node, File):
+                yield node
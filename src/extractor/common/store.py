@@ -0,0 +1,240 @@
+"""
+Content-addressed Store of file contents
+"""
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import stat
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+ALGORITHM = "sha256"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    hashes TEXT
+);
+CREATE TABLE IF NOT EXISTS aliases (
+    algorithm TEXT NOT NULL,
+    value TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    PRIMARY KEY (algorithm, value)
+);
+CREATE INDEX IF NOT EXISTS objects_size ON objects (size);
+"""
+
+# ioctl cloning a file on Linux (btrfs, XFS, ...)
+FICLONE = 0x40049409
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def _reflink(source: Path, destination: Path) -> bool:
+    if fcntl is None or not sys.platform.startswith("linux"):
+        return False
+
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            cloned = False
+        else:
+            cloned = True
+
+    if not cloned:
+        destination.unlink()
+    return cloned
+
+
+def link_or_copy(source: Path, destination: Path):
+    """
+    Place the content of `source` at `destination`: as a reflink where the
+    filesystem supports it, otherwise a hardlink, otherwise a copy
+    """
+    if destination.exists():
+        if destination.samefile(source):
+            return
+        destination.unlink()
+
+    if _reflink(source, destination):
+        return
+
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+class ContentStore:
+    """
+    Stores file contents once, by their SHA-256, for any number of
+    acquisitions.
+
+    The objects are kept read-only under `objects/`, an SQLite index keeps
+    their size and digests plus aliases: checksums of the same content by
+    other algorithms, including the ones the services report before a
+    download (see `File.get_checksums`). A file whose checksum is known to
+    the store doesn't need to be downloaded again.
+    """
+
+    def __init__(self, path, commit_interval: float = 1.0):
+        self._path = Path(path).absolute()
+        self._commit_interval = commit_interval
+        self._lock = threading.Lock()
+
+        self._path.joinpath("objects").mkdir(parents=True, exist_ok=True)
+        self._path.joinpath("tmp").mkdir(exist_ok=True)
+
+        self._db = sqlite3.connect(
+            str(self._path.joinpath("index.sqlite")), timeout=30, check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._committed_at = time.monotonic()
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def object_path(self, digest: str) -> Path:
+        return self._path.joinpath("objects", digest[:2], digest[2:4], digest)
+
+    def _commit(self, force: bool = False):
+        now = time.monotonic()
+        if force or now - self._committed_at >= self._commit_interval:
+            self._db.commit()
+            self._committed_at = now
+
+    def has_size(self, size: int) -> bool:
+        """Whether the store holds any content of that size"""
+        with self._lock:
+            return (
+                self._db.execute(
+                    "SELECT 1 FROM objects WHERE size = ? LIMIT 1", (size,)
+                ).fetchone()
+                is not None
+            )
+
+    def lookup(self, checksums: Dict[str, str], size: int) -> Optional[str]:
+        """
+        Returns:
+            str: SHA-256 of the stored content with one of the checksums
+                 and that size, None if there is none
+        """
+        with self._lock:
+            for algorithm, value in checksums.items():
+                if algorithm == ALGORITHM:
+                    row = self._db.execute(
+                        "SELECT sha256 FROM objects WHERE sha256 = ? AND size = ?",
+                        (value.lower(), size),
+                    ).fetchone()
+                else:
+                    row = self._db.execute(
+                        "SELECT objects.sha256 FROM aliases"
+                        " JOIN objects ON objects.sha256 = aliases.sha256"
+                        " WHERE algorithm = ? AND value = ? AND size = ?",
+                        (algorithm, value.lower(), size),
+                    ).fetchone()
+
+                if row is not None and self.object_path(row[0]).exists():
+                    return row[0]
+
+        return None
+
+    def hashes(self, digest: str) -> Dict[str, str]:
+        """All digests known of a stored content"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT hashes FROM objects WHERE sha256 = ?", (digest,)
+            ).fetchone()
+
+        hashes = json.loads(row[0] or "{}") if row else {}
+        hashes[ALGORITHM] = digest
+        return hashes
+
+    def spool(self):
+        """Temporary file in the store for a content to be added"""
+        return tempfile.NamedTemporaryFile(
+            dir=self._path.joinpath("tmp"), delete=False, buffering=0
+        )
+
+    def add(
+        self,
+        spool_path,
+        digest: str,
+        size: int,
+        hashes: Optional[Dict[str, str]] = None,
+        aliases: Optional[Dict[str, str]] = None,
+    ) -> Path:
+        """
+        Move a spooled content into the store, unless it is there already.
+
+        Args:
+            spool_path: the spooled content, see `spool`
+            digest (str): SHA-256 of the content
+            size (int): size of the content
+            hashes (dict): further digests computed of the content
+            aliases (dict): checksums the service reported for it
+
+        Returns:
+            Path: the stored object
+        """
+        target = self.object_path(digest)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.chmod(spool_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        try:
+            os.link(spool_path, target)
+        except FileExistsError:
+            pass  # stored meanwhile, by another download of the same content
+        finally:
+            os.unlink(spool_path)
+
+        hashes = {
+            name: value.lower()
+            for name, value in (hashes or {}).items()
+            if name != ALGORITHM
+        }
+        with self._lock:
+            row = self._db.execute(
+                "SELECT hashes FROM objects WHERE sha256 = ?", (digest,)
+            ).fetchone()
+            if row is not None:
+                hashes = {**json.loads(row[0] or "{}"), **hashes}
+
+            self._db.execute(
+                "INSERT OR REPLACE INTO objects (sha256, size, hashes) VALUES (?, ?, ?)",
+                (digest, size, json.dumps(hashes) if hashes else None),
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO aliases (algorithm, value, sha256)"
+                " VALUES (?, ?, ?)",
+                [
+                    (algorithm, value.lower(), digest)
+                    for algorithm, value in {**hashes, **(aliases or {})}.items()
+                    if algorithm != ALGORITHM and value
+                ],
+            )
+            self._commit()
+
+        return target
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._commit(force=True)
+                self._db.close()
+                self._db = None
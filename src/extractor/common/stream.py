@@ -0,0 +1,382 @@
+"""
+Content Streams of the Cloudservices
+"""
+import http.client
+import io
+import logging
+import socket
+import threading
+import time
+import weakref
+from typing import Callable, Iterable, Iterator, Optional
+
+import requests
+import urllib3
+
+from extractor.errors import DownloadError
+
+logger = logging.getLogger(__name__)
+
+# Size of the buffers file content is read into
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# Attempts to resume an interrupted download without progress in between
+DEFAULT_RETRIES = 5
+
+# Seconds a read may go without returning a byte before the download is
+# aborted and resumed
+DEFAULT_STALL_TIMEOUT = 30.0
+# Bytes a watched read asks for at first, doubled while reads are fast
+STALL_READ_SIZE = 64 * 1024
+
+
+class ResponseStream(io.RawIOBase):
+    """
+    Readable stream on the body of a streamed `requests` response.
+
+    `readinto()` reads straight into the caller's buffer. If the body isn't
+    content-encoded, the bytes go from the socket into the buffer without an
+    intermediate copy; compressed bodies are decoded by urllib3 first.
+
+    The connection returns to the pool of the transport once the body is
+    read completely, like it does after urllib3's own reads.
+    """
+
+    def __init__(self, response):
+        self._response = response
+        # byte budget of the provider (see Transport.limit_rate)
+        self._rate_limit = getattr(response, "rate_limit", None)
+
+        encoding = response.headers.get("Content-Encoding", "identity").lower()
+        self._fp = getattr(response.raw, "_fp", None)  # http.client.HTTPResponse
+        if encoding == "identity" and hasattr(self._fp, "readinto"):
+            self._readinto = self._identity_readinto
+        else:
+            self._readinto = self._decoded_readinto
+
+    @property
+    def response(self):
+        return self._response
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        size = self._readinto(b)
+        if self._rate_limit is not None and size:
+            self._rate_limit.transferred(size)
+        return size
+
+    def _identity_readinto(self, b):
+        size = self._fp.readinto(b)
+        # http.client closes its side at the end of the body; urllib3 didn't
+        # see it, so it would drop the connection on close
+        if self._fp.isclosed():
+            self._response.raw.release_conn()
+        return size
+
+    def _decoded_readinto(self, b):
+        data = self._response.raw.read(len(b), decode_content=True)
+        size = len(data)
+        b[:size] = data
+        return size
+
+    def abort(self):
+        """Interrupt a read blocked in another thread"""
+        sock = _response_socket(self._response)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def close(self):
+        if not self.closed:
+            self._response.close()
+        super().close()
+
+
+def _response_socket(response) -> Optional[socket.socket]:
+    raw = response.raw
+    connection = getattr(raw, "_connection", None)
+    sock = getattr(connection, "sock", None)
+    if sock is None:
+        # the socket file of http.client
+        fp = getattr(getattr(raw, "_fp", None), "fp", None)
+        sock = getattr(getattr(fp, "raw", None), "_sock", None)
+    return sock
+
+
+class IterableStream(io.RawIOBase):
+    """
+    Readable stream on an iterable of bytestrings.
+
+    The pending part of a chunk is kept as a memoryview, so every byte is
+    copied once, into the caller's buffer.
+    """
+
+    def __init__(self, iterable: Iterable[bytes]):
+        self._iterator = iter(iterable)
+        self._chunk = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._chunk:
+            try:
+                self._chunk = memoryview(next(self._iterator))
+            except StopIteration:
+                return 0  # EOF
+
+        size = min(len(b), len(self._chunk))
+        b[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        return size
+
+
+def readinto(source, buffer) -> int:
+    """readinto() on streams which may only provide read()"""
+    if hasattr(source, "readinto"):
+        return source.readinto(buffer) or 0
+
+    data = source.read(len(buffer))
+    size = len(data)
+    buffer[:size] = data
+    return size
+
+
+def iter_chunks(source, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[memoryview]:
+    """
+    Read a stream into a single reused buffer and yield the filled part.
+
+    The yielded memoryview is only valid until the next chunk is read.
+    """
+    view = memoryview(bytearray(chunk_size))
+    while True:
+        size = readinto(source, view)
+        if not size:
+            return
+        yield view[:size]
+
+
+def close_stream(stream) -> None:
+    """Close a content stream, releasing its connection"""
+    close = getattr(stream, "close", None)
+    if close is not None:
+        close()
+
+
+def abort_stream(stream) -> None:
+    """Interrupt a read of a content stream blocked in another thread"""
+    abort = getattr(stream, "abort", None)
+    if abort is not None:
+        abort()
+
+
+class StallWatchdog:
+    """
+    Thread checking the ResumableStreams for reads without progress once a
+    second, it starts with the first stream watched
+    """
+
+    def __init__(self, interval: float = 1.0):
+        self._interval = interval
+        self._streams = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def watch(self, stream: "ResumableStream"):
+        with self._lock:
+            self._streams.add(stream)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="extractor-stall-watchdog", daemon=True
+                )
+                self._thread.start()
+
+    def unwatch(self, stream: "ResumableStream"):
+        with self._lock:
+            self._streams.discard(stream)
+
+    def _run(self):
+        while True:
+            time.sleep(self._interval)
+            with self._lock:
+                streams = list(self._streams)
+            now = time.monotonic()
+            for stream in streams:
+                stream._check_stall(now)
+
+
+WATCHDOG = StallWatchdog()
+
+
+def range_header(offset: int, length: Optional[int] = None) -> dict:
+    """Request headers for `length` bytes of the content from `offset` on"""
+    if length is not None:
+        return {"Range": f"bytes={offset}-{offset + length - 1}"}
+
+    return {"Range": f"bytes={offset}-"} if offset else {}
+
+
+def check_range(response, offset: int, length: Optional[int] = None):
+    """Make sure a response to a range request starts at `offset`"""
+    if (offset or length is not None) and response.status_code != 206:
+        response.close()
+        raise DownloadError(
+            f"Can't resume at byte {offset}, the server answered {response.status_code}"
+        )
+
+
+def _resumable(error: Exception) -> bool:
+    if isinstance(error, requests.HTTPError):
+        # retrying doesn't help with client errors
+        return error.response is None or error.response.status_code >= 500
+
+    return isinstance(
+        error, (OSError, http.client.HTTPException, urllib3.exceptions.HTTPError)
+    )
+
+
+class ResumableStream(io.RawIOBase):
+    """
+    Content stream resuming the download at the current offset when the
+    connection drops or the content ends early.
+
+    `open_at(offset)` returns a stream of the content from `offset` on. At
+    most `retries` attempts in a row are made without progress, waiting
+    `backoff` seconds, doubled after each attempt. With a known `size` the
+    stream fails unless exactly that many bytes were read.
+
+    A read returning no byte for `stall_timeout` seconds is aborted (see
+    StallWatchdog) and resumed like a dropped connection. Reads ask for
+    STALL_READ_SIZE bytes at first, doubled up to the caller's buffer while
+    they return quickly, so slow but progressing downloads don't stall.
+    """
+
+    def __init__(
+        self,
+        open_at: Callable[[int], io.RawIOBase],
+        size: Optional[int] = None,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = 1.0,
+        stall_timeout: Optional[float] = DEFAULT_STALL_TIMEOUT,
+    ):
+        self._open_at = open_at
+        self._size = size
+        self._retries = retries
+        self._backoff = backoff
+        self._stall_timeout = stall_timeout
+        self._read_size = STALL_READ_SIZE
+        self._reading_since = None
+        self._stalled = False
+        self._offset = 0
+        self._eof = False
+        self._stream = open_at(0)
+        if stall_timeout:
+            WATCHDOG.watch(self)
+
+    @property
+    def offset(self) -> int:
+        return self._offset
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._eof:
+            return 0
+
+        failures = 0
+        while True:
+            try:
+                if self._stream is None:
+                    self._stream = self._open_at(self._offset)
+                size = self._read(b)
+            except Exception as error:
+                if not (self._stalled or _resumable(error)) or failures >= self._retries:
+                    raise
+                reason = error
+            else:
+                if size:
+                    self._offset += size
+                    return size
+                if self._stalled:
+                    # the watchdog aborted the read, the content didn't end
+                    if failures >= self._retries:
+                        raise DownloadError(
+                            f"No progress for {self._stall_timeout:g}s"
+                            f" at byte {self._offset}"
+                        )
+                    reason = None
+                elif self._size is None or self._offset >= self._size:
+                    break
+                elif failures >= self._retries:
+                    break
+                else:
+                    reason = "content ended early"
+
+            if self._stalled:
+                self._stalled = False
+                reason = f"no progress for {self._stall_timeout:g}s"
+                self._read_size = STALL_READ_SIZE
+            failures += 1
+            logger.warning(
+                "Download interrupted at byte %d (%s), resuming", self._offset, reason
+            )
+            self._close_stream()
+            time.sleep(self._backoff * 2 ** (failures - 1))
+
+        self._eof = True
+        if self._size is not None and self._offset != self._size:
+            raise DownloadError(f"Expected {self._size} bytes, got {self._offset}")
+
+        return 0
+
+    def _read(self, b) -> int:
+        if not self._stall_timeout:
+            return readinto(self._stream, b)
+
+        view = memoryview(b).cast("B")
+        if len(view) > self._read_size:
+            view = view[: self._read_size]
+
+        started = self._reading_since = time.monotonic()
+        try:
+            size = readinto(self._stream, view)
+        finally:
+            self._reading_since = None
+
+        if (
+            size == len(view)
+            and time.monotonic() - started < self._stall_timeout / 8
+            and self._read_size < len(b)
+        ):
+            self._read_size *= 2
+        return size
+
+    def _check_stall(self, now: float):
+        started = self._reading_since
+        if started is None or self._stalled or now - started < self._stall_timeout:
+            return
+
+        stream = self._stream
+        if getattr(stream, "abort", None) is None:
+            return  # only the read timeout of the connection helps
+
+        self._stalled = True
+        abort_stream(stream)
+
+    def _close_stream(self):
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            try:
+                close_stream(stream)
+            except Exception:
+                pass
+
+    def close(self):
+        WATCHDOG.unwatch(self)
+        self._close_stream()
+        super().close()
@@ -0,0 +1,98 @@
+import io
+import tempfile
+import threading
+
+from extractor.common.stream import DEFAULT_CHUNK_SIZE, readinto
+
+
+class ContentTee:
+    """
+    Fans a single source stream out to several readers.
+
+    The source is read only once. Every chunk is appended to a temporary spool
+    file, so each reader can consume the content at its own pace: the reader
+    in front pulls the next chunk from the source, readers behind it are
+    served from the spool. The latest chunk is kept in memory, so readers
+    keeping up with each other don't touch the spool at all.
+    """
+
+    def __init__(self, source, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self._source = source
+        self._chunk_size = chunk_size
+        self._spool = tempfile.TemporaryFile()
+        self._length = 0
+        self._eof = False
+        self._buffer = None
+        self._head = memoryview(b"")  # latest chunk, starting at self._length - len(self._head)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, exception_traceback):
+        self.close()
+
+    def close(self):
+        self._spool.close()
+
+    @property
+    def source(self):
+        return self._source
+
+    def reader(self) -> "TeeReader":
+        return TeeReader(self)
+
+    def _fill(self):
+        # the head is only read under the lock, so its buffer can be reused
+        if self._buffer is None:
+            self._buffer = memoryview(bytearray(self._chunk_size))
+
+        self._head = memoryview(b"")
+        size = readinto(self._source, self._buffer)
+        if not size:
+            self._eof = True
+            return
+
+        chunk = self._buffer[:size]
+        self._spool.seek(self._length)
+        self._spool.write(chunk)
+        self._length += size
+        self._head = chunk
+
+    def readinto_at(self, offset: int, buffer) -> int:
+        with self._lock:
+            while offset >= self._length and not self._eof:
+                self._fill()
+
+            if offset >= self._length:
+                return 0  # EOF
+
+            size = min(len(buffer), self._length - offset)
+            head_offset = self._length - len(self._head)
+            if offset >= head_offset:
+                start = offset - head_offset
+                buffer[:size] = self._head[start : start + size]
+                return size
+
+            self._spool.seek(offset)
+            return self._spool.readinto(memoryview(buffer)[:size])
+
+
+class TeeReader(io.RawIOBase):
+    """Independent read position on a ContentTee"""
+
+    def __init__(self, tee: ContentTee):
+        self._tee = tee
+        self._offset = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        size = self._tee.readinto_at(self._offset, b)
+        self._offset += size
+        return size
+
+    @property
+    def source(self):
+        return self._tee.source
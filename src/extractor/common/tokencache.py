@@ -0,0 +1,185 @@
+"""Encrypted cache of the login tokens of the services"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+import requests
+
+from extractor.common.tools import lock_file
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # optional, pip install extractor[tokencache]
+    Fernet = None
+
+logger = logging.getLogger(__name__)
+
+# File of the cache if none is given
+DEFAULT_PATH = Path.home() / ".cache" / "cloudxtract" / "tokens.json"
+# PBKDF2 rounds deriving the key of an entry from its secret
+KDF_ITERATIONS = 200_000
+# Tokens expiring within this many seconds count as expired
+EXPIRY_MARGIN = 60.0
+
+
+class TokenCache:
+    """
+    Tokens of logged-in accounts in a local file, so a run against an
+    account logged in before skips the login handshake.
+
+    Each entry is encrypted (Fernet) with a key derived from `passphrase`,
+    by default from the password of the account: reading the tokens takes
+    what logging in takes anyway. Entries are found by a hash of service
+    and username; after a password change the entry can't be decrypted and
+    counts as missing.
+
+    The clients use cached tokens without checking them first. A token the
+    service rejects is discarded and the client logs in again.
+    """
+
+    def __init__(self, path=None, passphrase: Optional[str] = None):
+        if Fernet is None:
+            raise ImportError(
+                "The TokenCache requires cryptography, pip install extractor[tokencache]"
+            )
+
+        self.path = Path(path) if path is not None else DEFAULT_PATH
+        self._passphrase = passphrase
+        self._lock = threading.Lock()  # flock doesn't exclude the own threads
+
+    def entry(self, service: str, username: str, password: str) -> "TokenEntry":
+        """Entry of an account, `password` is the secret unless a passphrase is set"""
+        key = hashlib.sha256(f"{service}\0{username.lower()}".encode("utf-8"))
+        secret = self._passphrase if self._passphrase is not None else password
+        return TokenEntry(self, key.hexdigest(), secret)
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as ex:
+            logger.warning("Token cache %s unreadable: %s", self.path, ex)
+            return {}
+
+    def _update(self, key: str, value: Optional[dict]):
+        """Set or, with None, remove an entry, keeping those of other processes"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lock = self.path.with_name(self.path.name + ".lock")
+        with self._lock:
+            fd = os.open(str(lock), os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                with lock_file(fd):
+                    now = time.time()
+                    entries = {
+                        k: v
+                        for k, v in self._read().items()
+                        if v.get("expires") is None or v["expires"] > now
+                    }
+                    if value is None:
+                        entries.pop(key, None)
+                    else:
+                        entries[key] = value
+                    self._write(entries)
+            finally:
+                os.close(fd)
+
+    def _write(self, entries: dict):
+        # created readable by the owner only
+        fd, temporary = tempfile.mkstemp(
+            dir=self.path.parent, prefix=self.path.name, suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(temporary, self.path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+
+class TokenEntry:
+    """The cached tokens of one account"""
+
+    def __init__(self, cache: TokenCache, key: str, secret: str):
+        self._cache = cache
+        self._key = key
+        self._secret = secret.encode("utf-8")
+        self._salt = None
+        self._fernet = None
+
+    def _cipher(self, salt: bytes) -> "Fernet":
+        # the derivation is slow on purpose, it's done once per salt
+        if self._fernet is None or salt != self._salt:
+            derived = hashlib.pbkdf2_hmac("sha256", self._secret, salt, KDF_ITERATIONS)
+            self._fernet = Fernet(base64.urlsafe_b64encode(derived))
+            self._salt = salt
+        return self._fernet
+
+    def load(self) -> Optional[dict]:
+        """The cached tokens, None if there are none or they expired"""
+        stored = self._cache._read().get(self._key)
+        if stored is None:
+            return None
+
+        expires = stored.get("expires")
+        if expires is not None and expires - EXPIRY_MARGIN <= time.time():
+            return None
+
+        try:
+            cipher = self._cipher(base64.b64decode(stored["salt"]))
+            return json.loads(cipher.decrypt(stored["tokens"].encode("ascii")))
+        except (KeyError, ValueError, InvalidToken):
+            logger.debug("Cached tokens %s not readable", self._key[:12])
+            return None
+
+    def store(self, tokens: dict, expires: Optional[float] = None):
+        """Cache `tokens` (JSON-serializable) until the epoch time `expires`"""
+        salt = self._salt if self._salt is not None else os.urandom(16)
+        cipher = self._cipher(salt)
+        self._cache._update(
+            self._key,
+            {
+                "salt": base64.b64encode(salt).decode("ascii"),
+                "tokens": cipher.encrypt(json.dumps(tokens).encode("utf-8")).decode(
+                    "ascii"
+                ),
+                "expires": expires,
+            },
+        )
+
+    def discard(self):
+        self._cache._update(self._key, None)
+
+
+def renew_on_unauthorized(session: requests.Session, renew: Callable[[str], bool]):
+    """
+    Send the requests of `session` rejected with 401 once more after
+    `renew(rejected)` put a new token into its Authorization header. `renew`
+    gets the rejected header and returns False if there's nothing to retry
+    with, e.g. because the token was fresh.
+    """
+
+    def resend(response, **kwargs):
+        if response.status_code != 401:
+            return response
+
+        rejected = response.request.headers.get("Authorization")
+        if not renew(rejected):
+            return response
+
+        request = response.request.copy()
+        request.headers["Authorization"] = session.headers["Authorization"]
+        response.close()
+        return session.send(request, **kwargs)
+
+    session.hooks["response"].append(resend)
@@ -1,5 +1,18 @@
 import re
 import io
+import os
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional
+
+from extractor.common.stream import IterableStream
+from extractor.data.model import parse_timestamp
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 camel_to_snake_pattern = re.compile("(.)([A-Z][a-z]+)")
 camel_to_snake_pattern2 = re.compile("([a-z0-9])([A-Z])")
@@ -12,6 +25,20 @@ def camel_to_snake(name):
     return camel_to_snake_pattern2.sub(r"\1_\2", name).lower()
 
 
+def to_epoch(value) -> Optional[float]:
+    """Seconds since the epoch of a timestamp as the services deliver it"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+
+    value = parse_timestamp(value)
+    if not isinstance(value, datetime):
+        return None
+
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
 def iterable_to_stream(
     iterable, buffer_size=io.DEFAULT_BUFFER_SIZE
 ) -> io.BufferedReader:
@@ -19,28 +46,9 @@ def iterable_to_stream(
     Lets you use an iterable (e.g. a generator) that yields bytestrings as a read-only
     input stream.
 
-    The stream implements Python 3's newer I/O API (available in Python 2's io module).
-    For efficiency, the stream is buffered.
+    Kept for compatibility, the services return an IterableStream or ResponseStream.
     """
-
-    class IterStream(io.RawIOBase):
-        def __init__(self):
-            self.leftover = None
-
-        def readable(self):
-            return True
-
-        def readinto(self, b):
-            try:
-                length = len(b)  # We're supposed to return at most this much
-                chunk = self.leftover or next(iterable)
-                output, self.leftover = chunk[:length], chunk[length:]
-                b[: len(output)] = output
-                return len(output)
-            except StopIteration:
-                return 0  # indicate EOF
-
-    return io.BufferedReader(IterStream(), buffer_size=buffer_size)
+    return io.BufferedReader(IterableStream(iterable), buffer_size=buffer_size)
 
 
 class RequiredParameterCheck(object):
@@ -69,3 +77,27 @@ class RequiredParameterCheck(object):
         wrapper.__dict__.update(func.__dict__)
         wrapper.__doc__ = func.__doc__
         return wrapper
+
+
+@contextmanager
+def lock_file(fd: int):
+    """Hold an exclusive lock of the open file `fd`, shared by the processes"""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                break
+            except OSError:  # gave up after 10 attempts
+                continue
+        try:
+            yield
+        finally:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,428 @@
+"""HTTP connection pools shared by the service clients"""
+
+import atexit
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures import wait
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from extractor.common.limiter import MAX_BACKOFF, AdaptiveLimiter, backoff, retry_after
+from extractor.common.ratelimit import RateLimit
+
+logger = logging.getLogger(__name__)
+
+# seconds to connect and between two received bytes
+DEFAULT_TIMEOUT = (10.0, 60.0)
+# connections kept per host
+DEFAULT_POOL_SIZE = 10
+# hosts with a pool, e.g. API and download servers of the services
+POOL_HOSTS = 32
+# Failed connection attempts are retried by urllib3, the request wasn't sent
+CONNECT_RETRY = Retry(
+    total=3, read=False, redirect=False, status=0, respect_retry_after_header=False
+)
+# Retries of a request failing or throttled
+DEFAULT_RETRIES = 3
+# Threads sending the hedged requests and their duplicates
+HEDGE_THREADS = 128
+
+IDEMPOTENT = frozenset(("GET", "HEAD", "OPTIONS", "TRACE", "PUT", "DELETE", "PROPFIND"))
+# Header marking a request of an idempotent method to be sent once, neither
+# retried nor hedged, e.g. a GET with side effects. It isn't sent.
+SEND_ONCE = "X-Extractor-Send-Once"
+THROTTLING = frozenset((429, 503))
+UNAVAILABLE = frozenset((502, 504))
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+class TransportAdapter(HTTPAdapter):
+    """
+    HTTPAdapter limiting the requests in flight per host (AdaptiveLimiter)
+    and retrying them with jittered backoff.
+
+    Idempotent requests are retried after connection errors, timeouts and
+    502/503/504, others only after a 429: the service rejected them without
+    processing them. Retry-After is honoured up to MAX_BACKOFF seconds,
+    longer waits return the throttling response.
+
+    With `hedge`, idempotent requests without streamed body, i.e. the
+    metadata calls, get a duplicate when they take longer than the 95th
+    percentile of their host's latency; the first response wins. A few slow
+    listings don't hold up their subtrees that way.
+
+    Hosts under a RateLimit wait for its request budget before each
+    attempt; bodies count against its byte budget as they are read.
+    """
+
+    def __init__(
+        self,
+        timeout: Timeout,
+        retries: int,
+        hedge: bool = True,
+        shared: bool = False,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.timeout = timeout
+        self.retries = retries
+        self.hedge = hedge
+        # mounted by many sessions, closed by shutdown only
+        self.shared = shared
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+        self._limiters_lock = threading.Lock()
+        self._hedge_executor = None
+        self._rate_limits = []
+        self._rate_limit_of = {}  # host -> RateLimit or None
+
+    def limiter(self, url: str) -> AdaptiveLimiter:
+        host = urlsplit(url).netloc
+        limiter = self._limiters.get(host)
+        if limiter is None:
+            with self._limiters_lock:
+                limiter = self._limiters.setdefault(
+                    host, AdaptiveLimiter(host, self._pool_maxsize)
+                )
+        return limiter
+
+    def add_rate_limit(self, rate_limit: RateLimit):
+        with self._limiters_lock:
+            self._rate_limits.append(rate_limit)
+            self._rate_limit_of = {}
+
+    def rate_limit(self, url: str) -> Optional[RateLimit]:
+        host = urlsplit(url).netloc
+        try:
+            return self._rate_limit_of[host]
+        except KeyError:
+            pass
+
+        rate_limit = next((r for r in self._rate_limits if r.applies_to(host)), None)
+        self._rate_limit_of[host] = rate_limit
+        return rate_limit
+
+    def pinned(self) -> "TransportAdapter":
+        """
+        Adapter with a single connection, sharing the limiters and rate
+        limits of this one. It neither hedges nor retries: both would send
+        the request over another connection.
+        """
+        adapter = TransportAdapter(
+            self.timeout,
+            retries=0,
+            hedge=False,
+            pool_connections=1,
+            pool_maxsize=1,
+            max_retries=0,
+        )
+        adapter.limiter = self.limiter
+        adapter.rate_limit = self.rate_limit
+        return adapter
+
+    @property
+    def limiters(self) -> Dict[str, AdaptiveLimiter]:
+        with self._limiters_lock:
+            return dict(self._limiters)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **kwargs):
+        super().init_poolmanager(connections, maxsize, block, **kwargs)
+        for limiter in getattr(self, "_limiters", {}).values():
+            limiter.max_limit = maxsize
+
+    def send(self, request, stream=False, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = self.timeout
+
+        limiter = self.limiter(request.url)
+        rate_limit = self.rate_limit(request.url)
+        once = request.headers.pop(SEND_ONCE, None) is not None
+        idempotent = request.method.upper() in IDEMPOTENT and not once
+        attempt = 0
+        while True:
+            if rate_limit is not None:
+                rate_limit.request()
+            slot = limiter.acquire()
+            started = time.monotonic()
+            delay = None
+            try:
+                if self.hedge and idempotent and not stream:
+                    response = self._hedged_send(
+                        limiter, rate_limit, request, timeout=timeout, **kwargs
+                    )
+                else:
+                    response = super().send(request, stream=stream, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                slot.release()
+                limiter.failed()
+                if not idempotent or attempt >= self.retries:
+                    raise
+            else:
+                status = response.status_code
+                if status in THROTTLING:
+                    delay = retry_after(response)
+                    limiter.throttled(delay)
+                    retry = (idempotent or status == 429) and (
+                        delay is None or delay <= MAX_BACKOFF
+                    )
+                elif status in UNAVAILABLE:
+                    limiter.failed()
+                    retry = idempotent
+                else:
+                    limiter.success(time.monotonic() - started)
+                    retry = False
+
+                if not retry or attempt >= self.retries:
+                    if stream:
+                        slot.hold_until_closed(response)
+                        # ResponseStream accounts the bytes it reads
+                        response.rate_limit = rate_limit
+                    else:
+                        # the session reads the body right away
+                        slot.release()
+                        if rate_limit is not None:
+                            rate_limit.transferred(len(response.content))
+                    return response
+
+                response.close()
+                slot.release()
+
+            limiter.retried()
+            wait = backoff(attempt, delay)
+            logger.debug(
+                "Retrying %s %s in %.1fs (attempt %d)",
+                request.method,
+                request.url,
+                wait,
+                attempt + 1,
+            )
+            time.sleep(wait)
+            attempt += 1
+
+    def _hedged_send(
+        self,
+        limiter: AdaptiveLimiter,
+        rate_limit: Optional[RateLimit],
+        request,
+        **kwargs,
+    ):
+        delay = limiter.hedge_delay()
+        if delay is None:
+            return super().send(request, **kwargs)
+
+        with self._limiters_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(
+                    max_workers=HEDGE_THREADS, thread_name_prefix="extractor-hedge"
+                )
+        send = super().send
+        primary = self._hedge_executor.submit(send, request, **kwargs)
+        try:
+            return primary.result(timeout=delay)
+        except FutureTimeout:
+            pass
+
+        if rate_limit is not None:
+            rate_limit.request()
+        limiter.hedged()
+        logger.debug("Hedging %s %s after %.2fs", request.method, request.url, delay)
+        hedge = self._hedge_executor.submit(send, request.copy(), **kwargs)
+
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.add_done_callback(_close_response)
+                    if future is hedge:
+                        limiter.hedge_won()
+                    return future.result()
+
+        # both failed
+        return primary.result()
+
+    def close(self):
+        # Every session closes its adapters, the shared pools stay open for
+        # the other sessions
+        if not self.shared:
+            self.shutdown()
+
+    def shutdown(self):
+        """Close the connection pools and the hedging threads"""
+        super().close()
+        with self._limiters_lock:
+            executor, self._hedge_executor = self._hedge_executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+def _close_response(future):
+    if future.exception() is None:
+        future.result().close()
+
+
+class Transport:
+    """
+    One HTTPAdapter for all service clients: its connection pools per host
+    keep the connections alive between the requests of any client, so the
+    TCP and TLS handshakes happen once per connection instead of once per
+    bare `requests.get`.
+
+    Clients get their own session (headers, cookies, auth) from `session`,
+    sessionless calls like logins go through `request`. The pools grow to
+    the concurrency of the running Extractors with `reserve` and shrink
+    back once they `release` it, the requests in flight per host adapt
+    within that (see TransportAdapter).
+    """
+
+    def __init__(
+        self,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: Timeout = DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        hedge: bool = True,
+    ):
+        self._base_pool_size = pool_size
+        self._pool_size = pool_size
+        self._reserved = 0
+        self._lock = threading.Lock()
+        self._adapter = TransportAdapter(
+            timeout,
+            retries,
+            hedge,
+            shared=True,
+            pool_connections=POOL_HOSTS,
+            pool_maxsize=pool_size,
+            max_retries=CONNECT_RETRY,
+        )
+        self._session = self.session()
+
+    @property
+    def pool_size(self) -> int:
+        return self._pool_size
+
+    @property
+    def timeout(self) -> Timeout:
+        """Timeout of the requests which don't set one"""
+        return self._adapter.timeout
+
+    @timeout.setter
+    def timeout(self, value: Timeout):
+        self._adapter.timeout = value
+
+    @property
+    def hedge(self) -> bool:
+        """Whether slow metadata requests get a duplicate"""
+        return self._adapter.hedge
+
+    @hedge.setter
+    def hedge(self, value: bool):
+        self._adapter.hedge = value
+
+    def limiter(self, url: str) -> AdaptiveLimiter:
+        """
+        Limiter of the host of `url`. Clients report throttling error codes
+        of their provider with `limiter(url).throttled()`.
+        """
+        return self._adapter.limiter(url)
+
+    def limit_rate(
+        self,
+        domains,
+        requests_per_second: Optional[float] = None,
+        bytes_per_second: Optional[float] = None,
+        directory=None,
+    ) -> RateLimit:
+        """
+        Budget of requests and bytes per second for the hosts under
+        `domains`, shared with the other processes on this machine limiting
+        the same domains (see RateLimit)
+        """
+        rate_limit = RateLimit(domains, requests_per_second, bytes_per_second, directory)
+        self._adapter.add_rate_limit(rate_limit)
+        return rate_limit
+
+    @property
+    def stats(self) -> dict:
+        """Concurrency, throttling and latency per host"""
+        return {host: limiter.stats for host, limiter in self._adapter.limiters.items()}
+
+    def mount(self, session: requests.Session) -> requests.Session:
+        """Let an existing session, e.g. of a library, use the shared pools"""
+        session.mount("https://", self._adapter)
+        session.mount("http://", self._adapter)
+        return session
+
+    def session(self, headers: Optional[dict] = None) -> requests.Session:
+        session = self.mount(requests.Session())
+        if headers:
+            session.headers.update(headers)
+        return session
+
+    def pinned_session(self, headers: Optional[dict] = None) -> requests.Session:
+        """
+        Session sending all its requests over one connection of its own, for
+        APIs keeping state per connection like pCloud's file descriptors.
+        It shares the limits of the transport; closing it closes the
+        connection.
+        """
+        session = requests.Session()
+        adapter = self._adapter.pinned()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        if headers:
+            session.headers.update(headers)
+        return session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        return self._session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def reserve(self, connections: int):
+        """
+        Grow the pools to keep `connections` per host alive besides the
+        other reservations, until they are given back with `release`
+        """
+        with self._lock:
+            self._reserved += connections
+            if self._reserved > self._pool_size:
+                self._resize(self._reserved)
+
+    def release(self, connections: int):
+        """Give back a reservation, the pools shrink once none is left"""
+        with self._lock:
+            self._reserved = max(0, self._reserved - connections)
+            if not self._reserved and self._pool_size != self._base_pool_size:
+                self._resize(self._base_pool_size)
+
+    def _resize(self, connections: int):
+        logger.debug("Connection pools resized to %d per host", connections)
+        self._pool_size = connections
+        # Pools of the replaced manager close as their connections return
+        previous = self._adapter.poolmanager
+        self._adapter.init_poolmanager(
+            POOL_HOSTS, connections, block=self._adapter._pool_block
+        )
+        previous.clear()
+
+    def close(self):
+        """Close the pools, e.g. when the process ends; closing a session doesn't"""
+        self._adapter.shutdown()
+
+
+# The transport of the services
+DEFAULT_TRANSPORT = Transport()
+atexit.register(DEFAULT_TRANSPORT.close)
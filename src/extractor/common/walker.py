@@ -0,0 +1,164 @@
+"""
+Generic Tree Walker shared by the Cloudservices
+"""
+import queue
+import threading
+from collections import deque
+from typing import Callable, Iterable, Iterator, Optional, Union
+
+from extractor.data import File, Folder
+
+ListChildren = Callable[[Union[Folder, None]], Iterable[Union[Folder, File]]]
+
+_CHILD = 0
+_LISTED = 1
+_ERROR = 2
+
+
+def walk_tree(
+    list_children: ListChildren,
+    root=None,
+    max_workers: int = 1,
+    prune: Optional[Callable[[Folder], bool]] = None,
+    listed: Optional[Callable[[Optional[Folder], int], None]] = None,
+    failed: Optional[Callable[[Optional[Folder], Exception], None]] = None,
+) -> Iterator[Union[Folder, File]]:
+    """
+    Walk a remote tree without recursion and yield its folders and files.
+
+    `list_children(folder)` returns the children of a folder, `root` is passed
+    for the root folder, which isn't yielded itself. A folder is always
+    yielded before any of its children.
+
+    A yielded folder for which `prune(folder)` is true isn't listed. Once all
+    children of a folder have been yielded, `listed(folder, count)` is called
+    with their number.
+
+    A listing raising an exception ends the walk with it, unless `failed` is
+    given: then `failed(folder, error)` is called instead of `listed` and the
+    walk goes on with the other folders. Children yielded before the error
+    stay yielded, the folder counts as not listed.
+
+    With `max_workers` > 1 the listings run on a pool of threads sharing a
+    LIFO frontier of folders still to list: an idle worker takes the most
+    recently discovered folder, which keeps the frontier small on deep trees.
+    The children are streamed out as the listings return them, so the order
+    between siblings of different folders isn't deterministic.
+    """
+    if max_workers <= 1:
+        yield from _walk_inline(list_children, root, prune, listed, failed)
+    else:
+        yield from _ParallelWalk(list_children, max_workers).walk(
+            root, prune, listed, failed
+        )
+
+
+def _walk_inline(list_children: ListChildren, root, prune, listed, failed):
+    def children(folder):
+        # the listing of a lazy service may also fail while it's iterated
+        yield from list_children(folder)
+
+    # [folder, iterator of its children, children yielded so far]
+    stack = [[root, children(root), 0]]
+    while stack:
+        entry = stack[-1]
+        try:
+            node = next(entry[1], None)
+        except Exception as ex:
+            if failed is None:
+                raise
+            stack.pop()
+            failed(entry[0], ex)
+            continue
+
+        if node is None:
+            stack.pop()
+            if listed is not None:
+                listed(entry[0], entry[2])
+            continue
+
+        entry[2] += 1
+        yield node
+
+        if isinstance(node, Folder) and not (prune is not None and prune(node)):
+            stack.append([node, children(node), 0])
+
+
+class _ParallelWalk:
+    def __init__(self, list_children: ListChildren, max_workers: int, maxsize: int = 10000):
+        self._list_children = list_children
+        self._max_workers = max_workers
+        self._frontier = deque()
+        self._condition = threading.Condition()
+        self._results = queue.Queue(maxsize)
+        self._stopped = False
+
+    def _put(self, item):
+        # don't block forever if the consumer went away
+        while not self._stopped:
+            try:
+                self._results.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._frontier and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                folder = self._frontier.pop()
+
+            count = 0
+            try:
+                for child in self._list_children(folder):
+                    self._put((_CHILD, child))
+                    count += 1
+            except Exception as ex:
+                self._put((_ERROR, (folder, ex)))
+            else:
+                self._put((_LISTED, (folder, count)))
+
+    def _schedule(self, folder):
+        with self._condition:
+            self._frontier.append(folder)
+            self._condition.notify()
+
+    def walk(self, root, prune=None, listed=None, failed=None):
+        threads = [
+            threading.Thread(target=self._work, name=f"walker-{i}", daemon=True)
+            for i in range(self._max_workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            pending = 1
+            self._schedule(root)
+
+            while pending:
+                kind, node = self._results.get()
+                if kind == _ERROR:
+                    folder, error = node
+                    if failed is None:
+                        raise error
+                    pending -= 1
+                    failed(folder, error)
+                    continue
+                if kind == _LISTED:
+                    pending -= 1
+                    if listed is not None:
+                        listed(*node)
+                    continue
+
+                yield node
+
+                if isinstance(node, Folder) and not (prune is not None and prune(node)):
+                    pending += 1
+                    self._schedule(node)
+        finally:
+            with self._condition:
+                self._stopped = True
+                self._condition.notify_all()
@@ -1,3 +1,4 @@
 from .user import User
 from .folder import Folder
 from .file import File
+from .path import PathNode
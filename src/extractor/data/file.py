@@ -1,10 +1,12 @@
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
 
+from extractor.data.model import model
+from extractor.data.path import PathNode
 
-@dataclass
+
+@model
 class File(ABC):
     id: any
     name: str
@@ -15,10 +17,34 @@ class File(ABC):
     created_at: Optional[datetime]
     modified_at: Optional[datetime]
 
+    @property
+    def path_node(self) -> PathNode:
+        """The path as entry of the path trie, its parent is the folder's"""
+        return type(self).path.node(self)
+
+    def get_checksums(self, fetch: bool = False) -> dict:
+        """
+        Checksums of the content known to the service, by algorithm.
+
+        Args:
+            fetch (bool): Ask the service if the listing didn't include
+                          them, which costs a request per file
+        """
+        return {}
+
+    # get_stream() can fetch ranges, which also allows segmented downloads
+    supports_ranges = False
+
     @abstractmethod
+    def get_stream(self, offset: int = 0, length: Optional[int] = None):
+        """Stream of `length` bytes of the content from `offset` on, by default up to the end"""
+
     def __enter__(self):
-        ...
+        # imported here, extractor.common depends on extractor.data
+        from extractor.common.stream import DEFAULT_RETRIES, ResumableStream
+
+        retries = DEFAULT_RETRIES if self.supports_ranges else 0
+        return ResumableStream(self.get_stream, self.size, retries=retries)
 
-    @abstractmethod
     def __exit__(self, exception_type, exception_value, exception_traceback):
         ...
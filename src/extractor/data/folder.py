@@ -1,8 +1,10 @@
-from dataclasses import dataclass
 from datetime import datetime
 
+from extractor.data.model import model
+from extractor.data.path import PathNode
 
-@dataclass
+
+@model
 class Folder:
     id: any
     name: str
@@ -13,6 +15,11 @@ class Folder:
     modified_at: datetime
     # contents: any = None
 
+    @property
+    def path_node(self) -> PathNode:
+        """The path as entry of the path trie, shared by the contents"""
+        return type(self).path.node(self)
+
     @property
     def full_path(self):
         return "/".join([self.path, self.name])
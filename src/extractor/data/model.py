@@ -0,0 +1,107 @@
+"""
+Decorator for compact File and Folder models
+"""
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import iso8601
+
+from extractor.data.path import TreePath
+
+# dataclasses create __slots__ from Python 3.10 on
+SLOTS = sys.version_info >= (3, 10)
+
+TIMESTAMPS = ("created_at", "modified_at")
+
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """
+    Timestamp as the services deliver it (epoch seconds, RFC 2822 or
+    ISO 8601) as datetime. Unparseable values are returned unchanged.
+    """
+    if value is None or isinstance(value, datetime):
+        return value
+
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, tz=timezone.utc)
+
+    try:
+        return parsedate_to_datetime(value)  # e.g. pCloud, WebDAV
+    except (TypeError, ValueError):
+        pass
+
+    try:
+        return iso8601.parse_date(value)
+    except (TypeError, iso8601.ParseError):
+        return value
+
+
+class LazyTimestamp:
+    """
+    Timestamp field keeping the value the service delivered, parsed into a
+    datetime on first access and kept parsed. Most nodes are never asked
+    for their timestamps.
+
+    Timestamp strings are interned: the files of an upload or a folder's
+    created and modified time share them, so most nodes don't hold their
+    own copies.
+    """
+
+    def __init__(self, name: str, slot=None):
+        self._slot = slot  # member descriptor of the slotted field
+        self._key = f"_{name}"
+
+    def raw(self, obj):
+        if self._slot is not None:
+            return self._slot.__get__(obj, type(obj))
+        return obj.__dict__.get(self._key)
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+
+        raw = self.raw(obj)
+        if raw is None or isinstance(raw, datetime):
+            return raw
+
+        value = parse_timestamp(raw)
+        if value is not raw:
+            self._store(obj, value)
+        return value
+
+    def __set__(self, obj, value):
+        if isinstance(value, str):
+            value = sys.intern(value)
+        self._store(obj, value)
+
+    def _store(self, obj, value):
+        if self._slot is not None:
+            self._slot.__set__(obj, value)
+        else:
+            obj.__dict__[self._key] = value
+
+
+def model(cls):
+    """
+    dataclass decorator of the File and Folder models: instances have slots
+    instead of a __dict__, the timestamp fields are parsed lazily and the
+    path is kept as PathNode.
+
+    Methods of the models can't use the zero-argument form of super(),
+    the slotted class replaces the decorated one.
+    """
+    cls = dataclass(cls, slots=True) if SLOTS else dataclass(cls)
+
+    annotations = cls.__dict__.get("__annotations__", {})
+    for name in TIMESTAMPS:
+        if name in annotations:
+            slot = cls.__dict__.get(name) if SLOTS else None
+            setattr(cls, name, LazyTimestamp(name, slot))
+
+    if "path" in annotations:
+        cls.path = TreePath("path", cls.__dict__.get("path") if SLOTS else None)
+
+    return cls
@@ -0,0 +1,118 @@
+"""
+Paths of the folders and files as a trie
+"""
+from typing import Optional
+
+
+class PathNode:
+    """
+    Entry of a path trie: a name and the entry of the parent folder.
+
+    The services derive the path of a child from the node of its folder, so
+    every prefix exists once however many files are below it. The path
+    string is built on demand. Nodes are equal if their paths are, their
+    hash is computed once.
+    """
+
+    __slots__ = ("name", "parent", "_hash")
+
+    def __init__(self, name: str, parent: Optional["PathNode"] = None):
+        self.name = name
+        self.parent = parent
+        self._hash = hash((name, None if parent is None else parent._hash))
+
+    @classmethod
+    def from_string(cls, path: str) -> "PathNode":
+        """Node of a path like "folder/file", relative to the root"""
+        node = ROOT
+        if path:
+            for name in path.split("/"):
+                node = cls(name, node)
+        return node
+
+    @property
+    def is_root(self) -> bool:
+        return self.parent is None
+
+    @property
+    def depth(self) -> int:
+        depth = 0
+        node = self
+        while node.parent is not None:
+            depth += 1
+            node = node.parent
+        return depth
+
+    def child(self, name: str) -> "PathNode":
+        return PathNode(name, self)
+
+    def parts(self) -> list:
+        """The names from the top-level folder down to this node"""
+        names = []
+        node = self
+        while node.parent is not None:
+            names.append(node.name)
+            node = node.parent
+        names.reverse()
+        return names
+
+    def __str__(self) -> str:
+        if self.parent is None:
+            return ""
+        if self.parent.parent is None:
+            return self.name
+        return "/".join(self.parts())
+
+    def __repr__(self) -> str:
+        return f"PathNode({str(self)!r})"
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __eq__(self, other) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, PathNode):
+            return NotImplemented
+        # compared up to the first common ancestor
+        a, b = self, other
+        while a is not b:
+            if a is None or b is None or a._hash != b._hash or a.name != b.name:
+                return False
+            a, b = a.parent, b.parent
+        return True
+
+
+# The root folder, the parent of the top-level folders and files
+ROOT = PathNode("")
+
+
+class TreePath:
+    """
+    Path field of the models, kept as PathNode and returned as string.
+    Paths set as string are converted, services pass the PathNode of the
+    child of the folder instead.
+    """
+
+    def __init__(self, name: str, slot=None):
+        self._slot = slot  # member descriptor of the slotted field
+        self._key = f"_{name}"
+
+    def node(self, obj) -> PathNode:
+        if self._slot is not None:
+            return self._slot.__get__(obj, type(obj))
+        return obj.__dict__[self._key]
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        return str(self.node(obj))
+
+    def __set__(self, obj, value):
+        if not isinstance(value, PathNode):
+            value = PathNode.from_string(value)
+
+        if self._slot is not None:
+            self._slot.__set__(obj, value)
+        else:
+            obj.__dict__[self._key] = value
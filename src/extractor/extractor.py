@@ -1,7 +1,17 @@
 import logging
 import os
-from extractor.common import CloudService, Plugin
-from typing import List, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from extractor.common import ByteBoundedQueue, CloudService, EventBatch, Plugin
+from extractor.common import ContentTee, IsolatedPlugin
+from extractor.common.hashing import HashingStream, check_hashes, stream_hashes
+from extractor.common.segmented import DEFAULT_SEGMENT_THRESHOLD, SegmentedStream
+from extractor.common.stream import close_stream
+from extractor.common.transport import DEFAULT_TRANSPORT
+from extractor.data import Folder
+from typing import Callable, Iterable, List, Optional
 
 from extractor.common import camel_to_snake
 
@@ -11,16 +21,73 @@ logger = logging.getLogger(__name__)
 class Extractor:
     """ """
 
+    # Per-item events which plugins can also receive in batches,
+    # in the order the batches are flushed
+    BATCH_EVENTS = {
+        "folder_found": "folders_found",
+        "file_found": "files_found",
+    }
+
     def __init__(
         self,
         service: CloudService,
         plugins: Optional[List[Plugin]] = None,
+        workers: int = 1,
+        max_bytes_in_flight: int = 256 * 1024 * 1024,
+        batch_size: int = 1000,
+        batch_interval: float = 1.0,
+        hashes: Optional[Iterable[str]] = None,
+        segments: int = 1,
+        segment_threshold: int = DEFAULT_SEGMENT_THRESHOLD,
         **kwargs,
     ) -> None:
-        """ """
+        """
+        Args:
+            service (CloudService): Service to acquire
+            plugins (List[Plugin]): Plugins receiving the extraction events
+            workers (int): Number of threads handling `file_found` events.
+                           With more than one worker, files are processed
+                           concurrently while the enumeration goes on.
+            max_bytes_in_flight (int): Upper bound for the summed size of the
+                                       enumerated but not yet processed files
+            batch_size (int): Items after which a batch event is delivered
+            batch_interval (float): Seconds after which a batch event is
+                                    delivered, even if it isn't full
+            hashes (Iterable[str]): hashlib algorithms computed while the
+                                    content is streamed, e.g. md5, sha1,
+                                    sha256. The digests are passed as
+                                    `hashes` with `file_download_success`
+                                    and emitted as `file_hashed`.
+            segments (int): Byte ranges of a large file downloaded at once,
+                            if its service supports ranges
+            segment_threshold (int): Size from which files are downloaded
+                                     in segments
+        """
 
         self._service = service
+        self._workers = max(1, workers)
+        self._max_bytes_in_flight = max_bytes_in_flight
+        self._batch_size = batch_size
+        self._batch_interval = batch_interval
         self._plugins = []
+        self._handlers = {}  # event name -> list of bound handlers
+        self._batches = {}  # event name -> EventBatch for the batch handlers
+        # guards the adds and the taking of all batches together
+        self._batch_lock = threading.Lock()
+        self._batch_started = threading.Condition(self._batch_lock)
+        # one delivery at a time, in the order the batches were taken
+        self._flush_lock = threading.RLock()
+        self._flusher = None
+        self._flusher_stopped = False
+        self._content_consumers = []  # plugins defining on_file_content
+        self._skip_checks = []  # should_skip of the plugins
+        self._hashes = check_hashes(hashes or ())
+        self._segments = max(1, segments)
+        self._segment_threshold = segment_threshold
+        self._reserved_connections = 0  # of the shared pools, during a run
+        self._hash_executor = None
+        self._executors_lock = threading.Lock()
+        self._consumer_executor = None
         if plugins is None:
             plugins = []
         for plugin in plugins:
@@ -34,72 +101,522 @@ class Extractor:
     def plugins(self):
         return self._plugins
 
+    @property
+    def workers(self) -> int:
+        return self._workers
+
+    @property
+    def concurrent(self) -> bool:
+        """
+        True if file events are dispatched from several worker threads.
+
+        Plugins can check this in `init` to protect their state.
+        """
+        return self._workers > 1
+
     def add_plugin(self, plugin):
-        try:
-            plugin.init(self)
-        except AttributeError:
-            pass
+        init = getattr(plugin, "init", None)
+        if init is not None:
+            init(self)
 
         self._plugins.append(plugin)
 
-    def emit(self, event: str, *args, **kwargs):
-        """ """
+        # Rebuild the dispatch table for every event a plugin subscribes to
+        events = set(self._handlers)
+        for registered in self._plugins:
+            events.update(
+                name[3:] for name in dir(registered) if name.startswith("on_")
+            )
+        self._handlers = {event: self._resolve(event) for event in events}
+
+        if hasattr(plugin, "on_file_content"):
+            self._content_consumers.append(plugin)
+
+        should_skip = getattr(plugin, "should_skip", None)
+        if should_skip is not None:
+            self._skip_checks.append(should_skip)
+
+        self.flush()
+        self._batches = {}
+        for event, batch_event in self.BATCH_EVENTS.items():
+            handlers = [
+                getattr(registered, f"on_{batch_event}")
+                for registered in self._plugins
+                if hasattr(registered, f"on_{batch_event}")
+            ]
+            if handlers:
+                self._batches[event] = EventBatch(
+                    handlers,
+                    size=self._batch_size,
+                    interval=self._batch_interval,
+                )
+
+    def _resolve(self, event: str) -> List[Callable]:
+        """
+        Collect the handlers of all plugins for an event.
+
+        The specific handler `on_<event>` takes precedence over the generic
+        handler `on`. Plugins without either are left out, as are plugins
+        receiving the event in batches.
+        """
         event = camel_to_snake(event)
         func_name = f"on_{event}"
+        batch_func_name = f"on_{self.BATCH_EVENTS.get(event)}"
+
+        handlers = []
+        for plugin in self._plugins:
+            if hasattr(plugin, batch_func_name):
+                continue
+
+            func = getattr(plugin, func_name, None)
+            if func is None:
+                generic = getattr(plugin, "on", None)
+                if generic is not None:
+                    func = partial(generic, event)
+            if func is not None:
+                handlers.append(func)
+
+        return handlers
+
+    def emit(self, event: str, *args, **kwargs):
+        """ """
+        handlers = self._handlers.get(event)
+        if handlers is None:
+            # first emit of an event no plugin names explicitly
+            handlers = self._handlers[event] = self._resolve(event)
+
+        for handler in handlers:
+            handler(*args, **kwargs)
+
+        if self._batched(event, args):
+            self.flush()
+
+        return self
+
+    def _batched(self, event: str, args) -> bool:
+        """Collect the item of a batch event, True if a flush is due"""
+        batch = self._batches.get(event)
+        if batch is not None:
+            with self._batch_lock:
+                empty = batch.due_at is None
+                if batch.add(*args):
+                    return True
+                if empty:
+                    self._batch_started.notify()
+
+        deadline = self._batch_deadline()
+        return deadline is not None and deadline <= time.monotonic()
+
+    def _batch_deadline(self) -> Optional[float]:
+        deadlines = [
+            batch.due_at for batch in self._batches.values() if batch.due_at is not None
+        ]
+        return min(deadlines, default=None)
+
+    def _take_batches(self) -> list:
+        """The handlers and items of all batches, taken at once"""
+        with self._batch_lock:
+            return [
+                (self._batches[event].handlers, self._batches[event].take())
+                for event in self.BATCH_EVENTS
+                if event in self._batches
+            ]
+
+    def close(self):
+        """
+        Stop the plugins running on their own threads (see IsolatedPlugin)
+        after they handled their pending events.
+        """
+        self._stop_flusher()
+        self.flush()
+        self._release_connections()
 
         for plugin in self._plugins:
+            close = getattr(plugin, "close", None)
+            if close is not None:
+                close()
+
+        for name, stats in self.metrics.items():
+            logger.info("Plugin [%s] %s", name, stats)
+
+        for host, stats in DEFAULT_TRANSPORT.stats.items():
+            logger.info("Host [%s] %s", host, stats)
+
+        with self._executors_lock:
+            if self._hash_executor is not None:
+                self._hash_executor.shutdown()
+                self._hash_executor = None
+            if self._consumer_executor is not None:
+                self._consumer_executor.shutdown()
+                self._consumer_executor = None
+
+    def _open_content(self, file, destination=None, spool_dir=None):
+        """
+        Open the content stream of a file, large files in segments if
+        their service supports ranges. The segments are written to
+        `destination` in place, or spooled in `spool_dir`.
+        """
+        if (
+            self._segments > 1
+            and file.supports_ranges
+            and _file_size(file) >= self._segment_threshold
+        ):
+            return SegmentedStream(
+                file.get_stream,
+                file.size,
+                self._segments,
+                destination=destination,
+                spool_dir=spool_dir,
+            )
+
+        return file.__enter__()
+
+    @staticmethod
+    def _placement(file, consumers) -> dict:
+        """
+        Where a segmented download of the content goes: into the file the
+        only consumer writes, otherwise next to it
+        """
+        for plugin in consumers:
+            content_destination = getattr(plugin, "content_destination", None)
+            destination = None if content_destination is None else content_destination(file)
+            if destination is not None:
+                if len(consumers) == 1:
+                    return {"destination": destination}
+                return {"spool_dir": os.path.dirname(os.path.abspath(destination))}
+
+        return {}
+
+    def _hashing_stream(self, source) -> HashingStream:
+        """Wrap a content stream to compute the configured digests"""
+        executor = None
+        if len(self._hashes) > 1:
+            with self._executors_lock:
+                if self._hash_executor is None:
+                    self._hash_executor = ThreadPoolExecutor(
+                        max_workers=self._workers * (len(self._hashes) - 1),
+                        thread_name_prefix="extractor-hash",
+                    )
+                executor = self._hash_executor
+
+        return HashingStream(source, self._hashes, executor)
+
+    @property
+    def metrics(self) -> dict:
+        """Queue depth and handler latency of the isolated plugins"""
+        return {
+            plugin.name: plugin.stats
+            for plugin in self._plugins
+            if isinstance(plugin, IsolatedPlugin)
+        }
+
+    def flush(self):
+        """
+        Deliver the pending batch events.
+
+        All batches are taken together, folders first, and delivered in the
+        order they were taken, so batch handlers see a folder before the
+        files it contains. Flushes from several threads deliver one after
+        the other.
+        """
+        with self._flush_lock:
+            for handlers, items in self._take_batches():
+                if items:
+                    for handler in handlers:
+                        handler(items)
+
+        return self
+
+    def _start_flusher(self):
+        """
+        With several workers, deliver the batches due after `batch_interval`
+        from a thread of their own, even while no event comes. A single
+        worker checks it with every event it emits.
+        """
+        if not self.concurrent or not self._batches or self._batch_interval is None:
+            return
+
+        self._flusher_stopped = False
+        self._flusher = threading.Thread(
+            target=self._flush_when_due, name="extractor-flusher", daemon=True
+        )
+        self._flusher.start()
+
+    def _flush_when_due(self):
+        while True:
+            with self._batch_started:
+                while not self._flusher_stopped:
+                    deadline = self._batch_deadline()
+                    now = time.monotonic()
+                    if deadline is not None and deadline <= now:
+                        break
+                    self._batch_started.wait(None if deadline is None else deadline - now)
+                else:
+                    return
+
             try:
-                func = getattr(plugin, func_name)
-                func(*args, **kwargs)
-            except AttributeError:
-                # specific handlerfunction doesn't exists
+                self.flush()
+            except Exception:
+                logger.exception("Delivering the batch events failed")
+
+    def _stop_flusher(self):
+        if self._flusher is None:
+            return
+
+        with self._batch_started:
+            self._flusher_stopped = True
+            self._batch_started.notify_all()
+        self._flusher.join()
+        self._flusher = None
+
+    def _skip_reason(self, node) -> Optional[str]:
+        """
+        Ask the plugins whether a folder or file is to be skipped.
+
+        A plugin's `should_skip(node)` returns the reason, e.g. that a
+        resumed acquisition finished it already, or None.
+        """
+        for should_skip in self._skip_checks:
+            reason = should_skip(node)
+            if reason:
+                return reason
+
+        return None
+
+    def _prune(self, folder) -> bool:
+        """Whether the walk can leave out the contents of a folder"""
+        return self._skip_reason(folder) is not None
+
+    def _walk(self):
+        return self._service.walk(
+            prune=self._prune if self._skip_checks else None,
+            listed=partial(self.emit, "folder_listed"),
+            failed=self._list_failed,
+        )
+
+    def _list_failed(self, folder, error):
+        """A folder couldn't be listed, the walk goes on without its contents"""
+        logger.warning(
+            "Listing %s failed: %s", "/" if folder is None else folder.path, error
+        )
+        self.emit("folder_list_failed", folder, str(error))
+
+    def _skipped(self, node) -> bool:
+        """Emit `folder_skipped`/`file_skipped` if a plugin skips the node"""
+        if not self._skip_checks:
+            return False
+
+        reason = self._skip_reason(node)
+        if reason is None:
+            return False
+
+        if isinstance(node, Folder):
+            self.emit("folder_skipped", node, reason)
+        else:
+            self.emit("file_skipped", node, reason)
+
+        return True
+
+    def _node_found(self, node):
+        if self._skipped(node):
+            return
+
+        if isinstance(node, Folder):
+            self.emit("folder_found", node)
+        else:
+            self._file_found(node)
+
+    def _file_found(self, file):
+        self.emit("file_found", file)
+        self._acquire_content(file)
+
+    def _acquire_content(self, file):
+        """
+        Fetch the content of a file once and hand it to every content consumer.
+
+        A single consumer reads the source stream directly. Several consumers
+        get their own reader on a ContentTee, which spools the content so a
+        consumer reading later doesn't need a second download.
+        """
+        consumers = [
+            plugin
+            for plugin in self._content_consumers
+            if getattr(plugin, "wants_content", lambda file: True)(file)
+        ]
+        if not consumers:
+            return
+
+        handlers = [plugin.on_file_content for plugin in consumers]
+        try:
+            source = self._open_content(file, **self._placement(file, consumers))
+        except Exception as error:
+            self.emit("file_download_failed", file, str(error))
+            return
+
+        if self._hashes:
+            source = self._hashing_stream(source)
+
+        try:
+            if len(handlers) == 1:
+                handlers[0](file, source)
+            else:
+                with ContentTee(source) as tee:
+                    self._consume_concurrently(file, handlers, tee)
+
+            hashes = stream_hashes(source)
+            if hashes is not None:
+                self.emit("file_hashed", file, hashes)
+        finally:
+            close_stream(source)
+            file.__exit__(None, None, None)
+
+    def _consumer_pool(self) -> ThreadPoolExecutor:
+        """Threads for the content handlers of every worker to run at once"""
+        with self._executors_lock:
+            if self._consumer_executor is None:
+                self._consumer_executor = ThreadPoolExecutor(
+                    max_workers=self._workers * len(self._content_consumers),
+                    thread_name_prefix="extractor-consumer",
+                )
+            return self._consumer_executor
+
+    def _consume_concurrently(self, file, handlers, tee):
+        """
+        Run every content handler on its own reader of the tee at the same
+        time. Readers keeping up with each other are served the latest chunk
+        from memory, only a reader falling behind reads from the spool.
+        """
+        executor = self._consumer_pool()
+        futures = [
+            executor.submit(handler, file, tee.reader()) for handler in handlers[1:]
+        ]
+        try:
+            handlers[0](file, tee.reader())
+        finally:
+            # the tee and its source stay open until every handler is done
+            errors = [future.exception() for future in futures]
+
+        for error in errors:
+            if error is not None:
+                raise error
+
+    def _acquire_nodes(self, nodes):
+        """
+        Emit the events for the folders and files of a walk.
+        """
+        for node in nodes:
+            self._node_found(node)
+
+    def _acquire_nodes_concurrently(self, nodes):
+        """
+        Emit `file_found` from a pool of worker threads.
+
+        The enumeration runs in the calling thread, which emits `folder_found`
+        itself and feeds the files into a queue bounded by the bytes in flight.
+        A folder is announced before any of its files is handed to a worker.
+        The first exception raised by a worker stops the enumeration and is
+        re-raised here.
+        """
+        queue = ByteBoundedQueue(self._max_bytes_in_flight)
+        errors = []
+
+        def worker():
+            while True:
+                file, size = queue.get()
+                if file is None:
+                    queue.task_done(size)
+                    break
+
                 try:
-                    # try to call generic handler function
-                    plugin.on(event, *args, **kwargs)
-                except AttributeError:
-                    # Plugin has no generic handler function
-                    pass
+                    if not errors:
+                        self._file_found(file)
+                except Exception as ex:
+                    errors.append(ex)
+                finally:
+                    queue.task_done(size)
 
-        return self
+        threads = [
+            threading.Thread(target=worker, name=f"extractor-worker-{i}", daemon=True)
+            for i in range(self._workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            for node in nodes:
+                if errors:
+                    break
+                if self._skipped(node):
+                    continue
+                if isinstance(node, Folder):
+                    self.emit("folder_found", node)
+                else:
+                    queue.put(node, _file_size(node))
+        finally:
+            for _ in threads:
+                queue.put(None)
+            for thread in threads:
+                thread.join()
+
+        if errors:
+            raise errors[0]
+
+    def _reserve_connections(self):
+        """Grow the shared connection pools for the run, `close` gives them back"""
+        # a connection per worker and segment, and per listing thread
+        connections = self._workers * self._segments + getattr(
+            self._service, "list_concurrency", 1
+        )
+        DEFAULT_TRANSPORT.reserve(connections)
+        self._reserved_connections += connections
+
+    def _release_connections(self):
+        if self._reserved_connections:
+            DEFAULT_TRANSPORT.release(self._reserved_connections)
+            self._reserved_connections = 0
 
     def acquire(self, username, password):
         """ """
-        self.emit("extractor_start")
-
-        #
-        # Login / Acquire User
-        #
         try:
-            user = self._service.login(username, password)
-        except Exception as e:
-            self.emit("login_failure", e)
-        else:
-            self.emit("login_success", user)
+            self._reserve_connections()
+            self.emit("extractor_start")
 
             #
-            # Acquire Folders
+            # Login / Acquire User
             #
             try:
-                self.emit("before_acquire_folders")
+                user = self._service.login(username, password)
+            except Exception as e:
+                self.emit("login_failure", e)
+            else:
+                self.emit("login_success", user)
 
-                for folder in self._service.folders:
-                    self.emit("folder_found", folder)
+                #
+                # Acquire Folders and Files in a single walk
+                #
+                try:
+                    self.emit("before_acquire_folders")
+                    self.emit("before_acquire_files")
 
-                self.emit("after_acquire_folders")
-            except Exception as e:
-                raise e
+                    self._start_flusher()
+                    if self.concurrent:
+                        self._acquire_nodes_concurrently(self._walk())
+                    else:
+                        self._acquire_nodes(self._walk())
+                    self.flush()
 
-            #
-            # Acquire Files
-            #
-            try:
-                self.emit("before_acquire_files")
+                    self.emit("after_acquire_folders")
+                    self.emit("after_acquire_files")
+                except Exception as e:
+                    raise e
 
-                for file in self._service.files:
-                    self.emit("file_found", file)
+            self.emit("extractor_end")
+        finally:
+            self.close()
 
-                self.emit("after_acquire_files")
-            except Exception as e:
-                raise e
 
-        self.emit("extractor_end")
+def _file_size(file) -> int:
+    try:
+        return max(0, int(file.size or 0))
+    except (TypeError, ValueError):
+        return 0
@@ -1,3 +1,9 @@
 from .debugeventlistener import DebugEventListener
 from .logfile import Logfile
 from .downloader import Downloader
+from .hashmanifest import HashManifest
+from .journal import Journal
+from .manifest import Manifest
+from .knownfiles import KnownFiles
+from .inventory import Inventory
+from .catalog import Catalog
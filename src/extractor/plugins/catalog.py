@@ -0,0 +1,419 @@
+"""Catalog Plugin collecting the enumeration in NumPy columns for triage"""
+
+import array
+import json
+import logging
+import math
+import threading
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from extractor.common import Plugin
+from extractor.common.tools import to_epoch
+from extractor.data import File, Folder
+
+try:
+    import numpy as np
+except ImportError:  # optional, pip install extractor[catalog]
+    np = None
+
+logger = logging.getLogger(__name__)
+
+NO_EXTENSION = ""
+
+# name -> (dtype, typecode of the array the column is collected in)
+FILE_COLUMNS = {
+    "sizes": ("int64", "q"),
+    "modified": ("float64", "d"),
+    "created": ("float64", "d"),
+    "extensions": ("int32", "i"),
+    "parents": ("int32", "i"),
+}
+FOLDER_COLUMNS = {
+    "folder_parents": ("int32", "i"),
+    "folder_depths": ("int32", "i"),
+}
+
+
+def _epoch(value) -> float:
+    epoch = to_epoch(value)
+    return math.nan if epoch is None else epoch
+
+
+def _extension(name: str) -> str:
+    stem, dot, extension = name.rpartition(".")
+    return extension.lower() if dot and stem else NO_EXTENSION
+
+
+class _Names:
+    """Strings of a column, as one UTF-8 blob and the offsets into it"""
+
+    def __init__(self):
+        self._chunks = []
+        self._length = 0
+        self._offsets = array.array("q", [0])
+        self._blob = b""
+
+    def append(self, name: str):
+        data = name.encode("utf-8", "surrogatepass")
+        self._chunks.append(data)
+        self._length += len(data)
+        self._offsets.append(self._length)
+
+    def _join(self):
+        if self._chunks:
+            self._blob = b"".join([self._blob, *self._chunks])
+            self._chunks = []
+
+    def __getitem__(self, index: int) -> str:
+        self._join()
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return bytes(self._blob[start:end]).decode("utf-8", "surrogatepass")
+
+    def save(self, path: Path, name: str):
+        self._join()
+        path.joinpath(f"{name}.bin").write_bytes(bytes(self._blob))
+        np.save(path.joinpath(f"{name}_offsets.npy"), np.asarray(self._offsets, "int64"))
+
+    @classmethod
+    def load(cls, path: Path, name: str, mmap_mode) -> "_Names":
+        names = cls()
+        names._offsets = np.load(path.joinpath(f"{name}_offsets.npy"), mmap_mode=mmap_mode)
+        blob = path.joinpath(f"{name}.bin")
+        if mmap_mode is None:
+            names._blob = blob.read_bytes()
+        elif names._offsets[-1]:
+            names._blob = np.memmap(blob, dtype="uint8", mode="r")
+        return names
+
+
+class Catalog(Plugin):
+    """
+    Columnar catalog of the enumerated files for triage statistics.
+
+    The folders and files are collected from the batch events into columns:
+    sizes, modification and creation time (epoch seconds, NaN if unknown),
+    interned extension ids and the index of the parent folder. They are
+    NumPy arrays to the helpers, which work on whole columns, so statistics
+    over millions of files take milliseconds. `save` writes the columns as
+    .npy files, which `load` memory-maps. Given a `path`, the catalog is
+    saved there when closed.
+
+    Folder 0 is the root. Folders are indexed in the order they were found,
+    so a parent always precedes its subfolders.
+    """
+
+    def __init__(self, path=None):
+        if np is None:
+            raise ImportError("The Catalog requires numpy, pip install extractor[catalog]")
+
+        self._path = None if path is None else Path(path).absolute()
+        self._lock = threading.Lock()
+        # collected values, NumPy copies of them are cached until new ones arrive
+        self._arrays = {
+            name: array.array(code)
+            for name, (_, code) in {**FILE_COLUMNS, **FOLDER_COLUMNS}.items()
+        }
+        self._columns = {}
+        self._file_names = _Names()
+        self._folder_names = _Names()
+        self._folder_index = {}  # path -> index
+        self._extension_index = {}
+        self.extension_names: List[str] = []
+
+        self._add_folder("", -1)
+
+    def _add_folder(self, path: str, parent: int) -> int:
+        index = len(self._folder_index)
+        self._folder_index[path] = index
+        self._folder_names.append(path.rpartition("/")[2])
+        self._arrays["folder_parents"].append(parent)
+        depths = self._arrays["folder_depths"]
+        depths.append(0 if parent < 0 else depths[parent] + 1)
+        return index
+
+    def _folder(self, path: str) -> int:
+        index = self._folder_index.get(path)
+        if index is None:
+            # not announced (e.g. skipped), created on demand
+            index = self._add_folder(path, self._folder(path.rpartition("/")[0]))
+        return index
+
+    def _extension_id(self, name: str) -> int:
+        extension = _extension(name)
+        index = self._extension_index.get(extension)
+        if index is None:
+            index = self._extension_index[extension] = len(self.extension_names)
+            self.extension_names.append(extension)
+        return index
+
+    def on_folders_found(self, folders: List[Folder]):
+        with self._lock:
+            for folder in folders:
+                if folder.path not in self._folder_index:
+                    self._add_folder(folder.path, self._folder(folder.path.rpartition("/")[0]))
+            self._columns.clear()
+
+    def on_files_found(self, files: List[File]):
+        with self._lock:
+            arrays = self._arrays
+            sizes, modified, created = arrays["sizes"], arrays["modified"], arrays["created"]
+            extensions, parents = arrays["extensions"], arrays["parents"]
+            for file in files:
+                sizes.append(file.size or 0)
+                modified.append(_epoch(file.modified_at))
+                created.append(_epoch(file.created_at))
+                extensions.append(self._extension_id(file.name))
+                parents.append(self._folder(file.path.rpartition("/")[0]))
+                self._file_names.append(file.name)
+            self._columns.clear()
+
+    def _column(self, name: str):
+        with self._lock:
+            column = self._columns.get(name)
+            if column is None:
+                dtype = {**FILE_COLUMNS, **FOLDER_COLUMNS}[name][0]
+                column = np.frombuffer(self._arrays[name], dtype=dtype).copy()
+                self._columns[name] = column
+            return column
+
+    @property
+    def sizes(self):
+        return self._column("sizes")
+
+    @property
+    def modified(self):
+        return self._column("modified")
+
+    @property
+    def created(self):
+        return self._column("created")
+
+    @property
+    def extensions(self):
+        return self._column("extensions")
+
+    @property
+    def parents(self):
+        return self._column("parents")
+
+    @property
+    def folder_parents(self):
+        return self._column("folder_parents")
+
+    @property
+    def folder_depths(self):
+        return self._column("folder_depths")
+
+    def __len__(self) -> int:
+        return len(self.sizes)
+
+    def file_name(self, index: int) -> str:
+        return self._file_names[index]
+
+    def folder_path(self, index: int) -> str:
+        parents = self.folder_parents
+        names = []
+        while index > 0:
+            names.append(self._folder_names[index])
+            index = int(parents[index])
+        return "/".join(reversed(names))
+
+    def file_path(self, index: int) -> str:
+        folder = self.folder_path(int(self.parents[index]))
+        name = self._file_names[index]
+        return f"{folder}/{name}" if folder else name
+
+    def folder_by_path(self, path: str) -> int:
+        """Index of a folder, raises KeyError for unknown ones"""
+        path = path.strip("/")
+        if self._folder_index:
+            return self._folder_index[path]
+
+        # a loaded catalog, the path is resolved name by name
+        index = 0
+        parents = self.folder_parents
+        for name in path.split("/") if path else ():
+            children = np.flatnonzero(parents == index)
+            for child in children:
+                if self._folder_names[int(child)] == name:
+                    index = int(child)
+                    break
+            else:
+                raise KeyError(path)
+        return index
+
+    #
+    # Vectorized helpers, masks are boolean arrays over the files
+    #
+
+    def _subfolders(self, index: int):
+        """Mask over the folders: the folder and all below it"""
+        parents, depths = self.folder_parents, self.folder_depths
+        below = np.zeros(len(parents), dtype=bool)
+        below[index] = True
+        # parents precede their subfolders, one level at a time suffices
+        for depth in range(int(depths[index]) + 1, int(depths.max(initial=0)) + 1):
+            level = np.flatnonzero(depths == depth)
+            below[level] |= below[parents[level]]
+        return below
+
+    def filter(
+        self,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        modified_from=None,
+        modified_to=None,
+        extensions: Optional[Iterable[str]] = None,
+        below: Optional[str] = None,
+    ):
+        """
+        Returns:
+            ndarray: mask of the files matching all given conditions
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if min_size is not None:
+            mask &= self.sizes >= min_size
+        if max_size is not None:
+            mask &= self.sizes <= max_size
+        if modified_from is not None:
+            mask &= self.modified >= to_epoch(modified_from)
+        if modified_to is not None:
+            mask &= self.modified < to_epoch(modified_to)
+        if extensions is not None:
+            ids = [
+                self._extension_index[e.lower().lstrip(".")]
+                for e in extensions
+                if e.lower().lstrip(".") in self._extension_index
+            ]
+            mask &= np.isin(self.extensions, ids)
+        if below is not None:
+            mask &= self._subfolders(self.folder_by_path(below))[self.parents]
+        return mask
+
+    def largest(self, count: int, mask=None):
+        """Indexes of the `count` largest files, largest first"""
+        indexes = np.arange(len(self)) if mask is None else np.flatnonzero(mask)
+        sizes = self.sizes[indexes]
+        if count < len(indexes):
+            top = np.argpartition(sizes, -count)[-count:]
+            indexes, sizes = indexes[top], sizes[top]
+        return indexes[np.argsort(sizes, kind="stable")[::-1]]
+
+    def size_histogram(self, mask=None) -> Tuple:
+        """
+        Returns:
+            tuple: file counts and bytes per power of two, and the lower
+                   bounds of the bins (0, 1, 2, 4, ...)
+        """
+        sizes = self.sizes if mask is None else self.sizes[mask]
+        largest = int(sizes.max(initial=0))
+        bounds = np.concatenate(([0], 2 ** np.arange(largest.bit_length(), dtype=np.int64)))
+        bins = np.searchsorted(bounds, sizes, side="right") - 1
+        counts = np.bincount(bins, minlength=len(bounds))
+        totals = np.bincount(bins, weights=sizes, minlength=len(bounds)).astype(np.int64)
+        return counts, totals, bounds
+
+    def timeline(self, interval: float = 86400, mask=None) -> Tuple:
+        """
+        Returns:
+            tuple: start of the intervals with modified files (epoch seconds),
+                   the file counts and bytes in them
+        """
+        modified, sizes = self.modified, self.sizes
+        if mask is not None:
+            modified, sizes = modified[mask], sizes[mask]
+        known = ~np.isnan(modified)
+        buckets = np.floor(modified[known] / interval).astype(np.int64)
+        if not len(buckets):
+            return np.empty(0), np.empty(0, np.int64), np.empty(0, np.int64)
+
+        # counting over the span of the intervals is much faster than
+        # sorting, unless outliers make the span huge
+        first = int(buckets.min())
+        span = int(buckets.max()) - first + 1
+        if span <= max(len(buckets), 1 << 20):
+            buckets -= first
+            counts = np.bincount(buckets, minlength=span)
+            totals = np.bincount(buckets, weights=sizes[known], minlength=span)
+            starts = np.flatnonzero(counts)
+            counts, totals = counts[starts], totals[starts]
+            starts += first
+        else:
+            starts, inverse, counts = np.unique(buckets, return_inverse=True, return_counts=True)
+            totals = np.bincount(inverse, weights=sizes[known], minlength=len(starts))
+        return starts * interval, counts, totals.astype(np.int64)
+
+    def by_extension(self, mask=None) -> List[Tuple[str, int, int]]:
+        """File count and bytes per extension, most bytes first"""
+        extensions, sizes = self.extensions, self.sizes
+        if mask is not None:
+            extensions, sizes = extensions[mask], sizes[mask]
+        length = len(self.extension_names)
+        counts = np.bincount(extensions, minlength=length)
+        totals = np.bincount(extensions, weights=sizes, minlength=length).astype(np.int64)
+        order = np.argsort(totals, kind="stable")[::-1]
+        return [
+            (self.extension_names[i], int(counts[i]), int(totals[i]))
+            for i in order
+            if counts[i]
+        ]
+
+    def subtree_totals(self, mask=None) -> Tuple:
+        """
+        Returns:
+            tuple: file counts and bytes per folder, including everything below it
+        """
+        parents, sizes = self.parents, self.sizes
+        if mask is not None:
+            parents, sizes = parents[mask], sizes[mask]
+        folder_parents, depths = self.folder_parents, self.folder_depths
+        length = len(folder_parents)
+        counts = np.bincount(parents, minlength=length)
+        totals = np.bincount(parents, weights=sizes, minlength=length).astype(np.int64)
+        # add each level to its parents, deepest first
+        for depth in range(int(depths.max(initial=0)), 0, -1):
+            level = np.flatnonzero(depths == depth)
+            np.add.at(counts, folder_parents[level], counts[level])
+            np.add.at(totals, folder_parents[level], totals[level])
+        return counts, totals
+
+    #
+    # On-disk form
+    #
+
+    def close(self):
+        if self._path is not None and self._arrays is not None:
+            self.save(self._path)
+            logger.info("Catalog of %d files saved to %s", len(self), self._path)
+
+    def save(self, path):
+        """Write the catalog into the folder `path`, one .npy file per column"""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in {**FILE_COLUMNS, **FOLDER_COLUMNS}:
+            np.save(path.joinpath(f"{name}.npy"), self._column(name))
+        with self._lock:
+            self._file_names.save(path, "file_names")
+            self._folder_names.save(path, "folder_names")
+        path.joinpath("catalog.json").write_text(
+            json.dumps({"extensions": self.extension_names}), encoding="utf-8"
+        )
+
+    @classmethod
+    def load(cls, path, mmap: bool = True) -> "Catalog":
+        """Open a saved catalog, its columns memory-mapped unless `mmap` is False"""
+        path = Path(path)
+        mmap_mode = "r" if mmap else None
+        catalog = cls()
+        for name in {**FILE_COLUMNS, **FOLDER_COLUMNS}:
+            catalog._columns[name] = np.load(path.joinpath(f"{name}.npy"), mmap_mode=mmap_mode)
+        catalog._arrays = None  # read-only
+        catalog._folder_index = {}
+        catalog._file_names = _Names.load(path, "file_names", mmap_mode)
+        catalog._folder_names = _Names.load(path, "folder_names", mmap_mode)
+        catalog.extension_names = json.loads(
+            path.joinpath("catalog.json").read_text(encoding="utf-8")
+        )["extensions"]
+        catalog._extension_index = {e: i for i, e in enumerate(catalog.extension_names)}
+        return catalog
@@ -25,8 +25,13 @@ class DebugEventListener(Plugin):
     def on_file_found(self, file):
         logger.debug("Event [file_found] raised. %s", file)
 
-    def on_file_download_success(self, file, destination):
-        logger.debug("Event [file_download_success] raised. %s %s", file, destination)
+    def on_file_download_success(self, file, destination, hashes=None):
+        logger.debug(
+            "Event [file_download_success] raised. %s %s %s", file, destination, hashes
+        )
+
+    def on_file_hashed(self, file, hashes):
+        logger.debug("Event [file_hashed] raised. %s %s", file, hashes)
 
     def on_file_download_failed(self, file, error):
         logger.debug("Event [file_download_failed] raised. %s %s", file, error)
@@ -1,21 +1,45 @@
 import logging
+import os
 from pathlib import Path
+from typing import Optional
 from extractor import Extractor
 from extractor.data import Folder
 from extractor.data import File
+from extractor.data import PathNode
 from extractor.common import Plugin
+from extractor.common.hashing import HashingStream, stream_algorithms, stream_hashes
+from extractor.common.segmented import stream_destination
+from extractor.common.store import ALGORITHM, ContentStore, link_or_copy
+from extractor.common.stream import DEFAULT_CHUNK_SIZE, iter_chunks
 from extractor.errors import DownloadError
 
 logger = logging.getLogger(__name__)
 
 
 class Downloader(Plugin):
-    def __init__(self, path):
+    """
+    Writes the acquired files into a folder tree below `path`.
+
+    With a `store` (a ContentStore or its path) every content is kept once
+    in the store and linked into the tree. Files the store already holds,
+    recognized by the checksums their service reports, are linked without
+    being downloaded.
+    """
+
+    def __init__(self, path, chunk_size: int = DEFAULT_CHUNK_SIZE, store=None):
         self._extractor = None
         self._basepath = Path(path).absolute()
+        self._chunk_size = chunk_size
+        self._reused = set()  # files copied from a previous acquisition or the store
+        self._checksums = {}  # checksums fetched for the files to download
+        self._directories = set()  # path nodes of the folders created
+
+        self._owns_store = store is not None and not isinstance(store, ContentStore)
+        self._store = ContentStore(store) if self._owns_store else store
 
     def init(self, extractor: Extractor):
         self._extractor = extractor
+        self._basepath.mkdir(exist_ok=True, parents=True)
 
     def on_folder_found(self, folder: Folder):
         """
@@ -25,36 +49,168 @@ class Downloader(Plugin):
         """
 
         # Create Folder
-        self._basepath.joinpath(folder.path).mkdir(exist_ok=True, parents=True)
+        self._make_directory(folder.path_node)
         # TODO: Folder Attributes like Created/Modified Timestamps
 
+    def _make_directory(self, node: PathNode):
+        if node.is_root or node in self._directories:
+            return
+
+        self._basepath.joinpath(str(node)).mkdir(exist_ok=True, parents=True)
+        self._directories.add(node)
+
+    def _destination(self, file: File) -> Path:
+        """Path of the file in the tree, its folder is created if it is missing"""
+        self._make_directory(file.path_node.parent)
+        return self._basepath.joinpath(file.path)
+
+    def on_file_unchanged(self, file: File, previous_destination, hashes=None):
+        """
+        Eventhandler for unchanged Files (see the Manifest plugin)
+
+        Link or copy the file from the output of the previous acquisition
+        instead of downloading it again
+        """
+        if (file.id, file.path_node) in self._reused:
+            return
+
+        destination = self._destination(file)
+        try:
+            link_or_copy(Path(previous_destination), destination)
+        except OSError as error:
+            logger.warning(
+                "Can't reuse %s, downloading it again. %s", previous_destination, error
+            )
+            return
+
+        self._reused.add((file.id, file.path_node))
+        self._success(file, destination, hashes)
+
     def on_file_found(self, file: File):
         """
         Eventhandler for File Found Event
 
-        Acquire the File-Content and save them in the file system
+        Link the file from the store if it holds the content already
         """
+        if self._store is None or (file.id, file.path_node) in self._reused:
+            return
+
+        digest = self._find_in_store(file)
+        if digest is None:
+            return
+
+        destination = self._destination(file)
         try:
-            # chunk_size = 4096
-            # destination = self._basepath.joinpath(file.path)
-            # source = self._extractor._service.file_get_stream(file)
-            # with open(destination, "wb") as target:
-            #     while True:
-            #         chunk = source.read(chunk_size)
-            #         target.write(chunk)
-            #         if len(chunk) < chunk_size:
-            #             break
-
-            chunk_size = 4096
-            destination = self._basepath.joinpath(file.path)
-            with file as source, open(destination, "wb") as target:
-                while True:
-                    chunk = source.read(chunk_size)
-                    target.write(chunk)
-                    if len(chunk) < chunk_size:
-                        break
+            link_or_copy(self._store.object_path(digest), destination)
+        except OSError as error:
+            logger.warning("Can't link %s from the store. %s", file.path, error)
+            return
+
+        logger.debug("%s taken from the store (%s)", file.path, digest)
+        self._reused.add((file.id, file.path_node))
+        self._success(file, destination, self._store.hashes(digest))
+
+    def _find_in_store(self, file: File) -> Optional[str]:
+        checksums = file.get_checksums()
+        digest = self._store.lookup(checksums, file.size)
+        if digest is not None or not self._store.has_size(file.size):
+            return digest
+
+        # Asking the service costs a request, worth it only if the store
+        # holds a content of that size
+        try:
+            checksums = {**checksums, **file.get_checksums(fetch=True)}
+        except Exception as error:
+            logger.debug("No checksums for %s. %s", file.path, error)
+            return None
+
+        self._checksums[(file.id, file.path_node)] = checksums
+        return self._store.lookup(checksums, file.size)
+
+    def wants_content(self, file: File) -> bool:
+        try:
+            self._reused.remove((file.id, file.path_node))
+        except KeyError:
+            return True
+
+        return False
+
+    def content_destination(self, file: File) -> Optional[Path]:
+        """Segmented downloads go into place, except into the store"""
+        if self._store is not None:
+            return None
+        return self._destination(file)
+
+    def on_file_content(self, file: File, source):
+        """
+        Eventhandler for File Content
+
+        Save the File-Content in the file system
+        """
+        if self._store is not None:
+            self._store_content(file, source)
+            return
+
+        try:
+            destination = self._destination(file)
+            if stream_destination(source) == destination:
+                # written by the segments already, reading waits for them
+                for _ in iter_chunks(source, self._chunk_size):
+                    pass
+            else:
+                with open(destination, "wb", buffering=0) as target:
+                    for chunk in iter_chunks(source, self._chunk_size):
+                        target.write(chunk)
 
         except Exception as error:
             self._extractor.emit("file_download_failed", file, str(error))
         else:
+            self._success(file, destination, stream_hashes(source))
+
+    def _store_content(self, file: File, source):
+        checksums = self._checksums.pop((file.id, file.path_node), None)
+
+        # The digest naming the object comes with the content, unless the
+        # Extractor computes it already
+        hashing = None
+        if ALGORITHM not in stream_algorithms(source):
+            hashing = HashingStream(source, (ALGORITHM,))
+
+        spool = self._store.spool()
+        try:
+            size = 0
+            with spool:
+                for chunk in iter_chunks(hashing or source, self._chunk_size):
+                    spool.write(chunk)
+                    size += len(chunk)
+
+            hashes = stream_hashes(source)
+            digest = stream_hashes(hashing or source)[ALGORITHM]
+            stored = self._store.add(
+                spool.name,
+                digest,
+                size,
+                hashes,
+                file.get_checksums() if checksums is None else checksums,
+            )
+            destination = self._destination(file)
+            link_or_copy(stored, destination)
+
+        except Exception as error:
+            if os.path.exists(spool.name):
+                os.unlink(spool.name)
+            self._extractor.emit("file_download_failed", file, str(error))
+        else:
+            self._success(file, destination, hashes)
+
+    def _success(self, file: File, destination, hashes):
+        if hashes is None:
             self._extractor.emit("file_download_success", file, destination)
+        else:
+            self._extractor.emit(
+                "file_download_success", file, destination, hashes=hashes
+            )
+
+    def close(self):
+        if self._owns_store:
+            self._store.close()
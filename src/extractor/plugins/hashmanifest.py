@@ -0,0 +1,42 @@
+"""HashManifest Plugin writing the digests of the acquired files"""
+
+import csv
+import threading
+from pathlib import Path
+
+from extractor.common import Plugin
+from extractor.data import File
+
+
+class HashManifest(Plugin):
+    """
+    Writes the digests computed during the acquisition (see the `hashes`
+    option of the Extractor) to a CSV file: path, size and one column per
+    algorithm.
+    """
+
+    def __init__(self, path):
+        self._path = Path(path).absolute()
+        self._file = open(self._path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._algorithms = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def on_file_hashed(self, file: File, hashes: dict):
+        with self._lock:
+            if self._algorithms is None:
+                self._algorithms = list(hashes)
+                self._writer.writerow(["path", "size", *self._algorithms])
+
+            self._writer.writerow(
+                [file.path, file.size, *(hashes.get(name, "") for name in self._algorithms)]
+            )
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
@@ -0,0 +1,276 @@
+"""Inventory Plugin recording the enumerated folders and files in SQLite"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+
+from extractor.common import Plugin
+from extractor.common.tools import to_epoch
+from extractor.data import File, Folder
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    kind TEXT NOT NULL,
+    id TEXT NOT NULL,
+    path TEXT,
+    name TEXT,
+    size INTEGER,
+    owner INTEGER,
+    shared INTEGER,
+    created_at REAL,
+    modified_at REAL,
+    checksums TEXT,
+    status TEXT,
+    detail TEXT,
+    hashes TEXT,
+    PRIMARY KEY (kind, id)
+)
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS nodes_path ON nodes (path);
+CREATE INDEX IF NOT EXISTS nodes_size ON nodes (size);
+CREATE INDEX IF NOT EXISTS nodes_modified_at ON nodes (modified_at);
+"""
+
+# Found nodes keep the status recorded for them meanwhile and vice versa,
+# the events may arrive in either order
+UPSERT_NODE = """
+INSERT INTO nodes
+    (kind, id, path, name, size, owner, shared, created_at, modified_at, checksums)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (kind, id) DO UPDATE SET
+    path = excluded.path,
+    name = excluded.name,
+    size = excluded.size,
+    owner = excluded.owner,
+    shared = excluded.shared,
+    created_at = excluded.created_at,
+    modified_at = excluded.modified_at,
+    checksums = excluded.checksums
+"""
+
+UPSERT_STATUS = """
+INSERT INTO nodes (kind, id, path, name, size, status, detail, hashes)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (kind, id) DO UPDATE SET
+    status = excluded.status,
+    detail = excluded.detail,
+    hashes = coalesce(excluded.hashes, nodes.hashes)
+"""
+
+FOLDER = "folder"
+FILE = "file"
+
+
+def _bool(value) -> Optional[int]:
+    return None if value is None else int(bool(value))
+
+
+class Inventory(Plugin):
+    """
+    Records every folder and file of an acquisition in an SQLite database:
+    its attributes, the checksums of the service and what happened to it
+    (downloaded, failed or skipped). Query it with `python -m extractor query`.
+
+    The found folders and files arrive in batches, which are written with
+    one statement each and committed together every `commit_interval`
+    seconds. The indexes on path, size and modification time are built when
+    the inventory is closed, which is faster than maintaining them while
+    millions of rows are inserted.
+    """
+
+    DOWNLOADED = "downloaded"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+
+    def __init__(self, path, commit_interval: float = 1.0):
+        self._path = Path(path).absolute()
+        self._commit_interval = commit_interval
+        self._lock = threading.Lock()
+
+        self._db = sqlite3.connect(str(self._path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(SCHEMA)
+        self._committed_at = time.monotonic()
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def _commit(self, force: bool = False):
+        now = time.monotonic()
+        if force or now - self._committed_at >= self._commit_interval:
+            self._db.commit()
+            self._committed_at = now
+
+    def _upsert_nodes(self, rows: list):
+        with self._lock:
+            self._db.executemany(UPSERT_NODE, rows)
+            self._commit()
+
+    def _status(self, kind: str, node, status: str, detail=None, hashes=None):
+        with self._lock:
+            self._db.execute(
+                UPSERT_STATUS,
+                (
+                    kind,
+                    str(node.id),
+                    node.path,
+                    node.name,
+                    getattr(node, "size", None),
+                    status,
+                    None if detail is None else str(detail),
+                    None if hashes is None else json.dumps(hashes),
+                ),
+            )
+            self._commit()
+
+    def on_folders_found(self, folders: List[Folder]):
+        self._upsert_nodes(
+            [
+                (
+                    FOLDER,
+                    str(folder.id),
+                    folder.path,
+                    folder.name,
+                    None,
+                    _bool(folder.owner),
+                    _bool(folder.shared),
+                    to_epoch(folder.created_at),
+                    to_epoch(folder.modified_at),
+                    None,
+                )
+                for folder in folders
+            ]
+        )
+
+    def on_files_found(self, files: List[File]):
+        rows = []
+        for file in files:
+            checksums = file.get_checksums()
+            rows.append(
+                (
+                    FILE,
+                    str(file.id),
+                    file.path,
+                    file.name,
+                    file.size,
+                    _bool(file.owner),
+                    _bool(file.shared),
+                    to_epoch(file.created_at),
+                    to_epoch(file.modified_at),
+                    json.dumps(checksums) if checksums else None,
+                )
+            )
+        self._upsert_nodes(rows)
+
+    def on_file_download_success(self, file: File, destination, hashes=None):
+        self._status(FILE, file, self.DOWNLOADED, destination, hashes)
+
+    def on_file_download_failed(self, file: File, error):
+        self._status(FILE, file, self.FAILED, error)
+
+    def on_file_skipped(self, file: File, reason: str):
+        self._status(FILE, file, self.SKIPPED, reason)
+
+    def on_folder_skipped(self, folder: Folder, reason: str):
+        self._status(FOLDER, folder, self.SKIPPED, reason)
+
+    def close(self):
+        with self._lock:
+            if self._db is None:
+                return
+
+            self._db.commit()
+            self._db.executescript(INDEXES)
+            self._db.execute("ANALYZE")
+            self._db.commit()
+            self._db.close()
+            self._db = None
+
+
+def _iso(epoch: Optional[float]) -> Optional[str]:
+    if epoch is None:
+        return None
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+def query(
+    path,
+    largest: Optional[int] = None,
+    modified_from: Optional[str] = None,
+    modified_to: Optional[str] = None,
+    path_prefix: Optional[str] = None,
+    status: Optional[str] = None,
+    kind: str = FILE,
+    limit: Optional[int] = None,
+):
+    """
+    Query an inventory, the conditions are combined.
+
+    Args:
+        largest (int): the largest files, by size descending
+        modified_from (str): modified at or after, ISO 8601 or RFC 2822
+        modified_to (str): modified before
+        path_prefix (str): below that path
+        status (str): downloaded, failed, skipped or "none"
+
+    Returns:
+        tuple: the column names and an iterator over the rows
+    """
+    db = sqlite3.connect(str(Path(path).absolute()))
+    # inventories of interrupted acquisitions lack the indexes
+    db.executescript(INDEXES)
+
+    conditions = ["kind = ?"]
+    parameters = [kind]
+    if modified_from is not None:
+        conditions.append("modified_at >= ?")
+        parameters.append(to_epoch(modified_from))
+    if modified_to is not None:
+        conditions.append("modified_at < ?")
+        parameters.append(to_epoch(modified_to))
+    if path_prefix:
+        # a range, unlike LIKE it can use the index on path
+        prefix = path_prefix.strip("/") + "/"
+        conditions.append("path >= ? AND path < ?")
+        parameters.extend((prefix, prefix[:-1] + "0"))  # "0" follows "/"
+    if status == "none":
+        conditions.append("status IS NULL")
+    elif status is not None:
+        conditions.append("status = ?")
+        parameters.append(status)
+
+    sql = (
+        "SELECT kind, id, path, size, owner, shared, created_at, modified_at,"
+        " status, detail, checksums, hashes FROM nodes"
+        f" WHERE {' AND '.join(conditions)}"
+    )
+    if largest is not None:
+        sql += " ORDER BY size DESC"
+        limit = largest if limit is None else min(limit, largest)
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+
+    cursor = db.execute(sql, parameters)
+    columns = [description[0] for description in cursor.description]
+
+    def rows():
+        try:
+            for row in cursor:
+                row = list(row)
+                row[6], row[7] = _iso(row[6]), _iso(row[7])
+                yield row
+        finally:
+            db.close()
+
+    return columns, rows()
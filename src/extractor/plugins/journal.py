@@ -0,0 +1,177 @@
+"""Journal Plugin recording the finished work of an acquisition"""
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from extractor.common import Plugin
+from extractor.data import File, Folder
+
+logger = logging.getLogger(__name__)
+
+
+def _key(node) -> tuple:
+    return (str(node.id), node.path)
+
+
+def _parent(path: str) -> str:
+    return path.rpartition("/")[0]
+
+
+class _FolderState:
+    __slots__ = ("folder", "remaining", "listed")
+
+    def __init__(self):
+        self.folder = None
+        self.remaining = 0  # children listed but not finished yet
+        self.listed = False
+
+
+class Journal(Plugin):
+    """
+    Append-only journal of the finished work, to resume an acquisition.
+
+    Every line is a JSON record:
+        file_done: a file was downloaded, with its size and hashes
+        folder_done: a folder and everything below it is finished
+
+    A folder is finished once it was listed and all its children are
+    finished or skipped; failed files and failed listings keep their
+    folders open, so a resumed run lists and tries them again. With `resume`
+    the records of an existing journal are replayed: finished files and
+    folders are skipped and the walk doesn't list finished folders again.
+    """
+
+    def __init__(self, path, resume: bool = False, sync_interval: float = 1.0):
+        self._path = Path(path).absolute()
+        self._sync_interval = sync_interval
+        self._done_files = {}  # (id, path) -> size
+        self._done_folders = set()  # (id, path)
+        self._folders = {}  # path -> _FolderState of the folders in progress
+        self._lock = threading.Lock()
+
+        if resume and self._path.exists():
+            self._replay()
+            mode = "a"
+        else:
+            mode = "w"
+
+        self._file = open(self._path, mode, encoding="utf-8")
+        self._synced_at = time.monotonic()
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def _replay(self):
+        with open(self._path, "rb") as journal:
+            data = journal.read()
+
+        # An interrupted write leaves an incomplete last line behind
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            with open(self._path, "r+b") as journal:
+                journal.truncate(end)
+
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning("Skipping corrupt journal record %r", line)
+                continue
+
+            key = (record.get("id"), record.get("path"))
+            if record.get("event") == "file_done":
+                self._done_files[key] = record.get("size")
+            elif record.get("event") == "folder_done":
+                self._done_folders.add(key)
+
+        logger.info(
+            "Journal replayed, %d files and %d folders finished",
+            len(self._done_files),
+            len(self._done_folders),
+        )
+
+    def _write(self, record: dict):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+        now = time.monotonic()
+        if now - self._synced_at >= self._sync_interval:
+            os.fsync(self._file.fileno())
+            self._synced_at = now
+
+    def should_skip(self, node) -> Optional[str]:
+        if isinstance(node, Folder):
+            if _key(node) in self._done_folders:
+                return "journal"
+        elif self._done_files.get(_key(node), -1) == node.size:
+            return "journal"
+
+        return None
+
+    def _state(self, path: str) -> _FolderState:
+        state = self._folders.get(path)
+        if state is None:
+            state = self._folders[path] = _FolderState()
+
+        return state
+
+    def _child_done(self, path: str):
+        # Walk up while the folders get finished, iterative for deep trees
+        while True:
+            state = self._state(path)
+            state.remaining -= 1
+            if not state.listed or state.remaining:
+                return
+
+            del self._folders[path]
+            if state.folder is None:
+                return  # the root
+
+            self._write(
+                {"event": "folder_done", "id": str(state.folder.id), "path": path}
+            )
+            path = _parent(path)
+
+    def on_folder_listed(self, folder: Optional[Folder], count: int):
+        path = "" if folder is None else folder.path
+        with self._lock:
+            state = self._state(path)
+            state.folder = folder
+            state.listed = True
+            state.remaining += count + 1  # the extra one is done right away
+
+            self._child_done(path)
+
+    def on_file_download_success(self, file: File, destination, hashes=None):
+        with self._lock:
+            self._write(
+                {
+                    "event": "file_done",
+                    "id": str(file.id),
+                    "path": file.path,
+                    "size": file.size,
+                    "hashes": hashes,
+                }
+            )
+            self._child_done(_parent(file.path))
+
+    def on_file_skipped(self, file: File, reason: str):
+        with self._lock:
+            self._child_done(_parent(file.path))
+
+    def on_folder_skipped(self, folder: Folder, reason: str):
+        with self._lock:
+            self._child_done(_parent(folder.path))
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
@@ -0,0 +1,60 @@
+"""KnownFiles Plugin skipping files of known hash sets"""
+
+import logging
+import threading
+from typing import Optional
+
+from extractor.common import Plugin
+from extractor.common.hashset import HashSet
+from extractor.data import Folder
+
+logger = logging.getLogger(__name__)
+
+
+class KnownFiles(Plugin):
+    """
+    Skips the files whose checksum is in a known-file hash set (e.g. NSRL),
+    see `HashSet.build`. They are announced as `file_skipped` with the
+    reason "known" instead of being downloaded.
+
+    The files are looked up by the checksums their service lists, of the
+    algorithm of each hash set. With `fetch` the services are asked for
+    checksums they don't list, which costs a request per file during the
+    enumeration.
+    """
+
+    REASON = "known"
+
+    def __init__(self, *hash_sets, fetch: bool = False):
+        self._hash_sets = [s if isinstance(s, HashSet) else HashSet(s) for s in hash_sets]
+        # the ones opened here from a path
+        self._owned = [
+            opened for opened, given in zip(self._hash_sets, hash_sets) if opened is not given
+        ]
+        self._fetch = fetch
+        self._known = 0
+        self._lock = threading.Lock()
+
+    def should_skip(self, node) -> Optional[str]:
+        if isinstance(node, Folder):
+            return None
+
+        try:
+            checksums = node.get_checksums(fetch=self._fetch)
+        except Exception as error:
+            logger.debug("No checksums for %s. %s", node.path, error)
+            return None
+
+        for hash_set in self._hash_sets:
+            value = checksums.get(hash_set.algorithm)
+            if value and hash_set.contains_hex(value):
+                with self._lock:
+                    self._known += 1
+                return self.REASON
+
+        return None
+
+    def close(self):
+        logger.info("%d known files skipped", self._known)
+        for hash_set in self._owned:
+            hash_set.close()
@@ -27,6 +27,7 @@ class Logfile(Plugin):
         _logger.addHandler(_fh)
 
         self._logger = _logger
+        self._handler = _fh
 
     @property
     def logger(self):
@@ -35,6 +36,26 @@ class Logfile(Plugin):
     def log(self, message: str):
         self.logger.info(message)
 
+    def log_many(self, msg: str, items):
+        """Log a message for each item with a single write"""
+        handler = self._handler
+        text = "".join(
+            handler.format(
+                logging.LogRecord(
+                    self.logger.name, logging.INFO, __file__, 0, msg, (item,), None
+                )
+            )
+            + handler.terminator
+            for item in items
+        )
+
+        handler.acquire()
+        try:
+            handler.stream.write(text)
+            handler.flush()
+        finally:
+            handler.release()
+
     def on(self, event, *args, **kwargs):
         if event not in self.exclude:
             self.log(event)
@@ -51,8 +72,8 @@ class Logfile(Plugin):
     def on_login_failure(self, exception):
         self.logger.error("LOGIN_FAILED %s", exception)
 
-    def on_folder_found(self, folder):
-        self.logger.info("FOLDER_FOUND %s", folder)
+    def on_folders_found(self, folders):
+        self.log_many("FOLDER_FOUND %s", folders)
 
-    def on_file_found(self, file):
-        self.logger.info("FILE_FOUND %s", file)
+    def on_files_found(self, files):
+        self.log_many("FILE_FOUND %s", files)
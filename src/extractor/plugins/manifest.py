@@ -0,0 +1,209 @@
+"""Manifest Plugin for incremental acquisitions"""
+
+import csv
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from extractor import Extractor
+from extractor.common import Plugin
+from extractor.data import File
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER,
+    modified_at TEXT,
+    checksums TEXT,
+    change TEXT NOT NULL,
+    destination TEXT,
+    hashes TEXT
+)
+"""
+
+
+class Manifest(Plugin):
+    """
+    Records the acquired files in an SQLite manifest keyed by their file id.
+
+    Given the manifest of a previous run, every file found is looked up in it
+    and compared by a checksum both runs know (see `File.get_checksums`),
+    otherwise by size and modification time. Unchanged files are announced
+    with `file_unchanged(file, previous_destination, hashes)`, the Downloader
+    then reuses the previous copy instead of downloading it again.
+
+    When closed, the added, modified and removed files are written to
+    `<path>.report.csv`.
+
+    With `resume` the manifest of the interrupted run is continued: the
+    files the Journal skips keep their rows, the others are updated.
+    """
+
+    ADDED = "added"
+    MODIFIED = "modified"
+    UNCHANGED = "unchanged"
+    REMOVED = "removed"
+
+    def __init__(
+        self, path, previous=None, commit_interval: float = 1.0, resume: bool = False
+    ):
+        self._extractor = None
+        self._path = Path(path).absolute()
+        self._previous_path = None if previous is None else Path(previous).absolute()
+        self._commit_interval = commit_interval
+        self._changes = Counter()
+        self._lock = threading.Lock()
+
+        if self._previous_path == self._path:
+            raise ValueError("The previous manifest can't be overwritten")
+
+        self._db = sqlite3.connect(str(self._path), uri=True, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        if not resume:
+            self._db.execute("DROP TABLE IF EXISTS files")
+        self._db.execute(SCHEMA)
+        self._committed_at = time.monotonic()
+
+        self._previous = None
+        if self._previous_path is not None:
+            self._previous = sqlite3.connect(
+                f"{self._previous_path.as_uri()}?mode=ro",
+                uri=True,
+                check_same_thread=False,
+            )
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def init(self, extractor: Extractor):
+        self._extractor = extractor
+
+    def _commit(self, force: bool = False):
+        now = time.monotonic()
+        if force or now - self._committed_at >= self._commit_interval:
+            self._db.commit()
+            self._committed_at = now
+
+    def _compare(self, file: File, checksums: dict, modified_at: Optional[str]):
+        """
+        Returns:
+            tuple: the change and the previous destination and hashes
+        """
+        if self._previous is None:
+            return self.ADDED, None, None
+
+        with self._lock:
+            row = self._previous.execute(
+                "SELECT size, modified_at, checksums, destination, hashes"
+                " FROM files WHERE id = ?",
+                (str(file.id),),
+            ).fetchone()
+
+        if row is None:
+            return self.ADDED, None, None
+
+        size, previous_modified_at, previous_checksums, destination, hashes = row
+        previous_checksums = json.loads(previous_checksums or "{}")
+
+        common = set(checksums) & set(previous_checksums)
+        if common:
+            unchanged = all(checksums[name] == previous_checksums[name] for name in common)
+        else:
+            unchanged = modified_at is not None and modified_at == previous_modified_at
+
+        if not unchanged or size != file.size:
+            return self.MODIFIED, None, None
+
+        return self.UNCHANGED, destination, json.loads(hashes or "null")
+
+    def on_file_found(self, file: File):
+        checksums = file.get_checksums()
+        modified_at = None if file.modified_at is None else str(file.modified_at)
+        change, destination, hashes = self._compare(file, checksums, modified_at)
+
+        with self._lock:
+            # a resumed run keeps the destination of a file downloaded before
+            self._db.execute(
+                "INSERT INTO files"
+                " (id, path, size, modified_at, checksums, change)"
+                " VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (id) DO UPDATE SET path = excluded.path,"
+                " size = excluded.size, modified_at = excluded.modified_at,"
+                " checksums = excluded.checksums, change = excluded.change",
+                (
+                    str(file.id),
+                    file.path,
+                    file.size,
+                    modified_at,
+                    json.dumps(checksums) if checksums else None,
+                    change,
+                ),
+            )
+            self._changes[change] += 1
+            self._commit()
+
+        if change == self.UNCHANGED and destination is not None:
+            self._extractor.emit("file_unchanged", file, destination, hashes)
+
+    def on_file_download_success(self, file: File, destination, hashes=None):
+        with self._lock:
+            self._db.execute(
+                "UPDATE files SET destination = ?, hashes = ? WHERE id = ?",
+                (
+                    str(destination),
+                    None if hashes is None else json.dumps(hashes),
+                    str(file.id),
+                ),
+            )
+            self._commit()
+
+    def _write_report(self):
+        report = self._path.with_name(self._path.name + ".report.csv")
+        with open(report, "w", newline="", encoding="utf-8") as target:
+            writer = csv.writer(target)
+            writer.writerow(["change", "id", "path"])
+
+            for row in self._db.execute(
+                "SELECT change, id, path FROM files WHERE change != ?",
+                (self.UNCHANGED,),
+            ):
+                writer.writerow(row)
+
+            if self._previous is not None:
+                self._db.execute(
+                    "ATTACH DATABASE ? AS previous",
+                    (f"{self._previous_path.as_uri()}?mode=ro",),
+                )
+                for file_id, path in self._db.execute(
+                    "SELECT id, path FROM previous.files"
+                    " WHERE id NOT IN (SELECT id FROM main.files)"
+                ):
+                    writer.writerow([self.REMOVED, file_id, path])
+                    self._changes[self.REMOVED] += 1
+                self._db.execute("DETACH DATABASE previous")
+
+        logger.info("Manifest report %s: %s", report, dict(self._changes))
+
+    def close(self):
+        with self._lock:
+            if self._db is None:
+                return
+
+            self._commit(force=True)
+            self._write_report()
+            self._db.close()
+            self._db = None
+
+            if self._previous is not None:
+                self._previous.close()
+                self._previous = None
@@ -2,9 +2,13 @@ from tkinter.messagebox import NO
 from extractor.data.user import User
 import xry
 import logging
-from extractor.data import File
-from functools import lru_cache
+import threading
+from contextlib import nullcontext
+from typing import Optional
+from extractor.data import File, Folder, PathNode
+from extractor.data.path import ROOT
 from extractor.common import Plugin
+from extractor.common.stream import DEFAULT_CHUNK_SIZE
 
 logger = logging.getLogger(__name__)
 
@@ -43,10 +47,20 @@ class XRYLogfile(Plugin):
         self._image = image
         self._volume = None
         self._extractor = None
+        self._lock = nullcontext()
+        # XRY nodes by path, the parents of the folders and files
+        self._folders = {}
+        self._files = {}
+        # children of a folder still to be written, negative until it's listed
+        self._pending = {}
 
     def init(self, extractor):
         self._extractor = extractor
 
+        # The XRY image isn't thread safe
+        if extractor.concurrent:
+            self._lock = threading.RLock()
+
     @property
     def volume(self):
         if self._volume is None:
@@ -54,29 +68,37 @@ class XRYLogfile(Plugin):
 
         return self._volume
 
-    @lru_cache(maxsize=None)
-    def _find_or_create_folder(self, path):
-        if path == "":
-            return self.volume
-
-        dirs = path.split("/")
-        dirname = dirs.pop()
-        parent_path = "/".join(dirs)
-        parent_node = self._find_or_create_folder(parent_path)
-        node = self._image.create_folder(parent_node, dirname)
+    def _find_or_create_folder(self, node: PathNode):
+        folder_object = self._folders.get(node)
+        if folder_object is None:
+            if node.is_root:
+                folder_object = self.volume
+            else:
+                parent_object = self._find_or_create_folder(node.parent)
+                folder_object = self._image.create_folder(parent_object, node.name)
+            self._folders[node] = folder_object
 
-        return node
+        return folder_object
 
-    @lru_cache(maxsize=None)
-    def _find_or_create_file(self, path):
-        dirs = path.split("/")
-        filename = dirs.pop()
-        parent_path = "/".join(dirs)
-        folder_node = self._find_or_create_folder(parent_path)
-        file_object = self._image.create_file(folder_node, filename)
+    def _find_or_create_file(self, node: PathNode):
+        file_object = self._files.get(node)
+        if file_object is None:
+            folder_object = self._find_or_create_folder(node.parent)
+            file_object = self._files[node] = self._image.create_file(
+                folder_object, node.name
+            )
 
         return file_object
 
+    def _children_written(self, folder: PathNode, count: int = 1):
+        """Drop the handle of a folder once all its listed children are written"""
+        remaining = self._pending.get(folder, 0) - count
+        if remaining:
+            self._pending[folder] = remaining
+        else:
+            self._pending.pop(folder, None)
+            self._folders.pop(folder, None)
+
     def on_login_success(self, user: User):
         image = self._image
         accountItem = image.create_item(xry.nodeids.views.accounts_view)
@@ -110,46 +132,73 @@ class XRYLogfile(Plugin):
     def on_folder_found(self, folder):
         logger.info("Folder found. %s", folder)
 
-        folder_object = self._find_or_create_folder(folder.path)
+        with self._lock:
+            folder_object = self._find_or_create_folder(folder.path_node)
 
-        # add properties like created, modified, ...
-        if folder.created_at is not None:
-            self._image.create_property(
-                folder_object, xry.nodeids.views.documents_view.properties.created
-            ).set_value(folder.created_at)
-
-    def on_file_found(self, file: File):
-        logger.info("File found. %s", file)
+            # add properties like created, modified, ...
+            if folder.created_at is not None:
+                self._image.create_property(
+                    folder_object, xry.nodeids.views.documents_view.properties.created
+                ).set_value(folder.created_at)
 
-        # Create File Handle in Case
-        file_object = self._find_or_create_file(file.path)
-        self._image.create_property(
-            file_object, xry.nodeids.views.documents_view.properties.file_path
-        ).set_value(file.path)
+            self._children_written(folder.path_node.parent)
 
-        # add aditional properties like created, modified, ...
-        if file.created_at is not None:
-            self._image.create_property(
-                file_object, xry.nodeids.views.documents_view.properties.created
-            ).set_value(file.created_at)
+    def on_folder_listed(self, folder: Optional[Folder], count: int):
+        node = ROOT if folder is None else folder.path_node
+        with self._lock:
+            self._children_written(node, -count)
 
-        if file.modified_at is not None:
-            self._image.create_property(
-                file_object, xry.nodeids.views.documents_view.properties.modified
-            ).set_value(file.modified_at)
+    def on_folder_skipped(self, folder: Folder, reason: str):
+        with self._lock:
+            self._children_written(folder.path_node.parent)
 
-        # Acquire file content
-        prop_data = self._image.create_property(file_object, xry.proptypes.raw_data)
+    def on_file_found(self, file: File):
+        logger.info("File found. %s", file)
 
-        with file as file_stream:
-            chunk_size = 4096
-            try:
-                while True:
-                    chunk = file_stream.read(chunk_size)
+        with self._lock:
+            # Create File Handle in Case
+            file_object = self._find_or_create_file(file.path_node)
+            self._image.create_property(
+                file_object, xry.nodeids.views.documents_view.properties.file_path
+            ).set_value(file.path)
+
+            # add aditional properties like created, modified, ...
+            if file.created_at is not None:
+                self._image.create_property(
+                    file_object, xry.nodeids.views.documents_view.properties.created
+                ).set_value(file.created_at)
+
+            if file.modified_at is not None:
+                self._image.create_property(
+                    file_object, xry.nodeids.views.documents_view.properties.modified
+                ).set_value(file.modified_at)
+
+            self._children_written(file.path_node.parent)
+
+    def on_file_skipped(self, file: File, reason: str):
+        with self._lock:
+            self._files.pop(file.path_node, None)
+            self._children_written(file.path_node.parent)
+
+    def on_file_download_failed(self, file: File, error):
+        with self._lock:
+            self._files.pop(file.path_node, None)
+
+    def on_file_content(self, file: File, file_stream):
+        with self._lock:
+            file_object = self._find_or_create_file(file.path_node)
+            # not looked up again once the content is written
+            self._files.pop(file.path_node, None)
+            prop_data = self._image.create_property(file_object, xry.proptypes.raw_data)
+
+        try:
+            while True:
+                chunk = file_stream.read(DEFAULT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                with self._lock:
                     prop_data.write_data(chunk)
-                    if len(chunk) < chunk_size:
-                        break
-            except Exception as ex:
-                logger.error("File acquisition error. %s", ex)
-            else:
-                logger.info("File acquired. %s", file)
+        except Exception as ex:
+            logger.error("File acquisition error. %s", ex)
+        else:
+            logger.info("File acquired. %s", file)
@@ -1,4 +1,10 @@
+import threading
+import time
+
 import requests
+from extractor.common.stream import range_header
+from extractor.common.tokencache import renew_on_unauthorized
+from extractor.common.transport import DEFAULT_TRANSPORT
 
 
 class Client:
@@ -6,17 +12,33 @@ class Client:
 
     ENDPOINT_URL = "https://api.hidrive.strato.com/2.1"
 
-    def __init__(self, username, password):
+    def __init__(self, username, password, cache=None):
         # store Credentials
         self._username = username
         self._password = password
 
         # Session
-        self._http: requests.Session = None  # Requests session
+        self._http: requests.Session = DEFAULT_TRANSPORT.session(
+            headers={"Content-Type": "application/xml; charset=UTF-8"}
+        )
+        renew_on_unauthorized(self._http, self._renew)
         self._access_token: str = None
+        self._expires: float = None
+        self._user: dict = None
+        self._cache = cache
+        self._cached = False
+        self._login_lock = threading.Lock()
 
         # Login
-        self._login()
+        tokens = cache.load() if cache is not None else None
+        if tokens is not None:
+            # checked by the first request
+            self._authorize(tokens["access_token"])
+            self._expires = tokens.get("expires")
+            self._user = tokens.get("user")
+            self._cached = True
+        else:
+            self._login()
 
     def _login(self) -> None:
         """
@@ -24,7 +46,7 @@ class Client:
         """
 
         # sending the request to get the token
-        response = requests.post(
+        response = DEFAULT_TRANSPORT.post(
             "https://my.hidrive.com/auth/login",
             headers={
                 "Accept": "*/*",
@@ -42,21 +64,51 @@ class Client:
         ).json()
 
         if "access_token" in response:  # check the response
-            self._access_token = response["access_token"]  # save the access_token
+            self._authorize(response["access_token"])  # save the access_token
         else:
             raise Exception("Login failed")
 
-        # Create Session Object for further HTTP-Handling
-        session = requests.Session()
-        session.headers.update(
-            {
-                "Content-Type": "application/xml; charset=UTF-8",
-                "Authorization": f"Bearer {self._access_token}",
-            }
-        )
-        self._http = session
+        self._cached = False
+        self._expires = None
+        if response.get("expires_in"):
+            self._expires = time.time() + float(response["expires_in"])
+        self._store()
+
+    def _authorize(self, access_token: str) -> None:
+        self._access_token = access_token
+        self._http.headers["Authorization"] = f"Bearer {access_token}"
+
+    def _store(self) -> None:
+        if self._cache is not None:
+            self._cache.store(
+                {
+                    "access_token": self._access_token,
+                    "expires": self._expires,
+                    "user": self._user,
+                },
+                expires=self._expires,
+            )
+
+    def _renew(self, rejected: str) -> bool:
+        """Login again if the rejected access_token came from the cache"""
+        with self._login_lock:
+            if rejected != self._http.headers["Authorization"]:
+                return True
+            if not self._cached:
+                return False
+
+            self._cache.discard()
+            self._login()
+            return True
 
     def get_user_data(self) -> dict:
+        """The user of the login, fetched once"""
+        if self._user is None:
+            self._user = self._get_user_data()
+            self._store()
+        return self._user
+
+    def _get_user_data(self) -> dict:
         response = self._http.get(
             f"{self.ENDPOINT_URL}/user",
             params={
@@ -76,9 +128,14 @@ class Client:
 
         return response.content
 
-    def get_file_content_stream(self, path: str) -> requests.Response:
+    def get_file_content_stream(
+        self, path: str, offset: int = 0, length: int = None
+    ) -> requests.Response:
         response = self._http.get(
-            f"{self.ENDPOINT_URL}/file", params={"path": path}, stream=True
+            f"{self.ENDPOINT_URL}/file",
+            params={"path": path},
+            headers=range_header(offset, length),
+            stream=True,
         )
         response.raise_for_status()
         return response
@@ -119,7 +176,7 @@ class Client:
                     "path": path,
                     "members": "all",
                     "limit": f"{fetch_start},{fetch_end}",
-                    "fields": "members.id,members.name,members.path,members.ctime,members.mtime,members.type",
+                    "fields": "members.id,members.name,members.path,members.ctime,members.mtime,members.type,members.size,members.chash",
                 },
             )
             response.raise_for_status()
@@ -1,24 +1,25 @@
-from io import BufferedReader
-from dataclasses import dataclass, field
-from extractor.common.tools import iterable_to_stream
+from dataclasses import field
+from typing import Optional
+from extractor.common.stream import ResponseStream, check_range
 from extractor.data import File
+from extractor.data.model import model
 from extractor.services.hidrive.client import Client
 
 
-@dataclass
+@model
 class HidriveFile(File):
     session: Client = field(compare=False, hash=False, repr=False)
+    # HiDrive's content hash
+    chash: Optional[str] = field(default=None, compare=False, repr=False)
 
-    def get_stream(self) -> BufferedReader:
-        response = self.session.get_file_content_stream(f"/{self.path}")
+    def get_checksums(self, fetch: bool = False) -> dict:
+        return {"hidrive": self.chash} if self.chash else {}
 
-        buffer_size = 4096
-        return iterable_to_stream(
-            response.iter_content(chunk_size=buffer_size), buffer_size=buffer_size
-        )
-
-    def __enter__(self):
-        return self.get_stream()
+    supports_ranges = True
 
-    def __exit__(self, exception_type, exception_value, exception_traceback):
-        ...
+    def get_stream(self, offset: int = 0, length: Optional[int] = None) -> ResponseStream:
+        response = self.session.get_file_content_stream(
+            f"/{self.path}", offset=offset, length=length
+        )
+        check_range(response, offset, length)
+        return ResponseStream(response)
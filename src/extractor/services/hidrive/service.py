@@ -1,22 +1,30 @@
-import pytz
-from typing import Iterable
+from typing import Iterable, Optional, Union
 from extractor.common import CloudService
 from extractor.errors import NotLoggedInError
 from extractor.data import User
 from extractor.data import Folder
 from extractor.data import File
+from extractor.data.path import ROOT, PathNode
 from extractor.services.hidrive.client import Client
 from extractor.services.hidrive.file import HidriveFile
-from datetime import datetime
 
 
 class HidriveService(CloudService):
+    # the listings are plain GETs, the client renews its token under a lock
+    list_concurrency = 4
+    # API and login
+    domains = ("hidrive.strato.com", "hidrive.com")
+
     def __init__(self):
         self.client = None
 
     def login(self, username: str, password: str) -> User:
         try:
-            client = Client(username=username, password=password)
+            client = Client(
+                username=username,
+                password=password,
+                cache=self.cached_tokens(username, password),
+            )
         except Exception as ex:
             raise NotLoggedInError from ex
         else:
@@ -45,74 +53,44 @@ class HidriveService(CloudService):
             # phone=None,
         )
 
-    @property
-    def folders(self) -> Iterable[Folder]:
-        if not self.is_logged_in:
-            raise NotLoggedInError
-
-        def traverse(folder):
-            if not folder.get("path") == "/":
-                yield Folder(
-                    id=folder.get("id"),
-                    name=folder.get("name"),
-                    path=folder.get("path")[1:],
-                    owner=True,
-                    shared=False,
-                    created_at=datetime.fromtimestamp(folder.get("ctime"), tz=pytz.UTC)
-                    if folder.get("ctime") is not None
-                    else None,
-                    modified_at=datetime.fromtimestamp(folder.get("mtime"), tz=pytz.UTC)
-                    if folder.get("mtime") is not None
-                    else None,
-                )
-
-            for subfolder in [
-                item for item in folder.get("members", []) if item.get("type") == "dir"
-            ]:
-                try:
-                    subfolder = self.client.get_directory(path=subfolder.get("path"))
-                except Exception as ex:
-                    pass
-                else:
-                    yield from traverse(subfolder)
+    def _parse_folder(self, data, parent: PathNode = ROOT) -> Folder:
+        return Folder(
+            id=data.get("id"),
+            name=data.get("name"),
+            path=parent.child(data.get("name")),
+            owner=True,
+            shared=False,
+            created_at=data.get("ctime"),
+            modified_at=data.get("mtime"),
+        )
 
-        root = self.client.get_directory(path="/")
-        yield from traverse(root)
+    def _parse_file(self, data, parent: PathNode = ROOT) -> File:
+        return HidriveFile(
+            id=data.get("id"),
+            name=data.get("name"),
+            path=parent.child(data.get("name")),
+            size=data.get("size"),
+            owner=True,
+            shared=False,
+            created_at=data.get("ctime"),
+            modified_at=data.get("mtime"),
+            session=self.client,
+            chash=data.get("chash"),
+        )
 
-    @property
-    def files(self) -> Iterable[File]:
+    def list_children(self, folder: Optional[Folder]) -> Iterable[Union[Folder, File]]:
         if not self.is_logged_in:
             raise NotLoggedInError
 
-        def traverse(folder):
-            for file in [
-                item for item in folder.get("members") if item.get("type") == "file"
-            ]:
-                yield HidriveFile(
-                    id=file.get("id"),
-                    name=file.get("name"),
-                    path=file.get("path")[1:],
-                    size=file.get("size"),
-                    owner=True,
-                    shared=False,
-                    created_at=datetime.fromtimestamp(file.get("ctime"), tz=pytz.UTC)
-                    if file.get("ctime") is not None
-                    else None,
-                    modified_at=datetime.fromtimestamp(file.get("mtime"), tz=pytz.UTC)
-                    if file.get("mtime") is not None
-                    else None,
-                    session=self.client,
-                )
-
-            for subfolder in [
-                item for item in folder.get("members", []) if item.get("type") == "dir"
-            ]:
-                try:
-                    subfolder = self.client.get_directory(path=subfolder.get("path"))
-                except Exception:
-                    pass
-                else:
-                    yield from traverse(subfolder)
-
-        root = self.client.get_directory(path="/")
-        yield from traverse(root)
+        # a failed listing raises, the walk reports it (see walk_tree)
+        if folder is None:
+            directory = self.client.get_directory(path="/")
+        else:
+            directory = self.client.get_directory(path="/" + folder.path)
+
+        parent = ROOT if folder is None else folder.path_node
+        for item in directory.get("members", []):
+            if item.get("type") == "dir":
+                yield self._parse_folder(item, parent)
+            elif item.get("type") == "file":
+                yield self._parse_file(item, parent)
@@ -1,15 +1,26 @@
 """Low-level MediaFire API Client"""
 
+import atexit
 import hashlib
 import logging
+import threading
+import time
 
-import requests
-from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
 from urllib.parse import urlencode
 
+from extractor.common.transport import DEFAULT_TRANSPORT
+
 logger = logging.getLogger(__name__)
 
+# "Session token is invalid", "Signature is invalid", e.g. the session of a
+# cache expired or another process signed with its secret key meanwhile
+SESSION_ERRORS = (105, 127)
+# Seconds a session token stays valid without a call
+SESSION_LIFETIME = 600
+# Seconds between two writes of the advancing secret key to the cache
+STORE_INTERVAL = 30.0
+
 
 class QueryParams(dict):
     """dict tailored for MediaFire requests.
@@ -54,21 +65,51 @@ class MediaFireConnectionError(Exception):
     pass
 
 
+def _error_code(error):
+    try:
+        return int(error.code)
+    except (TypeError, ValueError):
+        return None
+
+
 class Client:
     """Low-level HTTP API Client"""
 
     API_BASE = "https://www.mediafire.com"
     API_VER = "1.5"
 
-    def __init__(self, email, password, app_id="42511"):
+    def __init__(self, email, password, app_id="42511", cache=None):
         """Initialize MediaFire Client"""
 
-        self.http = requests.Session()
-        self.http.mount("https://", HTTPAdapter(max_retries=3))
+        self.http = DEFAULT_TRANSPORT.session()
         self._session = None
         self._action_tokens = {}
+        # the signature of a call depends on the secret key regenerated by
+        # the previous one, so calls must not overlap
+        self._lock = threading.RLock()
+        # user/get_info of the account
+        self.account = None
+        self._cache = cache
+        self._credentials = (email, password, app_id)
+        self._cached = False
+        # secret key in the cache and when it was written
+        self._stored_key = None
+        self._stored_at = None
+
+        tokens = cache.load() if cache is not None else None
+        if tokens is not None:
+            # checked by the first call
+            self.session = tokens["session"]
+            self.account = tokens.get("account")
+            self._cached = True
+            self._stored_key = self._session["secret_key"]
+            self._stored_at = time.monotonic()
+        else:
+            self.login(email, password, app_id)
 
-        self.login(email, password, app_id)
+        if cache is not None:
+            # the next run continues with the secret key of the last call
+            atexit.register(self.close)
 
     @classmethod
     def _build_uri(cls, action):
@@ -139,6 +180,41 @@ class Client:
                 int(self._session["secret_key"]) * 16807
             ) % 2147483647
 
+    def _store_session(self):
+        """Cache the session with the secret key of the next call"""
+        if self._cache is not None and self._session is not None:
+            self._cache.store(
+                {"session": self._session, "account": self.account},
+                expires=time.time() + SESSION_LIFETIME,
+            )
+            self._stored_key = self._session["secret_key"]
+            self._stored_at = time.monotonic()
+
+    def _store_advanced_key(self, interval: float = STORE_INTERVAL):
+        """
+        Cache the secret key if it advanced since the last write, at most
+        every `interval` seconds. The key advances with almost every call,
+        a cached key that fell behind is rejected and costs a login.
+        """
+        if (
+            self._cache is None
+            or self._session is None
+            or self._session["secret_key"] == self._stored_key
+        ):
+            return
+        if self._stored_at is not None and time.monotonic() - self._stored_at < interval:
+            return
+
+        try:
+            self._store_session()
+        except Exception as ex:
+            logger.debug("Caching the MediaFire session failed: %s", ex)
+
+    def close(self):
+        """Cache the current secret key, a later run continues the session"""
+        with self._lock:
+            self._store_advanced_key(interval=0)
+
     def _request(
         self,
         action,
@@ -154,6 +230,22 @@ class Client:
         session_token and signature generation/update is handled automatically
         """
 
+        with self._lock:
+            try:
+                response = self._locked_request(action, params, headers)
+            except MediaFireApiError as ex:
+                if not self._cached or _error_code(ex) not in SESSION_ERRORS:
+                    raise
+
+                logger.debug("Cached session rejected, logging in")
+                self._cache.discard()
+                self.login(*self._credentials)
+                response = self._locked_request(action, params, headers)
+
+            self._store_advanced_key()
+            return response
+
+    def _locked_request(self, action, params, headers):
         uri = self._build_uri(action)
 
         if isinstance(params, str):
@@ -219,9 +311,22 @@ class Client:
         self._session = None
 
     def login(self, email, password, app_id):
+        self._cached = False
+        # nothing to cache until the new session is complete
+        del self.session
+        self._stored_at = time.monotonic()
         self.session = self.user_get_session_token(
             app_id=app_id, email=email, password=password, api_key=None
         )
+        # cached with the session, a run with its tokens doesn't fetch it
+        self.account = self.user_get_info()
+        self._store_session()
+
+    def account_info(self):
+        """user/get_info, fetched with the login and cached with the session"""
+        if self.account is None:
+            self.account = self.user_get_info()
+        return self.account
 
     def user_get_session_token(
         self,
@@ -294,7 +399,11 @@ class Client:
 
         http://www.mediafire.com/developers/core_api/1.3/user/#renew_session_token
         """
-        return self._request("user/renew_session_token")
+        response = self._request("user/renew_session_token")
+        with self._lock:
+            self._session["session_token"] = response["session_token"]
+            self._store_session()
+        return response
 
     def user_get_info(self):
         """user/get_info
@@ -3,22 +3,34 @@
 # pylint: disable=missing-function-docstring
 
 from typing import Optional
-from dataclasses import dataclass, field
+from dataclasses import field
 
-import requests
-from extractor.common.tools import iterable_to_stream
+from extractor.common.stream import ResponseStream, check_range, range_header
 from extractor.data import File
+from extractor.data.model import model
 from extractor.errors import DownloadError
-from extractor.services.pcloud.client import Client
+from extractor.services.mediafire.client import Client
 
 
-@dataclass
+@model
 class MediafireFile(File):
 
     link: Optional[str] = field(compare=False, hash=False, repr=False)
     session: Client = field(compare=False, hash=False, repr=False)
+    # SHA-256 of the content
+    hash: Optional[str] = field(default=None, compare=False, repr=False)
 
-    def get_stream(self):
+    def get_checksums(self, fetch: bool = False) -> dict:
+        if self.hash is None and fetch:
+            self.hash = self.session.file_get_info(quick_key=self.id)["file_info"].get(
+                "hash"
+            )
+
+        return {"sha256": self.hash} if self.hash else {}
+
+    supports_ranges = True
+
+    def get_stream(self, offset: int = 0, length: Optional[int] = None):
         if not self.link:
             try:
                 result = self.session.file_get_links(
@@ -30,16 +42,9 @@ class MediafireFile(File):
             except Exception as ex:
                 raise DownloadError("No Downloadlink given") from ex
 
-        response = requests.get(self.link, stream=True)
-        buffer_size = 4096
-        stream = iterable_to_stream(
-            response.iter_content(chunk_size=buffer_size), buffer_size=buffer_size
+        response = self.session.http.get(
+            self.link, headers=range_header(offset, length), stream=True
         )
-
-        return stream
-
-    def __enter__(self):
-        return self.get_stream()
-
-    def __exit__(self, exception_type, exception_value, exception_traceback):
-        ...
+        response.raise_for_status()
+        check_range(response, offset, length)
+        return ResponseStream(response)
@@ -1,10 +1,11 @@
-from dataclasses import dataclass, field
+from dataclasses import field
 from extractor.data import Folder
+from extractor.data.model import model
 from extractor.services.mediafire.file import MediafireFile
 from extractor.services.mediafire.client import Client
 
 
-@dataclass
+@model
 class MediafireFolder(Folder):
     session: Client = field(compare=False, hash=False, repr=False)
 
@@ -59,20 +60,10 @@ class MediafireFolder(Folder):
             # Iterate through all folders
             for directory_info in content["folders"]:
 
-                if self.path == "":
-                    path = directory_info["name"]
-                else:
-                    path = "/".join(
-                        [
-                            self.path,
-                            directory_info["name"],
-                        ]
-                    )
-
                 data = {
                     "id": directory_info["folderkey"],
                     "name": directory_info["name"],
-                    "path": path,
+                    "path": self.path_node.child(directory_info["name"]),
                     "owner": True,
                     "shared": False,
                     "created_at": None,
@@ -104,17 +95,17 @@ class MediafireFolder(Folder):
                 more_chunks = False
 
             for file_info in content["files"]:
-                file_info["path"] = "/".join([self.path, file_info["filename"]])
                 data = {
                     "session": self.session,
                     "id": file_info["quickkey"],
                     "name": file_info["filename"],
-                    "path": file_info["path"],
-                    "size": file_info["size"],
+                    "path": self.path_node.child(file_info["filename"]),
+                    "size": int(file_info["size"]),
                     "owner": True,
                     "shared": False,
                     "created_at": file_info["created_utc"],
                     "modified_at": None,
                     "link": None,
+                    "hash": file_info.get("hash"),
                 }
                 yield MediafireFile(**data)
@@ -3,10 +3,10 @@
 """
 import logging
 from functools import lru_cache
-from typing import List
+from typing import Optional
 from extractor.common import CloudService
 from extractor.data import User
-from extractor.data.folder import Folder
+from extractor.data.path import ROOT
 from extractor.errors import NotLoggedInError
 from .file import MediafireFile as File
 from .folder import MediafireFolder
@@ -21,11 +21,19 @@ class MediafireService(CloudService):
     Serviceclass for Mediafire
     """
 
+    # the API calls are signed in sequence, see Client._request
+    list_concurrency = 1
+    domains = ("mediafire.com",)
+
     def __init__(self):
         self.client = None
 
     def login(self, username: str, password: str) -> User:
-        self.client = Client(email=username, password=password)
+        self.client = Client(
+            email=username,
+            password=password,
+            cache=self.cached_tokens(username, password),
+        )
         return self.user
 
     @property
@@ -45,7 +53,7 @@ class MediafireService(CloudService):
             raise NotLoggedInError
 
         try:
-            data = self.client.user_get_info()
+            data = self.client.account_info()
         except Exception:
             raise
         else:
@@ -72,7 +80,7 @@ class MediafireService(CloudService):
         folder = MediafireFolder(
             session=self.client,
             id=data["folderkey"],
-            path="",
+            path=ROOT,
             name=data["name"],
             owner=True,
             shared=False,
@@ -82,37 +90,15 @@ class MediafireService(CloudService):
 
         return folder
 
-    @property
-    def folders(self) -> List[Folder]:
+    def list_children(self, folder: Optional[MediafireFolder]):
         if not self.is_logged_in:
             raise NotLoggedInError
 
-        def recursive(folder):
-            for subfolder in folder.folders:
-                yield subfolder
-                yield from recursive(subfolder)
-
-        root = self.get_root()
-        yield from recursive(root)
-
-    @property
-    def files(self) -> List[File]:
-        """
-        Return Files
-        """
-
-        def recursive(directory):
-            for file in directory.files:
-                yield file
-
-            for subdir in directory.folders:
-                yield from recursive(subdir)
-
-        if not self.is_logged_in:
-            raise NotLoggedInError
+        if folder is None:
+            folder = self.get_root()
 
-        root = self.get_root()
-        yield from recursive(root)
+        yield from folder.files
+        yield from folder.folders
 
     def file_get_stream(self, file: File):
         return file.get_stream()
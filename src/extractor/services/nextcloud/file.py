@@ -1,26 +1,71 @@
-from dataclasses import dataclass, field
-from io import BufferedReader, BytesIO
+from dataclasses import field
+from typing import Optional
+from xml.etree import ElementTree
 
-from extractor.common.tools import iterable_to_stream
+import requests
+
+from extractor.common.stream import ResponseStream, check_range, range_header
+from extractor.common.transport import DEFAULT_TRANSPORT
 from extractor.data import File
+from extractor.data.model import model
 
 from nextcloud.api_wrappers.webdav import File as WebdavFile
 
 
-@dataclass
+CHECKSUMS_PROPFIND = (
+    '<?xml version="1.0"?>'
+    '<d:propfind xmlns:d="DAV:" xmlns:oc="http://owncloud.org/ns">'
+    "<d:prop><oc:checksums/></d:prop>"
+    "</d:propfind>"
+)
+
+
+@model
 class NextcloudFile(File):
     file: WebdavFile = field(compare=False, hash=False, repr=False)
+    # oc:checksums, the wrapper doesn't parse them
+    checksums: Optional[dict] = field(default=None, compare=False, repr=False)
 
-    def get_stream(self) -> BufferedReader:
-        content = self.file.fetch_file_content()
-
-        buffer_size = 4096
-        return iterable_to_stream(
-            BytesIO(content), buffer_size=buffer_size
+    def _request(self, method: str, **kwargs) -> requests.Response:
+        # The wrapper's Session.request() would keep the extra kwargs, so
+        # the WebDAV requests for this file are made directly
+        wrapper = self.file._wrapper
+        session = wrapper.client.session
+        url = wrapper.requester.get_full_url(
+            wrapper.client.user + self.file.get_relative_path()
         )
 
-    def __enter__(self):
-        return self.get_stream()
+        if session.session is not None:
+            response = session.session.request(method, url, **kwargs)
+        else:
+            response = DEFAULT_TRANSPORT.request(method, url, auth=session.auth, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def get_checksums(self, fetch: bool = False) -> dict:
+        if self.checksums is None and fetch:
+            response = self._request(
+                "PROPFIND", headers={"Depth": "0"}, data=CHECKSUMS_PROPFIND
+            )
+            self.checksums = {}
+            # e.g. <oc:checksum>SHA1:... MD5:... ADLER32:...</oc:checksum>
+            for checksum in ElementTree.fromstring(response.content).iter(
+                "{http://owncloud.org/ns}checksum"
+            ):
+                for value in (checksum.text or "").split():
+                    algorithm, _, value = value.partition(":")
+                    if value:
+                        self.checksums[algorithm.lower()] = value.lower()
+
+        return self.checksums or {}
+
+    supports_ranges = True
+
+    def get_stream(self, offset: int = 0, length: Optional[int] = None) -> ResponseStream:
+        # The wrapper only fetches whole contents
+        response = self._request(
+            "GET", headers=range_header(offset, length), stream=True
+        )
+        check_range(response, offset, length)
 
-    def __exit__(self, exception_type, exception_value, exception_traceback):
-        ...
+        return ResponseStream(response)
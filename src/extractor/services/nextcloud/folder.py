@@ -0,0 +1,11 @@
+from dataclasses import field
+
+from extractor.data import Folder
+from extractor.data.model import model
+
+from nextcloud.api_wrappers.webdav import File as WebdavFile
+
+
+@model
+class NextcloudFolder(Folder):
+    file: WebdavFile = field(compare=False, hash=False, repr=False)
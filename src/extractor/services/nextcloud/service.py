@@ -1,10 +1,13 @@
-from typing import Iterable
-from xml.sax.handler import all_properties
+from typing import Iterable, Optional, Union
+from urllib.parse import urlsplit
 
 from extractor.common import CloudService
+from extractor.common.transport import DEFAULT_TRANSPORT
 from extractor.data import File, Folder, User
+from extractor.data.path import ROOT
 from extractor.errors import NotLoggedInError
 from extractor.services.nextcloud.file import NextcloudFile
+from extractor.services.nextcloud.folder import NextcloudFolder
 
 from nextcloud import NextCloud
 
@@ -13,6 +16,15 @@ class NextcloudService(CloudService):
     def __init__(self, url=None):
         self.url = url
         self.client = None
+        self._user_id = None
+
+    @property
+    def domains(self):
+        # the server of the instance
+        if not self.url:
+            return ()
+        host = urlsplit(self.url if "//" in self.url else "//" + self.url).hostname
+        return (host,) if host else ()
 
     def login(self, username: str, password: str) -> User:
         try:
@@ -21,6 +33,13 @@ class NextcloudService(CloudService):
         except Exception as ex:
             raise NotLoggedInError from ex
         else:
+            # The wrapper makes bare requests without a session
+            session = client.session
+            if session.session is None:
+                session.session = DEFAULT_TRANSPORT.session()
+                session.session.auth = session.auth
+            else:
+                DEFAULT_TRANSPORT.mount(session.session)
             self.client = client
 
         return self.user
@@ -50,37 +69,24 @@ class NextcloudService(CloudService):
             phone=user_data.get("phone"),
         )
 
-    @property
-    def folders(self) -> Iterable[Folder]:
-        if not self.is_logged_in:
-            raise NotLoggedInError
-
-        user_id = self.user.id  # Cache user_id
-        root = self.client.get_folder(all_properties=True)
-
-        def _list_rec(item):
-            if item.isdir() and not item.basename() == "":
-                yield Folder(id=item.file_id, name=item.basename(), path=item.get_relative_path()[1:-1], owner=item.owner_id == user_id, shared=None, created_at=None, modified_at=item.last_modified_datetime)
-
-            for i in [i for i in item.list(all_properties=True) if i.isdir()]:
-                yield from _list_rec(i)
-
-        yield from _list_rec(root)
-
-    @property
-    def files(self) -> Iterable[File]:
+    def list_children(self, folder: Optional[NextcloudFolder]) -> Iterable[Union[Folder, File]]:
         if not self.is_logged_in:
             raise NotLoggedInError
 
-        user_id = self.user.id  # Cache user_id
-        root = self.client.get_folder(all_properties=True)
+        if self._user_id is None:
+            self._user_id = self.user.id  # Cache user_id
 
-        def _list_rec(item):
-            if item.isfile():
-                yield NextcloudFile(id=item.file_id, name=item.basename(), path=item.get_relative_path()[1:], size=item.size, owner=item.owner_id == user_id, shared=None, created_at=None, modified_at=item.last_modified_datetime, file=item)
-
-            if item.isdir():
-                for i in item.list(all_properties=True):
-                    yield from _list_rec(i)
-
-        yield from _list_rec(root)
+        if folder is None:
+            item = self.client.get_folder(all_properties=True)
+        else:
+            item = folder.file
+
+        parent = ROOT if folder is None else folder.path_node
+        for i in item.list(all_properties=True):
+            name = i.basename()
+            if i.isdir():
+                yield NextcloudFolder(id=i.file_id, name=name, path=parent.child(name), owner=i.owner_id == self._user_id, shared=None, created_at=None, modified_at=i.last_modified, file=i)
+            elif i.isfile():
+                # the wrapper keeps the properties as strings
+                size = int(i.size) if i.size not in (None, "") else None
+                yield NextcloudFile(id=i.file_id, name=name, path=parent.child(name), size=size, owner=i.owner_id == self._user_id, shared=None, created_at=None, modified_at=i.last_modified, file=i)
@@ -1,11 +1,19 @@
 import logging
-import requests
+import threading
+from extractor.common.transport import DEFAULT_TRANSPORT, SEND_ONCE
 from hashlib import sha1
 from extractor.common.tools import RequiredParameterCheck
 from extractor.errors import LoginError
 
 logger = logging.getLogger(__name__)
 
+# "Too many login tries from this IP address", "Internal error. Try again later."
+THROTTLING_RESULTS = (4000, 5000)
+# "Log in required.", "Log in failed.", e.g. with an expired auth token
+AUTH_RESULTS = (1000, 2000)
+# Idle pinned sessions kept for the next downloads
+PINNED_SESSIONS = 8
+
 
 class Client:
 
@@ -13,34 +21,122 @@ class Client:
     endpoint_us = "https://api.pcloud.com/"
     endpoint_eu = "https://eapi.pcloud.com/"
 
-    def __init__(self, username, password):
+    def __init__(self, username, password, cache=None):
         self.username = username.lower()
         self.password = password
         self.endpoint = self.endpoint_us
-        self.session = requests.Session()
-        self.auth_token = self.get_auth_token()
-
-    def _do_request(self, method, authenticate=True, json=True, stream=False, **kw):
+        self.session = DEFAULT_TRANSPORT.session()
+        # userinfo of the login
+        self.account = None
+        self._cache = cache
+        self._login_lock = threading.Lock()
+        self._pinned = []
+        self._pinned_lock = threading.Lock()
+
+        tokens = cache.load() if cache is not None else None
+        if tokens is not None:
+            # checked by the first request, the region is known
+            self.endpoint = tokens["endpoint"]
+            self.auth_token = tokens["auth"]
+            self.account = tokens.get("account")
+            self._cached = True
+        else:
+            self.auth_token = self.login()
+
+    def login(self):
+        self._cached = False
+        auth_token = self.get_auth_token()
+        if self._cache is not None:
+            self._cache.store(
+                {"endpoint": self.endpoint, "auth": auth_token, "account": self.account}
+            )
+        return auth_token
+
+    def _renew(self, rejected):
+        """Log in again if the rejected auth token came from the cache"""
+        with self._login_lock:
+            if self.auth_token != rejected:
+                return True
+            if not self._cached:
+                return False
+
+            logger.debug("Cached auth token rejected, logging in")
+            self._cache.discard()
+            # the login tries the cached region first
+            self.auth_token = self.login()
+            return True
+
+    def _do_request(
+        self,
+        method,
+        authenticate=True,
+        json=True,
+        stream=False,
+        session=None,
+        once=False,
+        **kw,
+    ):
+        """
+        `session` sends the request instead of the shared one, see
+        `pinned_session`. The API is all GETs: calls with side effects pass
+        `once`, so they are neither retried nor hedged.
+        """
         if authenticate:
             params = {"auth": self.auth_token}
         else:
             params = {}
         params.update(kw)
 
-        resp = self.session.get(self.endpoint + method, params=params, stream=stream)
+        url = self.endpoint + method
+        headers = {SEND_ONCE: "1"} if once else None
+        resp = (session or self.session).get(
+            url, params=params, stream=stream, headers=headers
+        )
         if stream:
             return resp
         elif json:
-            return resp.json()
+            data = resp.json()
+            # pCloud answers errors with 200 and a result code
+            if data.get("result") in THROTTLING_RESULTS:
+                DEFAULT_TRANSPORT.limiter(url).throttled()
+            elif (
+                authenticate
+                and data.get("result") in AUTH_RESULTS
+                and self._renew(params["auth"])
+            ):
+                return self._do_request(
+                    method, authenticate, json, stream, session, once, **kw
+                )
+            return data
         else:
             return resp.content
 
+    def pinned_session(self):
+        """
+        Session of its own connection: file descriptors are only valid on
+        the connection that opened them. Hand it back with
+        `release_pinned_session` after use, an idle one is reused.
+        """
+        with self._pinned_lock:
+            if self._pinned:
+                return self._pinned.pop()
+        return DEFAULT_TRANSPORT.pinned_session(self.session.headers)
+
+    def release_pinned_session(self, session, reuse=True):
+        """Keep the session for the next download, close it if it holds descriptors"""
+        if reuse:
+            with self._pinned_lock:
+                if len(self._pinned) < PINNED_SESSIONS:
+                    self._pinned.append(session)
+                    return
+        session.close()
+
     # Authentication
     def getdigest(self):
         resp = self._do_request("getdigest", authenticate=False)
         return bytes(resp["digest"], "utf-8")
 
-    def get_auth_token(self):
+    def get_auth_token(self, fallback=True):
         digest = self.getdigest()
         passworddigest = sha1(
             self.password.encode("utf-8")
@@ -54,16 +150,25 @@ class Client:
             "digest": digest.decode("utf-8"),
             "passworddigest": passworddigest.hexdigest(),
         }
-        resp = self._do_request("userinfo", authenticate=False, **params)
+        # the digest is valid for one login
+        resp = self._do_request("userinfo", authenticate=False, once=True, **params)
         if "auth" not in resp:
-            # Try change Endpoint from US to EU
-            if self.endpoint == self.endpoint_us:
+            if not fallback:
+                raise LoginError(resp["error"])
+
+            # Try the Endpoint of the other region, US or EU
+            endpoint = self.endpoint
+            if endpoint == self.endpoint_us:
                 self.endpoint = self.endpoint_eu
-                return self.get_auth_token()
             else:
                 self.endpoint = self.endpoint_us
-                raise LoginError(resp["error"])
+            try:
+                return self.get_auth_token(fallback=False)
+            except LoginError:
+                self.endpoint = self.endpoint_us
+                raise
 
+        self.account = {key: value for key, value in resp.items() if key != "auth"}
         return resp["auth"]
 
     # User
@@ -81,7 +186,7 @@ class Client:
 
     # Auth API methods
     def logout(self, **kwargs):
-        return self._do_request("logout", **kwargs)
+        return self._do_request("logout", once=True, **kwargs)
 
     # File API methods
     @RequiredParameterCheck(("path", "fileid"))
@@ -90,7 +195,7 @@ class Client:
 
     @RequiredParameterCheck(("flags",))
     def file_open(self, **kwargs):
-        return self._do_request("file_open", **kwargs)
+        return self._do_request("file_open", once=True, **kwargs)
 
     @RequiredParameterCheck(("fd",))
     def file_read(self, **kwargs):
@@ -110,7 +215,7 @@ class Client:
 
     @RequiredParameterCheck(("fd",))
     def file_close(self, **kwargs):
-        return self._do_request("file_close", **kwargs)
+        return self._do_request("file_close", once=True, **kwargs)
 
     @RequiredParameterCheck(("fd",))
     def file_lock(self, **kwargs):
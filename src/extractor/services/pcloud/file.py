@@ -1,40 +1,106 @@
 """pCloud File Class"""
 
-from dataclasses import dataclass, field
+import logging
+from dataclasses import field
+from typing import Optional
 from extractor.data import File
+from extractor.data.model import model
 from extractor.errors import DownloadError
-from extractor.common.tools import iterable_to_stream
+from extractor.common.stream import ResponseStream
 from extractor.services.pcloud.client import Client
 
+logger = logging.getLogger(__name__)
 
-@dataclass
+
+@model
 class PCloudFile(File):
     """pCloud File Class"""
 
     session: Client = field(compare=False, hash=False, repr=False)
+    # pCloud's 64 bit content hash
+    hash: Optional[int] = field(default=None, compare=False, repr=False)
+
+    def get_checksums(self, fetch: bool = False) -> dict:
+        checksums = {}
+        if self.hash is not None:
+            checksums["pcloud"] = str(self.hash)
+
+        if fetch:
+            resp = self.session.checksumfile(fileid=self.id)
+            if resp.get("result") == 0:
+                for algorithm in ("md5", "sha1", "sha256"):
+                    if algorithm in resp:
+                        checksums[algorithm] = resp[algorithm]
+
+        return checksums
+
+    supports_ranges = True
+
+    def get_stream(self, offset: int = 0, length: Optional[int] = None):
+        # the descriptor lives on the connection that opened it
+        session = self.session.pinned_session()
+        try:
+            resp = self.session.file_open(fileid=self.id, flags=0, session=session)
+            if resp.get("result") != 0:
+                raise DownloadError(
+                    f"pCloud error occured ({resp['result']}) - {resp['error']}", self
+                )
+
+            file_descriptor = resp["fd"]
+            if length is None:
+                length = self.size - offset
+            if offset or length != self.size:
+                response = self.session.file_pread(
+                    fd=file_descriptor,
+                    count=length,
+                    offset=offset,
+                    stream=True,
+                    session=session,
+                )
+            else:
+                response = self.session.file_read(
+                    fd=file_descriptor, count=self.size, stream=True, session=session
+                )
+
+            # errors come as JSON instead of the content
+            if response.headers.get("Content-Type", "").startswith("application/json"):
+                resp = response.json()
+                raise DownloadError(
+                    f"pCloud error occured ({resp.get('result')}) - {resp.get('error')}",
+                    self,
+                )
+        except BaseException:
+            self.session.release_pinned_session(session, reuse=False)
+            raise
 
-    def get_stream(self):
-        # open remote filehandle
-        resp = self.session.file_open(fileid=self.id, flags=0)
-        if resp.get("result") != 0:
-            raise DownloadError(
-                f"pCloud error occured ({resp['result']}) - {resp['error']}", self
-            )
+        return DescriptorStream(response, self.session, session, file_descriptor)
 
-        file_descriptor = resp["fd"]
-        response = self.session.file_read(
-            fd=file_descriptor, count=self.size, stream=True
-        )
 
-        buffer_size = 4096
-        stream = iterable_to_stream(
-            response.iter_content(chunk_size=buffer_size), buffer_size=buffer_size
-        )
+class DescriptorStream(ResponseStream):
+    """Content read through a file descriptor, closed with the stream"""
 
-        return stream
+    def __init__(self, response, client: Client, session, file_descriptor: int):
+        super().__init__(response)
+        self._client = client
+        self._session = session
+        self._file_descriptor = file_descriptor
 
-    def __enter__(self):
-        return self.get_stream()
+    def close(self):
+        if self.closed:
+            return
 
-    def __exit__(self, exception_type, exception_value, exception_traceback):
-        ...
+        # an unfinished body closes the connection and the descriptor with it
+        finished = self._fp is not None and self._fp.isclosed()
+        super().close()
+        closed = False
+        try:
+            if finished:
+                resp = self._client.file_close(
+                    fd=self._file_descriptor, session=self._session
+                )
+                closed = resp.get("result") == 0
+        except Exception as ex:
+            logger.debug("Closing pCloud file descriptor failed: %s", ex)
+        finally:
+            # the connection is reused once it holds no descriptor
+            self._client.release_pinned_session(self._session, reuse=closed)
@@ -0,0 +1,12 @@
+"""pCloud Folder Class"""
+
+from dataclasses import field
+from extractor.data import Folder
+from extractor.data.model import model
+
+
+@model
+class PCloudFolder(Folder):
+    """pCloud Folder Class, with the contents of the recursive listing"""
+
+    contents: list = field(default_factory=list, compare=False, repr=False)
@@ -2,22 +2,30 @@ import logging
 from functools import lru_cache
 
 from extractor.common import CloudService
-from extractor.data import Folder, User
+from extractor.data import User
+from extractor.data.path import ROOT
 from extractor.errors import NotLoggedInError
 
 from .client import Client
 from .file import PCloudFile
+from .folder import PCloudFolder
 
 logger = logging.getLogger(__name__)
 
 
 class PCloudService(CloudService):
+    # The whole tree is fetched with a single recursive listing
+    list_concurrency = 1
+    domains = ("pcloud.com",)
+
     def __init__(self, **kwargs) -> None:
         super().__init__()
         self.client = None
 
     def login(self, username: str, password: str) -> User:
-        self.client = Client(username, password)
+        self.client = Client(
+            username, password, cache=self.cached_tokens(username, password)
+        )
         return self.user
 
     @property
@@ -31,7 +39,8 @@ class PCloudService(CloudService):
             raise NotLoggedInError
 
         try:
-            data = self.client.userinfo()
+            # the login answers with the userinfo
+            data = self.client.account or self.client.userinfo()
         except Exception:
             # TODO
             raise
@@ -41,19 +50,11 @@ class PCloudService(CloudService):
                 email=data["email"],
             )
 
-    @property
-    def files(self):
-        yield from [
-            node for node in self._iter_tree(self._tree) if isinstance(node, PCloudFile)
-        ]
+    def list_children(self, folder=None):
+        if folder is None:
+            folder = self._tree
 
-    @property
-    def folders(self):
-        yield from [
-            node
-            for node in self._iter_tree(self._tree)
-            if isinstance(node, Folder) and not node.name == ""
-        ]
+        return folder.contents
 
     @property
     @lru_cache(maxsize=1)
@@ -67,17 +68,23 @@ class PCloudService(CloudService):
             ]
         )
 
-    def _iter_tree(self, node):
-        yield node
-
-        if isinstance(node, Folder):
-            for item in node.contents:
-                yield from self._iter_tree(item)
-
     def _parse_tree(self, data):
         """ """
 
         root = self._parse_folder(data)
+
+        # iterative, the tree may be deeper than the recursion limit
+        stack = [(root, data)]
+        while stack:
+            folder, folder_data = stack.pop()
+            for item in folder_data["contents"]:
+                if item["isfolder"] is True:
+                    subfolder = self._parse_folder(item, folder)
+                    folder.contents.append(subfolder)
+                    stack.append((subfolder, item))
+                else:
+                    folder.contents.append(self._parse_file(item, folder))
+
         return root
 
     def _parse_file(self, data, parent):
@@ -85,44 +92,35 @@ class PCloudService(CloudService):
         return PCloudFile(
             id=data["fileid"],
             name=data["name"],
-            path=parent.path + "/" + data["name"],
+            path=parent.path_node.child(data["name"]),
             owner=data["ismine"],
             shared=data["isshared"],
             created_at=data["created"],
             modified_at=data["modified"],
             size=data["size"],
             session=self.client,
+            hash=data.get("hash"),
         )
 
     def _parse_folder(self, data, parent=None):
         """ """
 
-        if data.get("path") is None:
-            if parent is not None and not parent.path == "":
-                data.setdefault("path", parent.path + "/" + data["name"])
-            else:
-                data["path"] = data["name"]
-
         if data["name"] == "/":
             data["name"] = ""
-        if data["path"] == "/":
-            data["path"] = ""
 
-        folder = Folder(
+        if parent is not None:
+            path = parent.path_node.child(data["name"])
+        elif data.get("path") in (None, "/"):
+            path = ROOT
+        else:
+            path = data["path"].strip("/")
+
+        return PCloudFolder(
             id=data["folderid"],
             name=data["name"],
-            path=data["path"],
+            path=path,
             owner=data["ismine"],
             shared=data["isshared"],
             created_at=data["created"],
             modified_at=data["modified"],
         )
-        folder.contents = []
-
-        for item in data["contents"]:
-            if item["isfolder"] is True:
-                folder.contents.append(self._parse_folder(item, folder))
-            else:
-                folder.contents.append(self._parse_file(item, folder))
-
-        return folder
@@ -1,18 +1,23 @@
+import threading
 from typing import List
-from datetime import datetime
+from datetime import datetime, timedelta
 from functools import lru_cache
 
 import pytz
-import requests
 from requests.exceptions import RequestException
 from xmltodict import parse as xml_to_dict
 from xmltodict import unparse as dict_to_xml
+from extractor.common.stream import range_header
+from extractor.common.tokencache import EXPIRY_MARGIN, renew_on_unauthorized
+from extractor.common.transport import DEFAULT_TRANSPORT
 
 
 class Client:
     """SugarSync Client."""
 
-    def __init__(self, app_id, app_access_key, app_private_key, username, password):
+    def __init__(
+        self, app_id, app_access_key, app_private_key, username, password, cache=None
+    ):
         # App
         self._app_id = app_id
         self._app_access_key = app_access_key
@@ -23,13 +28,26 @@ class Client:
         self._user_ressource_url = None
 
         # Session
-        self._http = None
         self._refresh_token = None
         self._access_token = None
         self._access_token_expires_at = None
+        self._credentials = (username, password)
+        self._cache = cache
+        self._cached = False
+        self._login_lock = threading.Lock()
+
+        # Session Object for further HTTP-Handling, authorized by the Login
+        self._http = DEFAULT_TRANSPORT.session(
+            headers={"Content-Type": "application/xml; charset=UTF-8"}
+        )
+        renew_on_unauthorized(self._http, self._renew)
 
         # Login
-        self._login(username, password)
+        tokens = cache.load() if cache is not None else None
+        if tokens is not None:
+            self._restore(tokens)
+        else:
+            self._login(username, password)
 
     def _login(self, username, password):
         """
@@ -50,24 +68,77 @@ class Client:
             password,
         )
         self._refresh_token = refresh_token
+        self._cached = False
 
         # Fetch Access Token
+        self._refresh()
+
+    def _refresh(self):
+        """Fetch an Access Token with the Refresh Token"""
         access_token, expires_at, user_ressource_url = self.get_access_token(
-            self._app_access_key, self._app_private_key, refresh_token
+            self._app_access_key, self._app_private_key, self._refresh_token
         )
+        self._authorize(access_token, expires_at, user_ressource_url)
+        self._store()
+
+    def _authorize(self, access_token, expires_at, user_ressource_url):
         self._access_token = access_token
         self._access_token_expires_at = expires_at
         self._user_ressource_url = user_ressource_url
+        self._http.headers["Authorization"] = access_token
 
-        # Create Session Object for further HTTP-Handling
-        session = requests.Session()
-        session.headers.update(
-            {
-                "Content-Type": "application/xml; charset=UTF-8",
-                "Authorization": access_token,
-            }
+    @property
+    def _access_token_expired(self) -> bool:
+        return self._access_token_expires_at - timedelta(
+            seconds=EXPIRY_MARGIN
+        ) <= datetime.now(pytz.utc)
+
+    def _restore(self, tokens):
+        """Continue the Session of the Token Cache, checked by the first request"""
+        self._refresh_token = tokens["refresh_token"]
+        self._user = tokens.get("user")
+        self._cached = True
+        self._authorize(
+            tokens["access_token"],
+            datetime.fromtimestamp(tokens["expires_at"], pytz.utc),
+            tokens["user_ressource_url"],
         )
-        self._http = session
+        if self._access_token_expired:
+            self._refresh()
+
+    def _store(self):
+        if self._cache is not None:
+            self._cache.store(
+                {
+                    "refresh_token": self._refresh_token,
+                    "access_token": self._access_token,
+                    "expires_at": self._access_token_expires_at.timestamp(),
+                    "user_ressource_url": self._user_ressource_url,
+                    "user": self._user,
+                }
+            )
+
+    def _renew(self, rejected) -> bool:
+        """
+        Replace a rejected Access Token which expired or came from the
+        Token Cache, by Login if the Refresh Token is rejected as well
+        """
+        with self._login_lock:
+            if rejected != self._access_token:
+                return True
+            if not self._cached and not self._access_token_expired:
+                return False
+
+            cached, self._cached = self._cached, False
+            try:
+                self._refresh()
+            except RequestException:
+                if not cached:
+                    raise
+                if self._cache is not None:
+                    self._cache.discard()
+                self._login(*self._credentials)
+            return True
 
     @staticmethod
     def get_refresh_token(app_id, app_access_key, app_private_key, username, password):
@@ -76,7 +147,7 @@ class Client:
 
         https://www.sugarsync.com/dev/api/method/create-refresh-token.html
         """
-        response = requests.post(
+        response = DEFAULT_TRANSPORT.post(
             "https://api.sugarsync.com/app-authorization",
             headers={"Content-Type": "application/xml; charset=UTF-8"},
             data=dict_to_xml(
@@ -113,7 +184,7 @@ class Client:
             str: Ressource URL for the logged in User
         """
         try:
-            response = requests.post(
+            response = DEFAULT_TRANSPORT.post(
                 "https://api.sugarsync.com/authorization",
                 headers={"Content-Type": "application/xml; charset=UTF-8"},
                 data=dict_to_xml(
@@ -143,6 +214,7 @@ class Client:
     def user(self):
         if self._user is None:
             self._user = self.get_user_by_url(self._user_ressource_url)
+            self._store()
 
         return self._user
 
@@ -262,6 +334,20 @@ class Client:
             (Folder|File): [description]
         """
 
+        for _, data in self.get_folder_entries_by_url(url):
+            yield data
+
+    def get_folder_entries_by_url(self, url):
+        """
+        Fetch the Folder Contents together with their type
+
+        Args:
+            url (str): Ressource URL of the Folder Contents
+
+        Yields:
+            (str, dict): ("file", File) or ("folder", Folder)
+        """
+
         start = 0
         max_entries = 250
         finished = False
@@ -282,7 +368,7 @@ class Client:
                 if not isinstance(files, list):
                     files = [files]
                 for file in files:
-                    yield self.get_file_by_url(file["ref"])
+                    yield "file", self.get_file_by_url(file["ref"])
 
                 # Handle Folders
                 folders = response_data["collectionContents"].get("collection", [])
@@ -290,7 +376,7 @@ class Client:
                     folders = [folders]
 
                 for folder in folders:
-                    yield self.get_folder_by_url(folder["ref"])
+                    yield "folder", self.get_folder_by_url(folder["ref"])
 
                 # Check if more Folders available
                 if response_data["collectionContents"]["@hasMore"] == "true":
@@ -334,8 +420,10 @@ class Client:
             f"https://api.sugarsync.com/file/{id_}/data"
         )
 
-    def get_file_content_stream_by_url(self, url):
-        response = self._http.get(url, stream=True)
+    def get_file_content_stream_by_url(self, url, offset: int = 0, length: int = None):
+        response = self._http.get(
+            url, headers=range_header(offset, length), stream=True
+        )
         response.raise_for_status()
 
         return response
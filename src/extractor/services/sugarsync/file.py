@@ -1,27 +1,22 @@
-from io import BufferedReader
-from dataclasses import dataclass, field
-from extractor.common.tools import iterable_to_stream
+from dataclasses import field
+from typing import Optional
+from extractor.common.stream import ResponseStream, check_range
 from extractor.data import File
+from extractor.data.model import model
 from extractor.services.sugarsync.client import Client
 
 
-@dataclass
+@model
 class SugarsyncFile(File):
     session: Client = field(compare=False, hash=False, repr=False)
 
-    def get_stream(self) -> BufferedReader:
-        url = f"https://api.sugarsync.com/file/{self.id.replace('/',':')}/data"
-        response = self.session.get_file_content_stream_by_url(url)
-        buffer_size = 4096
+    supports_ranges = True
 
-        stream = iterable_to_stream(
-            response.iter_content(chunk_size=buffer_size), buffer_size=buffer_size
+    def get_stream(self, offset: int = 0, length: Optional[int] = None) -> ResponseStream:
+        url = f"https://api.sugarsync.com/file/{self.id.replace('/',':')}/data"
+        response = self.session.get_file_content_stream_by_url(
+            url, offset=offset, length=length
         )
+        check_range(response, offset, length)
 
-        return stream
-
-    def __enter__(self):
-        return self.get_stream()
-
-    def __exit__(self, exception_type, exception_value, exception_traceback):
-        ...
+        return ResponseStream(response)
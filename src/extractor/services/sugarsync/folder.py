@@ -1,54 +1,65 @@
-from typing import Iterator
-from dataclasses import dataclass, field
-import iso8601
+from typing import Iterator, Union
+from dataclasses import field
 from extractor.data import Folder, File
+from extractor.data.model import model
 from extractor.services.sugarsync.client import Client
 from extractor.services.sugarsync.file import SugarsyncFile
 
 
-@dataclass
+@model
 class SugarsyncFolder(Folder):
     session: Client = field(compare=False, hash=False, repr=False)
 
+    def _parse_folder(self, data) -> Folder:
+        created_at = data.get("timeCreated")
+
+        return SugarsyncFolder(
+            id=data.get("dsid"),
+            name=data.get("displayName"),
+            path=self.path_node.child(data.get("displayName")),
+            owner=True,
+            shared=data.get("sharing", {}).get("@enabled") == "true",
+            created_at=created_at,
+            modified_at=None,
+            session=self.session,
+        )
+
+    def _parse_file(self, data) -> File:
+        created_at = data.get("timeCreated")
+
+        return SugarsyncFile(
+            id=data.get("dsid"),
+            name=data.get("displayName"),
+            path=self.path_node.child(data.get("displayName")),
+            size=int(data.get("size")),
+            owner=True,
+            shared=data.get("sharing", {}).get("@enabled") == "true",
+            created_at=created_at,
+            modified_at=None,
+            session=self.session,
+        )
+
+    @property
+    def contents(self) -> Iterator[Union[Folder, File]]:
+        """Folders and Files of this Folder from a single listing"""
+        url = f"https://api.sugarsync.com/folder/{self.id.replace('/',':')}/contents"
+
+        for kind, data in self.session.get_folder_entries_by_url(url):
+            if kind == "folder":
+                yield self._parse_folder(data)
+            else:
+                yield self._parse_file(data)
+
     @property
     def folders(self) -> Iterator[Folder]:
         url = f"https://api.sugarsync.com/folder/{self.id.replace('/',':')}/contents?type=folder"
 
         for data in self.session.get_folder_contents_by_url(url):
-
-            created_at = data.get("timeCreated")
-            iso8601.parse_date(created_at)
-
-            folder = SugarsyncFolder(
-                id=data.get("dsid"),
-                name=data.get("displayName"),
-                path=self.path + "/" + data.get("displayName"),
-                owner=True,
-                shared=data.get("sharing", {}).get("@enabled") == "true",
-                created_at=created_at,
-                modified_at=None,
-                session=self.session,
-            )
-
-            yield folder
+            yield self._parse_folder(data)
 
     @property
     def files(self) -> Iterator[File]:
         url = f"https://api.sugarsync.com/folder/{self.id.replace('/',':')}/contents?type=file"
 
         for data in self.session.get_folder_contents_by_url(url):
-
-            created_at = data.get("timeCreated")
-            iso8601.parse_date(created_at)
-
-            yield SugarsyncFile(
-                id=data.get("dsid"),
-                name=data.get("displayName"),
-                path=self.path + "/" + data.get("displayName"),
-                size=int(data.get("size")),
-                owner=True,
-                shared=data.get("sharing", {}).get("@enabled") == "true",
-                created_at=created_at,
-                modified_at=None,
-                session=self.session,
-            )
+            yield self._parse_file(data)
@@ -1,15 +1,19 @@
-from typing import List
-import iso8601
+from typing import Iterator, Optional, Union
 from extractor.common import CloudService
 from extractor.errors import NotLoggedInError
 from extractor.data import User
 from extractor.data import Folder
 from extractor.data import File
+from extractor.data.path import ROOT
 from extractor.services.sugarsync.folder import SugarsyncFolder
 from .client import Client
 
 
 class SugarsyncService(CloudService):
+    # the listings are plain GETs, the client renews its token under a lock
+    list_concurrency = 4
+    domains = ("sugarsync.com",)
+
     def __init__(self, app_id, app_access_key, app_private_key):
         self._app_id = app_id
         self._app_access_key = app_access_key
@@ -23,6 +27,7 @@ class SugarsyncService(CloudService):
             app_private_key=self._app_private_key,
             username=username,
             password=password,
+            cache=self.cached_tokens(username, password),
         )
 
         return self.user
@@ -47,25 +52,15 @@ class SugarsyncService(CloudService):
             # phone=None,
         )
 
-    @property
-    def folders(self) -> List[Folder]:
-        if not self.is_logged_in:
-            raise NotLoggedInError
-
-        def recursive(folder: SugarsyncFolder):
-            yield folder
-            for child_folder in folder.folders:
-                yield from recursive(child_folder)
-
+    def _syncfolders(self):
         for folder in self.client.get_syncfolders():
 
             created_at = folder.get("timeCreated")
-            iso8601.parse_date(created_at)
 
-            f = SugarsyncFolder(
+            yield SugarsyncFolder(
                 id=folder.get("dsid"),
                 name=folder.get("displayName"),
-                path=folder.get("displayName"),
+                path=ROOT.child(folder.get("displayName")),
                 owner=True,
                 shared=folder.get("sharing", {}).get("@enabled") == "true",
                 created_at=created_at,
@@ -73,9 +68,13 @@ class SugarsyncService(CloudService):
                 session=self.client,
             )
 
-            yield from recursive(f)
+    def list_children(
+        self, folder: Optional[SugarsyncFolder]
+    ) -> Iterator[Union[Folder, File]]:
+        if not self.is_logged_in:
+            raise NotLoggedInError
 
-    @property
-    def files(self) -> List[File]:
-        for folder in self.folders:
-            yield from folder.files
+        if folder is None:
+            return self._syncfolders()
+
+        return folder.contents
@@ -0,0 +1,72 @@
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import pytest
+
+# the tests run against the sources, installed or not
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+
+class FakeServer:
+    """
+    Local HTTP/1.1 server with keep-alive. Routes are functions of the
+    request handler, `send` answers with a body.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.connections = 0
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                server.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                path = urlsplit(self.path).path
+                server.requests.append((self.command, self.path, dict(self.headers)))
+                route = server.routes.get(path)
+                if route is None:
+                    server.send(self, 404, b"")
+                else:
+                    route(self)
+
+            do_POST = do_GET
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_port}{path}"
+
+    @staticmethod
+    def send(handler, status: int, body: bytes, headers=None):
+        handler.send_response(status)
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    server = FakeServer()
+    yield server
+    server.close()
@@ -0,0 +1,111 @@
+import io
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+from extractor.common import CloudService
+from extractor.data import File, Folder, User
+from extractor.data.path import ROOT
+
+
+@dataclass
+class FakeFile(File):
+    content: bytes = field(default=b"", repr=False)
+    fail: bool = field(default=False, repr=False)
+
+    supports_ranges = True
+
+    def get_stream(self, offset: int = 0, length: Optional[int] = None):
+        if self.fail:
+            raise OSError(f"{self.path} unavailable")
+        end = len(self.content) if length is None else offset + length
+        return io.BytesIO(self.content[offset:end])
+
+
+class FakeService(CloudService):
+    """
+    Tree of `width` folders per level down to `depth`, with `files` files
+    in every folder. Listings of the paths in `failing_listings` raise.
+    """
+
+    def __init__(self, depth=2, width=3, files=3, failing_listings=(), failing_files=()):
+        self.children = {}  # path -> children
+        self.failing_listings = set(failing_listings)
+        self.listings = []
+        self._lock = threading.Lock()
+        self._build(ROOT, depth, width, files, set(failing_files))
+
+    def _build(self, parent, depth, width, files, failing_files):
+        children = []
+        for i in range(files):
+            node = parent.child(f"f{i}.txt")
+            content = str(node).encode() * 10
+            children.append(
+                FakeFile(
+                    id=str(node),
+                    name=node.name,
+                    path=node,
+                    size=len(content),
+                    owner=True,
+                    shared=False,
+                    created_at=None,
+                    modified_at="2024-01-01T00:00:00Z",
+                    content=content,
+                    fail=str(node) in failing_files,
+                )
+            )
+        if depth:
+            for i in range(width):
+                node = parent.child(f"d{i}")
+                children.append(
+                    Folder(
+                        id=str(node),
+                        name=node.name,
+                        path=node,
+                        owner=True,
+                        shared=False,
+                        created_at=None,
+                        modified_at=None,
+                    )
+                )
+                self._build(node, depth - 1, width, files, failing_files)
+        self.children[str(parent)] = children
+
+    @property
+    def files(self):
+        return [
+            node
+            for children in self.children.values()
+            for node in children
+            if isinstance(node, File)
+        ]
+
+    def login(self, username, password):
+        return self.user
+
+    @property
+    def user(self):
+        return User(id=1)
+
+    def list_children(self, folder):
+        path = "" if folder is None else folder.path
+        with self._lock:
+            self.listings.append(path)
+        if path in self.failing_listings:
+            raise OSError(f"listing {path} failed")
+        return list(self.children[path])
+
+
+class Recorder:
+    """Plugin recording every event"""
+
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def on(self, event, *args, **kwargs):
+        with self._lock:
+            self.events.append((event, args))
+
+    def named(self, event):
+        return [args for name, args in self.events if name == event]
@@ -0,0 +1,48 @@
+import asyncio
+import threading
+import time
+
+from extractor import AsyncExtractor
+from extractor.common.asyncservice import ThreadedAsyncService
+
+from .fakes import FakeService, Recorder
+
+
+def test_acquires_every_file_and_shuts_down_its_executor():
+    service = FakeService(depth=2)
+    recorder = Recorder()
+    extractor = AsyncExtractor(service, [recorder], concurrency=4)
+
+    extractor.run("user", "pw")
+
+    assert len(recorder.named("file_found")) == len(service.files)
+    assert recorder.named("extractor_end")
+    assert extractor._executor._shutdown
+
+
+def walking() -> bool:
+    return any(
+        thread.name == "async-walk" or thread.name.startswith("walker-")
+        for thread in threading.enumerate()
+    )
+
+
+def test_walk_stops_when_its_consumer_does():
+    service = ThreadedAsyncService(FakeService(depth=3), maxsize=1)
+
+    async def consume_one():
+        walk = service.walk()
+        async for node in walk:
+            # the walk fills the queue and waits
+            await asyncio.sleep(0.2)
+            break
+        await walk.aclose()
+
+        # the loop goes on, the walk must end without it closing
+        deadline = time.monotonic() + 5
+        while walking() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        assert not walking()
+        return node
+
+    assert asyncio.run(consume_one()) is not None
@@ -0,0 +1,128 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from extractor import Extractor
+from extractor.common import EventBatch
+
+from .fakes import FakeService
+
+
+class BatchRecorder:
+    """Receives the found folders and files in batches, checking their order"""
+
+    def __init__(self):
+        self.folders = set()
+        self.files = []
+        self.errors = []
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def _enter(self):
+        with self._lock:
+            self._active += 1
+            if self._active > 1:
+                self.errors.append("batch handlers called concurrently")
+
+    def _leave(self):
+        time.sleep(0.001)
+        with self._lock:
+            self._active -= 1
+
+    def on_folders_found(self, folders):
+        self._enter()
+        self.folders.update(str(folder.path) for folder in folders)
+        self._leave()
+
+    def on_files_found(self, files):
+        self._enter()
+        for file in files:
+            parent = str(file.path).rpartition("/")[0]
+            if parent and parent not in self.folders:
+                self.errors.append(f"{file.path} before its folder")
+        self.files.extend(files)
+        self._leave()
+
+
+def test_batches_are_delivered_one_at_a_time_folders_first():
+    service = FakeService(depth=3, width=3, files=4)
+    service.list_concurrency = 3
+    recorder = BatchRecorder()
+
+    Extractor(service, [recorder], workers=4, batch_size=2).acquire("user", "pw")
+
+    assert recorder.errors == []
+    assert len(recorder.files) == len(service.files)
+
+
+def test_folder_and_file_added_between_two_takes_keep_their_order():
+    recorder = BatchRecorder()
+    extractor = Extractor(FakeService(), [recorder], workers=4, batch_size=3)
+
+    def emit(worker):
+        for i in range(300):
+            folder = f"w{worker}d{i}"
+            extractor.emit("folder_found", SimpleNamespace(path=folder))
+            extractor.emit("file_found", SimpleNamespace(path=f"{folder}/f"))
+
+    threads = [threading.Thread(target=emit, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    extractor.flush()
+
+    assert recorder.errors == []
+    assert len(recorder.files) == 4 * 300
+
+
+def test_single_worker_flushes_after_the_interval_on_its_next_event():
+    recorder = BatchRecorder()
+    extractor = Extractor(FakeService(), [recorder], batch_interval=0.05)
+
+    extractor.emit("folder_found", SimpleNamespace(path="d"))
+    time.sleep(0.1)
+    assert recorder.folders == set()
+
+    extractor.emit("file_download_success", None, None)
+    assert recorder.folders == {"d"}
+
+
+def test_flusher_delivers_after_the_interval_without_further_events():
+    delivered = []
+    flushed = threading.Event()
+
+    class Plugin:
+        def on_folders_found(self, folders):
+            delivered.append(threading.current_thread().name)
+            flushed.set()
+
+    extractor = Extractor(FakeService(), [Plugin()], workers=2, batch_interval=0.05)
+    extractor._start_flusher()
+    try:
+        extractor.emit("folder_found", SimpleNamespace(path="d"))
+        assert flushed.wait(2)
+    finally:
+        extractor._stop_flusher()
+
+    assert delivered == ["extractor-flusher"]
+
+
+def test_batch_is_due_after_its_interval():
+    batch = EventBatch([], size=100, interval=5)
+    assert batch.due_at is None
+
+    batch.add(1)
+    assert batch.due_at == pytest.approx(time.monotonic() + 5, abs=1)
+    batch.take()
+    assert batch.due_at is None
+
+
+def test_full_batch_is_due():
+    batch = EventBatch([], size=2, interval=None)
+
+    assert not batch.add(1)
+    assert batch.add(2)
+    assert batch.take() == [1, 2]
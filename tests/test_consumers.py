@@ -0,0 +1,38 @@
+import threading
+
+import pytest
+
+from extractor import AsyncExtractor, Extractor
+
+from .fakes import FakeService
+
+
+class Consumer:
+    """Reads the first byte, waits for the other consumers, then the rest"""
+
+    def __init__(self, barrier):
+        self.barrier = barrier
+        self.contents = {}
+
+    def on_file_content(self, file, source):
+        first = source.read(1)
+        self.barrier.wait()
+        self.contents[str(file.path)] = first + source.read()
+
+
+@pytest.mark.parametrize("extractor_class", [Extractor, AsyncExtractor])
+def test_consumers_read_the_content_side_by_side(extractor_class):
+    service = FakeService(depth=1, width=2, files=2)
+    barrier = threading.Barrier(2, timeout=5)
+    consumers = [Consumer(barrier), Consumer(barrier)]
+
+    # one file at a time, the barrier is passed by the consumers of one file
+    if extractor_class is AsyncExtractor:
+        AsyncExtractor(service, consumers, concurrency=1).run("user", "pw")
+    else:
+        Extractor(service, consumers).acquire("user", "pw")
+
+    expected = {str(file.path): file.content for file in service.files}
+    assert not barrier.broken
+    assert consumers[0].contents == expected
+    assert consumers[1].contents == expected
@@ -0,0 +1,55 @@
+import threading
+
+import pytest
+
+from extractor.common import IsolatedPlugin
+
+
+class Plugin:
+    def __init__(self):
+        self.found = []
+
+    def on_file_found(self, file):
+        self.found.append(file)
+
+
+@pytest.mark.parametrize("backpressure", [IsolatedPlugin.BLOCK, IsolatedPlugin.DROP])
+def test_events_after_close_are_dropped(backpressure):
+    plugin = Plugin()
+    isolated = IsolatedPlugin(plugin, maxsize=1, backpressure=backpressure)
+    isolated.init(None)
+    isolated.on_file_found("a")
+    isolated.close()
+
+    # the inbox isn't drained anymore, emitting must not wait for room
+    emitter = threading.Thread(target=lambda: [isolated.on_file_found(f) for f in "bc"])
+    emitter.start()
+    emitter.join(2)
+
+    assert not emitter.is_alive()
+    assert plugin.found == ["a"]
+    assert isolated.stats["dropped_events"] == {"on_file_found": 2}
+
+
+def test_max_depth_counts_the_events_of_every_thread():
+    release = threading.Event()
+
+    class Slow:
+        def on_file_found(self, file):
+            release.wait(5)
+
+    isolated = IsolatedPlugin(Slow(), maxsize=100)
+    isolated.init(None)
+    emitters = [
+        threading.Thread(target=lambda: [isolated.on_file_found(i) for i in range(10)])
+        for _ in range(4)
+    ]
+    for emitter in emitters:
+        emitter.start()
+    for emitter in emitters:
+        emitter.join()
+
+    # the consumer holds one event, the others wait in the inbox
+    assert isolated.stats["max_depth"] == isolated.stats["depth"] >= 39
+    release.set()
+    isolated.close()
@@ -0,0 +1,44 @@
+import sqlite3
+
+from extractor import Extractor
+from extractor.plugins import Downloader, Journal, Manifest
+
+from .fakes import FakeService
+
+
+def acquire(tmp_path, service, resume):
+    destination = tmp_path / "out"
+    plugins = [
+        Journal(tmp_path / "out.journal", resume=resume),
+        Manifest(tmp_path / "out.manifest.sqlite", resume=resume),
+        Downloader(str(destination)),
+    ]
+    Extractor(service, plugins).acquire("user", "password")
+
+
+def manifest_rows(tmp_path):
+    db = sqlite3.connect(str(tmp_path / "out.manifest.sqlite"))
+    try:
+        return dict(db.execute("SELECT id, destination FROM files"))
+    finally:
+        db.close()
+
+
+def test_resumed_run_keeps_the_manifest_of_the_interrupted_one(tmp_path):
+    failing = {"d0/f0.txt", "d1/d2/f1.txt"}
+    service = FakeService(failing_files=failing)
+    acquire(tmp_path, service, resume=False)
+    assert len(manifest_rows(tmp_path)) == len(service.files)
+
+    acquire(tmp_path, FakeService(), resume=True)
+
+    rows = manifest_rows(tmp_path)
+    assert set(rows) == {file.id for file in service.files}
+    assert all(destination is not None for destination in rows.values())
+
+
+def test_new_run_starts_a_new_manifest(tmp_path):
+    acquire(tmp_path, FakeService(depth=1), resume=False)
+    acquire(tmp_path, FakeService(depth=0), resume=False)
+
+    assert len(manifest_rows(tmp_path)) == 3
@@ -0,0 +1,124 @@
+import hashlib
+import json
+
+import pytest
+
+from extractor.services.mediafire import client as mediafire_client
+from extractor.services.mediafire.client import Client
+
+
+class FakeEntry:
+    """TokenEntry counting what the client stores"""
+
+    def __init__(self, tokens=None):
+        self.tokens = tokens
+        self.stored = []
+
+    def load(self):
+        return self.tokens
+
+    def store(self, tokens, expires=None):
+        self.stored.append(json.loads(json.dumps(tokens)))
+
+    def discard(self):
+        self.tokens = None
+
+
+@pytest.fixture
+def mediafire(server, monkeypatch):
+    """Checks the signatures and advances the secret key like MediaFire"""
+    monkeypatch.setattr(Client, "API_BASE", server.url(""))
+    server.session = {}
+
+    def reply(handler, **fields):
+        body = {"response": {"new_key": "yes", "result": "Success", **fields}}
+        server.send(handler, 200, json.dumps(body).encode())
+
+    def answer(**fields):
+        def route(handler):
+            body = handler.rfile.read(int(handler.headers["Content-Length"]))
+            query, _, signature = body.decode().partition("&signature=")
+            key = server.session.get("secret_key")
+            expected = hashlib.md5(
+                f"{key % 256}1.5{handler.path}?{query}".encode()
+            ).hexdigest() if key is not None else None
+            if signature != expected:
+                reply(handler, result="Error", error=127, message="Invalid signature")
+                return
+            server.session["secret_key"] = key * 16807 % 2147483647
+            reply(handler, **fields)
+
+        return route
+
+    def get_session_token(handler):
+        handler.rfile.read(int(handler.headers["Content-Length"]))
+        server.session["secret_key"] = 123456
+        server.logins = getattr(server, "logins", 0) + 1
+        reply(handler, session_token="first", time="1.5", secret_key="123456")
+
+    server.routes.update(
+        {
+            "/api/1.5/user/get_session_token.php": get_session_token,
+            "/api/1.5/user/get_info.php": answer(user_info={"email": "user"}),
+            "/api/1.5/folder/get_info.php": answer(folder_info={}),
+            "/api/1.5/user/renew_session_token.php": answer(session_token="second"),
+        }
+    )
+    return server
+
+
+def test_session_is_stored_on_login_not_per_call(mediafire):
+    cache = FakeEntry()
+    client = Client("user", "pw", cache=cache)
+    for _ in range(5):
+        client.folder_get_info()
+
+    assert len(cache.stored) == 1
+    assert cache.stored[0]["session"]["session_token"] == "first"
+    assert cache.stored[0]["account"]["user_info"] == {"email": "user"}
+
+
+def test_warm_run_continues_with_the_key_stored_on_close(mediafire):
+    cache = FakeEntry()
+    client = Client("user", "pw", cache=cache)
+    for _ in range(5):
+        client.folder_get_info()
+    client.close()
+
+    warm = Client("user", "pw", cache=FakeEntry(cache.stored[-1]))
+    warm.folder_get_info()
+    warm.account_info()
+
+    assert mediafire.logins == 1
+
+
+def test_advanced_key_is_stored_after_the_interval(mediafire):
+    cache = FakeEntry()
+    client = Client("user", "pw", cache=cache)
+    client.folder_get_info()
+    assert len(cache.stored) == 1
+
+    client._stored_at -= mediafire_client.STORE_INTERVAL
+    client.folder_get_info()
+
+    assert len(cache.stored) == 2
+    assert cache.stored[-1]["session"]["secret_key"] == client.session["secret_key"]
+
+
+def test_stale_cached_key_logs_in_again(mediafire):
+    cache = FakeEntry()
+    client = Client("user", "pw", cache=cache)
+    client.folder_get_info()
+
+    stale = FakeEntry(cache.stored[0])
+    Client("user", "pw", cache=stale).folder_get_info()
+
+    assert mediafire.logins == 2
+
+
+def test_session_is_stored_when_its_token_changes(mediafire):
+    cache = FakeEntry()
+    client = Client("user", "pw", cache=cache)
+    client.user_renew_session_token()
+
+    assert [t["session"]["session_token"] for t in cache.stored] == ["first", "second"]
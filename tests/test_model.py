@@ -0,0 +1,29 @@
+from datetime import datetime, timezone
+
+from extractor.data import model
+from extractor.data.path import ROOT
+from extractor.services.pcloud.file import PCloudFile
+
+
+def test_timestamps_are_parsed_once(monkeypatch):
+    parsed = []
+
+    def parse_timestamp(value):
+        parsed.append(value)
+        return datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+    monkeypatch.setattr(model, "parse_timestamp", parse_timestamp)
+    file = PCloudFile(
+        id=1,
+        name="file",
+        path=ROOT.child("file"),
+        owner=True,
+        shared=False,
+        created_at="Wed, 01 Jan 2020 00:00:00 +0000",
+        modified_at=None,
+        size=0,
+        session=None,
+    )
+
+    assert file.created_at == file.created_at == datetime(2020, 1, 1, tzinfo=timezone.utc)
+    assert parsed == ["Wed, 01 Jan 2020 00:00:00 +0000"]
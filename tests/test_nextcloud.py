@@ -0,0 +1,53 @@
+from extractor.data.path import ROOT
+from extractor.services.nextcloud.service import NextcloudService
+
+
+class FakeItem:
+    """WebDAV file of the wrapper, its properties are strings"""
+
+    def __init__(self, name, size=None, directory=False):
+        self.name = name
+        self.size = size
+        self.file_id = name
+        self.owner_id = "user"
+        self.last_modified = "Mon, 01 Jan 2024 00:00:00 GMT"
+        self._directory = directory
+
+    def basename(self):
+        return self.name
+
+    def isdir(self):
+        return self._directory
+
+    def isfile(self):
+        return not self._directory
+
+
+class FakeFolder:
+    def __init__(self, items):
+        self.items = items
+
+    def list(self, all_properties=False):
+        return self.items
+
+
+class FakeClient:
+    def __init__(self, items):
+        self.folder = FakeFolder(items)
+
+    def get_folder(self, all_properties=False):
+        return self.folder
+
+
+def test_file_sizes_are_integers():
+    service = NextcloudService(url="https://cloud.example.org")
+    service.client = FakeClient(
+        [FakeItem("a.txt", "1234"), FakeItem("empty", "0"), FakeItem("docs", directory=True)]
+    )
+    service._user_id = "user"
+
+    nodes = {node.name: node for node in service.list_children(None)}
+
+    assert nodes["a.txt"].size == 1234
+    assert nodes["empty"].size == 0
+    assert nodes["docs"].path_node == ROOT.child("docs")
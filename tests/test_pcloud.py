@@ -0,0 +1,139 @@
+import itertools
+import json
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from extractor.common.stream import iter_chunks
+from extractor.data.path import ROOT
+from extractor.errors import DownloadError
+from extractor.services.pcloud.client import Client
+from extractor.services.pcloud.file import PCloudFile
+
+from .test_stream import CONTENT, read_all
+
+
+class FakeCache:
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+
+    def load(self):
+        return {"endpoint": self.endpoint, "auth": "token"}
+
+
+@pytest.fixture
+def pcloud(server):
+    """Descriptors are valid on the connection that opened them, like pCloud's"""
+    numbers = itertools.count(1)
+    server.closed = []
+
+    def params(handler):
+        return {k: v[0] for k, v in parse_qs(urlsplit(handler.path).query).items()}
+
+    def reply(handler, data):
+        server.send(
+            handler,
+            200,
+            json.dumps(data).encode(),
+            {"Content-Type": "application/json; charset=utf-8"},
+        )
+
+    def descriptor(handler):
+        fd = int(params(handler)["fd"])
+        if fd not in getattr(handler, "descriptors", ()):
+            reply(handler, {"result": 1007, "error": "Invalid or closed file descriptor."})
+            return None
+        return fd
+
+    def file_open(handler):
+        fd = next(numbers)
+        handler.descriptors = getattr(handler, "descriptors", set()) | {fd}
+        reply(handler, {"result": 0, "fd": fd, "fileid": 1})
+
+    def file_read(handler):
+        if descriptor(handler) is not None:
+            count = int(params(handler)["count"])
+            server.send(handler, 200, CONTENT[:count])
+
+    def file_pread(handler):
+        if descriptor(handler) is not None:
+            query = params(handler)
+            offset = int(query["offset"])
+            server.send(handler, 200, CONTENT[offset : offset + int(query["count"])])
+
+    def file_close(handler):
+        fd = descriptor(handler)
+        if fd is not None:
+            handler.descriptors.discard(fd)
+            server.closed.append(fd)
+            reply(handler, {"result": 0})
+
+    server.routes.update(
+        {
+            "/file_open": file_open,
+            "/file_read": file_read,
+            "/file_pread": file_pread,
+            "/file_close": file_close,
+        }
+    )
+    return Client("user", "password", cache=FakeCache(server.url("/")))
+
+
+def pcloud_file(client):
+    return PCloudFile(
+        id=1,
+        name="file",
+        path=ROOT.child("file"),
+        owner=True,
+        shared=False,
+        created_at=None,
+        modified_at=None,
+        size=len(CONTENT),
+        session=client,
+    )
+
+
+def test_reads_over_the_connection_of_the_descriptor(server, pcloud):
+    file = pcloud_file(pcloud)
+
+    for offset, length in ((0, None), (1000, 5000)):
+        stream = file.get_stream(offset, length)
+        assert read_all(stream) == CONTENT[offset : offset + (length or len(CONTENT))]
+        stream.close()
+
+    assert server.closed == [1, 2]
+
+
+def test_downloads_reuse_the_pinned_connection(server, pcloud):
+    file = pcloud_file(pcloud)
+
+    for _ in range(3):
+        stream = file.get_stream()
+        assert read_all(stream) == CONTENT
+        stream.close()
+
+    assert server.closed == [1, 2, 3]
+    assert server.connections == 1
+
+
+def test_unfinished_stream_drops_its_connection(server, pcloud):
+    stream = pcloud_file(pcloud).get_stream()
+    next(iter_chunks(stream, 1000))
+    stream.close()
+
+    # the descriptor went with the connection, nothing left to close
+    assert server.closed == []
+    stream = pcloud_file(pcloud).get_stream()
+    assert read_all(stream) == CONTENT
+    stream.close()
+    assert server.closed == [2]
+
+
+def test_error_instead_of_content_raises(server, pcloud):
+    error = b'{"result": 5000, "error": "Internal error."}'
+    server.routes["/file_read"] = lambda h: server.send(
+        h, 200, error, {"Content-Type": "application/json"}
+    )
+
+    with pytest.raises(DownloadError):
+        pcloud_file(pcloud).get_stream()
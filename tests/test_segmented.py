@@ -0,0 +1,80 @@
+import hashlib
+import io
+
+import pytest
+
+from extractor import Extractor
+from extractor.common.segmented import SegmentedStream, stream_destination
+from extractor.plugins import Downloader
+
+from .fakes import FakeService, Recorder
+from .test_stream import CONTENT, read_all
+
+
+def open_range(offset, length):
+    return io.BytesIO(CONTENT[offset : offset + length])
+
+
+@pytest.mark.parametrize("segments", [1, 3, 7])
+def test_segmented_stream_serves_the_content_in_order(segments):
+    stream = SegmentedStream(open_range, len(CONTENT), segments, chunk_size=4096)
+    try:
+        assert stream_destination(stream) is None
+        assert read_all(stream, 1000) == CONTENT
+    finally:
+        stream.close()
+
+
+def test_segmented_stream_writes_into_the_destination(tmp_path):
+    destination = tmp_path / "file"
+    stream = SegmentedStream(
+        open_range, len(CONTENT), 4, chunk_size=4096, destination=destination
+    )
+    try:
+        assert stream_destination(stream) == destination
+        assert read_all(stream) == CONTENT
+    finally:
+        stream.close()
+
+    assert destination.read_bytes() == CONTENT
+
+
+def test_segmented_stream_raises_the_error_of_a_segment():
+    def failing(offset, length):
+        if offset >= len(CONTENT) // 2:
+            raise ValueError("no such range")
+        return open_range(offset, length)
+
+    stream = SegmentedStream(failing, len(CONTENT), 2, retries=0)
+    try:
+        with pytest.raises(ValueError):
+            read_all(stream)
+    finally:
+        stream.close()
+
+
+@pytest.mark.parametrize("with_second_consumer", [False, True])
+def test_extractor_downloads_large_files_in_segments(tmp_path, with_second_consumer):
+    class Reader:
+        def __init__(self):
+            self.contents = {}
+
+        def on_file_content(self, file, source):
+            self.contents[file.path] = read_all(source)
+
+    service = FakeService(depth=1, width=2, files=2)
+    recorder = Recorder()
+    plugins = [recorder, Downloader(str(tmp_path / "out"))]
+    if with_second_consumer:
+        reader = Reader()
+        plugins.append(reader)
+    Extractor(
+        service, plugins, hashes=["sha256"], segments=3, segment_threshold=10
+    ).acquire("user", "password")
+
+    hashed = {args[0].path: args[1] for args in recorder.named("file_hashed")}
+    for file in service.files:
+        assert (tmp_path / "out" / file.path).read_bytes() == file.content
+        assert hashed[file.path]["sha256"] == hashlib.sha256(file.content).hexdigest()
+        if with_second_consumer:
+            assert reader.contents[file.path] == file.content
@@ -0,0 +1,114 @@
+import io
+import threading
+
+import pytest
+
+from extractor.common.stream import (
+    ResponseStream,
+    ResumableStream,
+    iter_chunks,
+)
+from extractor.common.transport import Transport
+from extractor.errors import DownloadError
+
+CONTENT = bytes(range(256)) * 400
+
+
+def read_all(stream, chunk_size=8192) -> bytes:
+    return b"".join(bytes(chunk) for chunk in iter_chunks(stream, chunk_size))
+
+
+def test_response_stream_reads_the_body(server):
+    server.routes["/file"] = lambda h: server.send(h, 200, CONTENT)
+    session = Transport().session()
+
+    stream = ResponseStream(session.get(server.url("/file"), stream=True))
+    assert read_all(stream) == CONTENT
+    stream.close()
+
+
+def test_response_stream_returns_the_connection_to_the_pool(server):
+    server.routes["/file"] = lambda h: server.send(h, 200, CONTENT)
+    session = Transport().session()
+
+    for _ in range(5):
+        stream = ResponseStream(session.get(server.url("/file"), stream=True))
+        assert read_all(stream) == CONTENT
+        stream.close()
+
+    assert server.connections == 1
+
+
+class ChunkedSource(io.RawIOBase):
+    """Content from `offset` on, in chunks, optionally blocking after some"""
+
+    def __init__(self, content, offset, chunk=1000, block_after=None):
+        self._content = content
+        self._offset = offset
+        self._chunk = chunk
+        self._block_after = block_after
+        self._aborted = threading.Event()
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._block_after is not None and self._offset >= self._block_after:
+            # a stalled connection, until the watchdog shuts it down
+            self._aborted.wait(10)
+            return 0
+        size = min(len(b), self._chunk, len(self._content) - self._offset)
+        b[:size] = self._content[self._offset : self._offset + size]
+        self._offset += size
+        return size
+
+    def abort(self):
+        self._aborted.set()
+
+
+def test_resumable_stream_resumes_after_a_dropped_connection():
+    opened = []
+
+    class Dropping(ChunkedSource):
+        def readinto(self, b):
+            if self._offset >= 30000:
+                raise ConnectionResetError("dropped")
+            return super().readinto(b)
+
+    def open_dropping(offset):
+        opened.append(offset)
+        source = Dropping if len(opened) == 1 else ChunkedSource
+        return source(CONTENT, offset)
+
+    stream = ResumableStream(open_dropping, len(CONTENT), backoff=0, stall_timeout=None)
+    assert read_all(stream) == CONTENT
+    assert opened == [0, 30000]
+
+
+@pytest.mark.parametrize("size", [len(CONTENT), None])
+def test_resumable_stream_resumes_a_stalled_download(size):
+    opened = []
+
+    def open_at(offset):
+        opened.append(offset)
+        block_after = 20000 if len(opened) == 1 else None
+        return ChunkedSource(CONTENT, offset, block_after=block_after)
+
+    stream = ResumableStream(open_at, size, backoff=0, stall_timeout=0.5)
+    try:
+        assert read_all(stream) == CONTENT
+    finally:
+        stream.close()
+    assert opened == [0, 20000]
+
+
+def test_resumable_stream_fails_on_short_content():
+    stream = ResumableStream(
+        lambda offset: io.BytesIO(CONTENT[offset:1000]),
+        len(CONTENT),
+        retries=1,
+        backoff=0,
+        stall_timeout=None,
+    )
+    with pytest.raises(DownloadError):
+        read_all(stream)
@@ -0,0 +1,68 @@
+import json
+import time
+
+import pytest
+
+pytest.importorskip("cryptography")
+
+from extractor.common.tokencache import TokenCache  # noqa: E402
+
+TOKENS = {"auth": "s3cr3t-auth", "endpoint": "https://eapi.pcloud.com/"}
+
+
+def test_round_trip(tmp_path):
+    cache = TokenCache(tmp_path / "tokens.json")
+    cache.entry("PCloudService", "User@example.com", "pw").store(TOKENS)
+
+    assert cache.entry("PCloudService", "user@example.com", "pw").load() == TOKENS
+
+
+def test_entries_are_encrypted(tmp_path):
+    cache = TokenCache(tmp_path / "tokens.json")
+    cache.entry("PCloudService", "user", "pw").store(TOKENS)
+
+    assert "s3cr3t-auth" not in (tmp_path / "tokens.json").read_text()
+
+
+def test_other_password_or_account_finds_nothing(tmp_path):
+    cache = TokenCache(tmp_path / "tokens.json")
+    cache.entry("PCloudService", "user", "pw").store(TOKENS)
+
+    assert cache.entry("PCloudService", "user", "changed").load() is None
+    assert cache.entry("PCloudService", "other", "pw").load() is None
+    assert cache.entry("MediafireService", "user", "pw").load() is None
+
+
+def test_passphrase_instead_of_password(tmp_path):
+    path = tmp_path / "tokens.json"
+    TokenCache(path, passphrase="secret").entry("S", "user", "pw").store(TOKENS)
+
+    assert TokenCache(path, passphrase="secret").entry("S", "user", "x").load() == TOKENS
+    assert TokenCache(path).entry("S", "user", "secret").load() == TOKENS
+    assert TokenCache(path).entry("S", "user", "pw").load() is None
+
+
+def test_expired_entries_are_not_loaded_and_dropped(tmp_path):
+    path = tmp_path / "tokens.json"
+    cache = TokenCache(path)
+    cache.entry("S", "old", "pw").store(TOKENS, expires=time.time() - 1)
+    cache.entry("S", "soon", "pw").store(TOKENS, expires=time.time() + 10)
+
+    assert cache.entry("S", "old", "pw").load() is None
+    # within the margin
+    assert cache.entry("S", "soon", "pw").load() is None
+
+    cache.entry("S", "new", "pw").store(TOKENS)
+    assert len(json.loads(path.read_text())) == 2
+
+
+def test_discard(tmp_path):
+    cache = TokenCache(tmp_path / "tokens.json")
+    entry = cache.entry("S", "user", "pw")
+    entry.store(TOKENS)
+    cache.entry("S", "other", "pw").store(TOKENS)
+
+    entry.discard()
+
+    assert entry.load() is None
+    assert cache.entry("S", "other", "pw").load() == TOKENS
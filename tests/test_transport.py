@@ -0,0 +1,86 @@
+from extractor import Extractor
+from extractor.common.transport import DEFAULT_TRANSPORT, SEND_ONCE, Transport
+
+from .fakes import FakeService
+
+
+def test_closing_a_session_keeps_the_shared_pools(server):
+    server.routes["/"] = lambda h: server.send(h, 200, b"ok")
+    transport = Transport()
+    first, second = transport.session(), transport.session()
+
+    assert first.get(server.url("/")).content == b"ok"
+    first.close()
+    assert second.get(server.url("/")).content == b"ok"
+
+    assert server.connections == 1
+
+
+def test_close_ends_the_connections(server):
+    server.routes["/"] = lambda h: server.send(h, 200, b"ok")
+    transport = Transport()
+    session = transport.session()
+
+    session.get(server.url("/"))
+    transport.close()
+    # the pools open again for a later request
+    session.get(server.url("/"))
+
+    assert server.connections == 2
+
+
+def test_pinned_session_closes_its_connection(server):
+    server.routes["/"] = lambda h: server.send(h, 200, b"ok")
+    transport = Transport()
+    pinned, shared = transport.pinned_session(), transport.session()
+
+    pinned.get(server.url("/"))
+    pinned.get(server.url("/"))
+    pinned.close()
+    shared.get(server.url("/"))
+    shared.get(server.url("/"))
+
+    assert server.connections == 2
+
+
+def test_send_once_requests_are_not_retried(server):
+    server.routes["/"] = lambda h: server.send(h, 503, b"")
+    session = Transport(retries=1).session()
+
+    assert session.get(server.url("/"), headers={SEND_ONCE: "1"}).status_code == 503
+    assert len(server.requests) == 1
+    assert SEND_ONCE not in server.requests[0][2]
+
+    session.get(server.url("/"))
+    assert len(server.requests) == 3
+
+
+def test_reservations_add_up_and_the_pools_shrink_once_released():
+    transport = Transport(pool_size=10)
+
+    transport.reserve(8)
+    assert transport.pool_size == 10
+    transport.reserve(8)
+    assert transport.pool_size == 16
+    transport.release(8)
+    # still in use by the other reservation
+    assert transport.pool_size == 16
+    transport.release(8)
+    assert transport.pool_size == 10
+
+
+def test_extractor_reserves_connections_for_its_run_only():
+    during = []
+
+    class Plugin:
+        def on_extractor_start(self):
+            during.append(DEFAULT_TRANSPORT.pool_size)
+
+    size = DEFAULT_TRANSPORT.pool_size
+    extractor = Extractor(FakeService(), [Plugin()], workers=4 * size)
+    assert DEFAULT_TRANSPORT.pool_size == size
+
+    extractor.acquire("user", "pw")
+
+    assert during[0] > 4 * size
+    assert DEFAULT_TRANSPORT.pool_size == size
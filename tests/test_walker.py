@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from extractor import Extractor
+from extractor.common.walker import walk_tree
+from extractor.data import Folder
+from extractor.plugins import Downloader, Journal
+
+from .fakes import FakeService, Recorder
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_walk_yields_folders_before_their_contents(workers):
+    service = FakeService(depth=3)
+    seen = set()
+    count = 0
+    for node in walk_tree(service.list_children, max_workers=workers):
+        parent = node.path.rpartition("/")[0]
+        assert parent == "" or parent in seen
+        if isinstance(node, Folder):
+            seen.add(node.path)
+        count += 1
+
+    assert count == sum(len(children) for children in service.children.values())
+    assert sorted(service.listings) == sorted(service.children)
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_failed_listing_ends_the_walk_without_handler(workers):
+    service = FakeService(failing_listings={"d1"})
+    with pytest.raises(OSError):
+        list(walk_tree(service.list_children, max_workers=workers))
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_failed_listing_is_reported_and_the_walk_goes_on(workers):
+    service = FakeService(failing_listings={"d1"})
+    listed, failed = [], []
+    nodes = list(
+        walk_tree(
+            service.list_children,
+            max_workers=workers,
+            listed=lambda folder, count: listed.append(folder),
+            failed=lambda folder, error: failed.append(folder),
+        )
+    )
+
+    assert [folder.path for folder in failed] == ["d1"]
+    assert "d1" not in {folder.path for folder in listed if folder is not None}
+    assert not any(node.path.startswith("d1/") for node in nodes)
+    assert any(node.path.startswith("d2/") for node in nodes)
+
+
+def journal_records(path):
+    with open(path) as journal:
+        return [json.loads(line) for line in journal]
+
+
+@pytest.mark.parametrize("list_workers", [1, 3])
+def test_journal_resumes_a_folder_whose_listing_failed(tmp_path, list_workers):
+    journal = tmp_path / "out.journal"
+
+    def acquire(service, resume):
+        service.list_concurrency = list_workers
+        recorder = Recorder()
+        plugins = [recorder, Journal(journal, resume=resume), Downloader(str(tmp_path / "out"))]
+        Extractor(service, plugins).acquire("user", "password")
+        return recorder
+
+    first = acquire(FakeService(failing_listings={"d1/d0"}), resume=False)
+    assert [args[0].path for args in first.named("folder_list_failed")] == ["d1/d0"]
+
+    done = {r["path"] for r in journal_records(journal) if r["event"] == "folder_done"}
+    assert "d1/d0" not in done and "d1" not in done
+    assert "d0" in done and "d1/d1" in done
+
+    service = FakeService()
+    second = acquire(service, resume=True)
+    assert "d1/d0" in service.listings and "d0" not in service.listings
+
+    downloaded = first.named("file_download_success") + second.named("file_download_success")
+    assert sorted(args[0].path for args in downloaded) == sorted(f.path for f in service.files)